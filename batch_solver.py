@@ -0,0 +1,220 @@
+"""
+Batch Solver (Headless CLI)
+แก้ TSP ทีละหลายพัน instance จากไฟล์ CSV/JSONL โดยไม่เปิดหน้าจอ
+
+ตัวอย่าง:
+    python batch_solver.py routes.jsonl -o results.jsonl --workers 4 --metric haversine
+    cat routes.csv | python batch_solver.py - --format csv > results.jsonl
+
+หมายเหตุ: ไฟล์นี้ต้องไม่ import tkinter / streamlit / pandas / plotly เพื่อให้เริ่มทำงานได้เร็ว
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import calculation_module as calc
+import data_module
+
+def _json_bool(v):
+    # รับเฉพาะ true/false ของ JSON (bool("false") = True จึงแปลงตรงๆ ไม่ได้)
+    if not isinstance(v, bool):
+        raise TypeError("expected true or false")
+    return v
+
+# ตัวเลือกที่รับต่อ instance (record ใน JSONL, request ของ solver_service) -> ฟังก์ชันแปลงค่า
+SOLVE_OPTIONS = {
+    "metric": lambda v: str(v).lower(),
+    "construction": str,
+    "improve": _json_bool,
+    "time_limit": float,
+    "exact_max": int,
+    "exact_time_limit": float,
+    "bound": lambda v: "auto" if _json_bool(v) else False,
+    "names": _json_bool,
+}
+# ค่าเริ่มต้นครบทุกตัว -> request ที่ระบุค่าเริ่มต้นเองกับที่ไม่ระบุได้ key เดียวกัน (cache / coalescing ของ solver_service)
+DEFAULT_OPTIONS = {
+    "metric": "euclidean",
+    "construction": "nearest_neighbor",
+    "improve": True,
+    "time_limit": None,
+    "exact_max": calc.EXACT_THRESHOLD,
+    "exact_time_limit": calc.EXACT_TIME_LIMIT,
+    "bound": "auto",
+    "names": False,
+}
+
+def parse_options(payload, base=None):
+    """
+    ดึงตัวเลือก solver จาก payload (ทับค่าใน base และ DEFAULT_OPTIONS) พร้อมตรวจค่า คืนค่า dict
+    key อื่นที่ไม่อยู่ใน SOLVE_OPTIONS ไม่ถูกใช้ / ค่าผิด -> ValueError
+    """
+    options = {**DEFAULT_OPTIONS, **(base or {})}
+    for name, convert in SOLVE_OPTIONS.items():
+        if payload.get(name) is not None:
+            try:
+                options[name] = convert(payload[name])
+            except (TypeError, ValueError):
+                raise ValueError(f"invalid {name}: {payload[name]!r}") from None
+    if options["metric"] not in calc.METRICS:
+        raise ValueError(f"unknown metric: {options['metric']!r}")
+    if options["construction"] not in calc.CONSTRUCTIONS:
+        raise ValueError(f"unknown construction: {options['construction']!r}")
+    return options
+
+def solve_instance(instance_id, cities, options):
+    """แก้ 1 instance คืนค่าผลลัพธ์เป็น dict (พร้อมเขียนเป็น JSON)"""
+    started = time.perf_counter()
+    try:
+        # CityTable -> solver คืน route เป็น index array โดยตรง
+        table = calc.CityTable.from_dicts(cities)
+        dist, route, info = calc.solve_tsp(
+            table,
+            improve=options.get("improve", True),
+            metric=options.get("metric"),
+            time_limit=options.get("time_limit"),
+            construction=options.get("construction", "nearest_neighbor"),
+            workers=options.get("solver_workers"),
+            exact_max=options.get("exact_max", calc.EXACT_THRESHOLD),
+            exact_time_limit=options.get("exact_time_limit", calc.EXACT_TIME_LIMIT),
+            bound=options.get("bound", "auto"),
+        )
+        result = {
+            "id": instance_id,
+            "n": len(cities),
+            "distance": dist,
+            "initial_distance": info['initial_distance'],
+            "unit": info['unit'],
+            "optimal": info['optimal'],
+            "lower_bound": info['lower_bound'],
+            "gap": info['gap'],
+            "bound_proven": info['bound_proven'],
+            "route": [int(i) for i in route],
+        }
+        if options.get("names"):
+            result["route_names"] = [table.names[i] for i in route]
+    except Exception as e:  # instance เสียตัวเดียวไม่ควรทำให้ทั้ง batch หยุด
+        result = {"id": instance_id, "n": len(cities), "error": f"{type(e).__name__}: {e}"}
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+def run_batch(instances, out, options, workers=1, max_pending=None):
+    """
+    ส่ง instance เข้า worker pool แบบ streaming
+    - อ่าน input ทีละ instance และมีงานค้างไม่เกิน max_pending -> หน่วยความจำคงที่
+    - เขียนผลลัพธ์ทันทีที่แต่ละ instance เสร็จ (ลำดับตามที่เสร็จ ไม่ใช่ลำดับใน input)
+    คืนค่า: สถิติรวม (dict)
+    """
+    stats = {"instances": 0, "cities": 0, "errors": 0, "solve_seconds": 0.0}
+    started = time.perf_counter()
+
+    def emit(result):
+        stats["instances"] += 1
+        stats["cities"] += result["n"]
+        stats["solve_seconds"] += result["seconds"]
+        if "error" in result:
+            stats["errors"] += 1
+        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+        out.flush()
+
+    def read(instances):
+        # อ่าน input ไม่ได้อีกต่อ (เช่นไฟล์เสีย/decode ไม่ได้) -> บันทึกเป็น error แล้วจบ batch แบบปกติ
+        try:
+            for instance_id, cities, inst_options in instances:
+                if cities is not None:
+                    # ตัวเลือกของ record ตรวจแบบเดียวกับ solver_service (ค่าผิด -> error ของ record นั้น)
+                    try:
+                        inst_options = parse_options(inst_options, options)
+                    except ValueError as e:
+                        cities, inst_options = None, {"error": f"Options: {e}"}
+                yield instance_id, cities, inst_options
+        except Exception as e:
+            yield None, None, {"error": f"Input: {type(e).__name__}: {e}"}
+
+    def rejected(instance_id, inst_options):
+        # record ที่ parse/ตรวจไม่ผ่าน (ดู data_module.iter_instances) -> ผลลัพธ์ error ไม่ต้องส่งเข้า solver
+        return {"id": instance_id, "n": 0, "error": inst_options["error"], "seconds": 0.0}
+
+    if workers <= 1:
+        for instance_id, cities, inst_options in read(instances):
+            if cities is None:
+                emit(rejected(instance_id, inst_options))
+            else:
+                emit(solve_instance(instance_id, cities, inst_options))
+    else:
+        max_pending = max_pending or workers * 4
+        pending = set()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            try:
+                for instance_id, cities, inst_options in read(instances):
+                    if cities is None:
+                        emit(rejected(instance_id, inst_options))
+                        continue
+                    if len(pending) >= max_pending:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for fut in done:
+                            emit(fut.result())
+                    pending.add(pool.submit(solve_instance, instance_id, cities, inst_options))
+            finally:
+                # งานที่ส่งไปแล้วเขียนผลให้ครบเสมอ
+                for fut in wait(pending).done:
+                    emit(fut.result())
+
+    stats["wall_seconds"] = time.perf_counter() - started
+    return stats
+
+def format_summary(stats):
+    wall = stats["wall_seconds"] or 1e-9
+    return (f"Solved {stats['instances']} instances ({stats['cities']} cities, {stats['errors']} errors) "
+            f"in {stats['wall_seconds']:.2f}s | {stats['instances'] / wall:.1f} instances/s, "
+            f"{stats['cities'] / wall:.0f} cities/s")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve many TSP instances from a CSV/JSONL stream.")
+    parser.add_argument("input", help="input file (.jsonl / .csv) or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="output JSONL file (default: stdout)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="input format (default: from file extension)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes (1 = no pool)")
+    parser.add_argument("--max-pending", type=int, help="max instances in flight (default: 4 x workers)")
+    parser.add_argument("--metric", choices=sorted(calc.METRICS), default="euclidean")
+    parser.add_argument("--construction", choices=calc.CONSTRUCTIONS, default="nearest_neighbor",
+                        help="initial tour (hilbert = space-filling curve, fastest for large instances; "
+                             "partition = solve spatial clusters in parallel, for huge instances)")
+    parser.add_argument("--no-improve", action="store_true", help="nearest neighbor only (skip 2-opt/Or-opt)")
+    parser.add_argument("--time-limit", type=float, help="improvement time limit per instance (seconds)")
+    parser.add_argument("--exact-max", type=int, default=calc.EXACT_THRESHOLD,
+                        help="solve instances up to this many cities exactly (0 = never)")
+    parser.add_argument("--exact-time-limit", type=float, default=calc.EXACT_TIME_LIMIT,
+                        help="time limit of the exact solver before keeping the heuristic route (seconds)")
+    parser.add_argument("--no-bound", action="store_true", help="skip the lower bound / optimality gap")
+    parser.add_argument("--names", action="store_true", help="also write the route as city names")
+    args = parser.parse_args(argv)
+
+    options = {
+        "metric": args.metric,
+        "construction": args.construction,
+        # มี worker pool ของ batch อยู่แล้ว -> partition ใน worker ไม่ต้องเปิด pool ซ้อน
+        "solver_workers": 1 if args.workers > 1 else None,
+        "improve": not args.no_improve,
+        "time_limit": args.time_limit,
+        "exact_max": args.exact_max,
+        "exact_time_limit": args.exact_time_limit,
+        "bound": False if args.no_bound else "auto",
+        "names": args.names,
+    }
+    instances = data_module.iter_instances(args.input, args.format)
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        stats = run_batch(instances, out, options, workers=args.workers, max_pending=args.max_pending)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(format_summary(stats), file=sys.stderr)
+    return 1 if stats["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,395 @@
+"""
+Benchmark Suite (ความเร็ว + คุณภาพทัวร์ของ solver)
+สร้าง instance สังเคราะห์แบบกำหนด seed (ไม่ต้องต่อเน็ต) หรืออ่านไฟล์ TSPLIB แล้ววัดผลแต่ละโหมดของ solver
+บันทึกผลเป็น JSON เพื่อเทียบกับรอบก่อนหน้า (หา regression)
+
+ตัวอย่าง:
+    python benchmark.py run --sizes 100 1000 10000 --layouts uniform clustered grid -o base.json
+    python benchmark.py run --tsplib data/berlin52.tsp data/kroA100.tsp --modes nn nn+improve -o tsplib.json
+    python benchmark.py compare base.json new.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+try:
+    import resource   # ไม่มีบน Windows -> ไม่วัดหน่วยความจำของ worker process
+    HAS_RESOURCE = True
+except ImportError:
+    HAS_RESOURCE = False
+
+import calculation_module as calc
+
+# ==========================================
+# Instances
+# ==========================================
+LAYOUTS = ("uniform", "clustered", "grid")
+DEFAULT_SIZES = (100, 1000, 10000)
+SPAN = 1000.0   # instance สังเคราะห์อยู่ในสี่เหลี่ยม SPAN x SPAN
+
+# ค่าที่ดีที่สุดที่ทราบของ instance มาตรฐานใน TSPLIB (ใช้คำนวณ gap)
+TSPLIB_OPTIMA = {
+    "att48": 10628, "eil51": 426, "berlin52": 7542, "st70": 675, "eil76": 538, "pr76": 108159,
+    "rat99": 1211, "kroA100": 21282, "kroB100": 22141, "kroC100": 20749, "kroD100": 21294,
+    "kroE100": 22068, "rd100": 7910, "eil101": 629, "lin105": 14379, "ch130": 6110, "ch150": 6528,
+    "d198": 15780, "ts225": 126643, "tsp225": 3916, "gil262": 2378, "a280": 2579, "lin318": 42029,
+    "pcb442": 50778, "pr1002": 259045, "pr2392": 378032,
+}
+
+def generate(layout, n, seed=0):
+    """
+    สร้าง instance สังเคราะห์ (ผลเหมือนเดิมทุกครั้งสำหรับ layout, n, seed เดียวกัน)
+    - uniform: สุ่มทั่วพื้นที่
+    - clustered: กลุ่มละ ~100 เมือง กระจายแบบ Gaussian รอบจุดศูนย์กลางสุ่ม
+    - grid: ตาราง side x side ระยะห่าง 10 (ถ้า n = side^2 และ side เป็นเลขคู่ ทัวร์ที่ดีที่สุด = n * 10)
+    คืนค่า: dict ของ instance {'name', 'cities' (CityTable), 'metric', 'optimum', ...}
+    """
+    rng = random.Random(f"{layout}-{n}-{seed}")
+    if layout == "uniform":
+        xs = [rng.random() * SPAN for _ in range(n)]
+        ys = [rng.random() * SPAN for _ in range(n)]
+    elif layout == "clustered":
+        k = max(1, n // 100)
+        centers = [(rng.random() * SPAN, rng.random() * SPAN) for _ in range(k)]
+        sigma = SPAN / math.sqrt(k) / 6
+        xs, ys = [], []
+        for _ in range(n):
+            cx, cy = centers[rng.randrange(k)]
+            xs.append(rng.gauss(cx, sigma))
+            ys.append(rng.gauss(cy, sigma))
+    elif layout == "grid":
+        side = math.ceil(math.sqrt(n))
+        step = 10.0
+        xs = [(i % side) * step for i in range(n)]
+        ys = [(i // side) * step for i in range(n)]
+    else:
+        raise ValueError(f"Unknown layout: {layout!r}")
+
+    optimum = None
+    if layout == "grid" and side * side == n and side % 2 == 0:
+        optimum = n * step
+    return {
+        "name": f"{layout}-{n}-s{seed}",
+        "source": "synthetic",
+        "layout": layout,
+        "seed": seed,
+        "cities": calc.CityTable(range(n), xs, ys),
+        "metric": "euclidean",
+        "optimum": optimum,
+    }
+
+# --- TSPLIB ---
+TSPLIB_TYPES = ("EUC_2D", "CEIL_2D", "ATT", "GEO")
+
+def _tsplib_geo(v):
+    # TSPLIB GEO: DDD.MM (องศา.ลิปดา) -> องศาทศนิยม
+    deg = int(v)
+    return deg + 5.0 * (v - deg) / 3.0
+
+def load_tsplib(path, optimum=None):
+    """
+    อ่านไฟล์ TSPLIB (.tsp) ที่มี NODE_COORD_SECTION (EDGE_WEIGHT_TYPE: EUC_2D, CEIL_2D, ATT, GEO)
+    GEO แปลงเป็นองศาแล้วแก้ด้วย metric haversine, นอกนั้นใช้ euclidean
+    optimum: ค่าที่ดีที่สุดที่ทราบ (ถ้าไม่ส่งมาจะดูจาก TSPLIB_OPTIMA ตามชื่อ)
+    คืนค่า: dict ของ instance (เหมือน generate)
+    """
+    spec = {}
+    names, xs, ys = [], [], []
+    with open(path, "r", encoding="utf-8") as f:
+        in_coords = False
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line == "EOF":
+                break
+            if in_coords:
+                parts = line.split()
+                try:
+                    x, y = float(parts[1]), float(parts[2])
+                except (IndexError, ValueError):
+                    break   # จบ NODE_COORD_SECTION (เริ่ม section อื่น)
+                names.append(parts[0])
+                xs.append(x)
+                ys.append(y)
+            elif line.startswith("NODE_COORD_SECTION"):
+                in_coords = True
+            elif ":" in line:
+                key, value = line.split(":", 1)
+                spec[key.strip().upper()] = value.strip()
+
+    name = spec.get("NAME", os.path.splitext(os.path.basename(path))[0])
+    edge_type = spec.get("EDGE_WEIGHT_TYPE", "EUC_2D").upper()
+    if edge_type not in TSPLIB_TYPES:
+        raise ValueError(f"{path}: EDGE_WEIGHT_TYPE {edge_type} is not supported (supported: {', '.join(TSPLIB_TYPES)})")
+    if not names:
+        raise ValueError(f"{path}: no NODE_COORD_SECTION found")
+
+    raw = (xs, ys)
+    metric = "euclidean"
+    if edge_type == "GEO":
+        xs = [_tsplib_geo(v) for v in xs]
+        ys = [_tsplib_geo(v) for v in ys]
+        metric = "haversine"
+    return {
+        "name": name,
+        "source": path,
+        "edge_weight_type": edge_type,
+        "cities": calc.CityTable(names, xs, ys),
+        "raw": raw,
+        "metric": metric,
+        "optimum": optimum if optimum is not None else TSPLIB_OPTIMA.get(name),
+    }
+
+def tsplib_length(inst, route):
+    """ความยาวทัวร์ตามนิยามระยะของ TSPLIB (ปัดเป็นจำนวนเต็ม) ใช้เทียบกับค่า optimum ที่ตีพิมพ์"""
+    xs, ys = inst["raw"]
+    edge_type = inst["edge_weight_type"]
+    total = 0
+    for i, j in zip(route, route[1:]):
+        dx, dy = xs[i] - xs[j], ys[i] - ys[j]
+        if edge_type == "EUC_2D":
+            total += int(math.sqrt(dx * dx + dy * dy) + 0.5)
+        elif edge_type == "CEIL_2D":
+            total += math.ceil(math.sqrt(dx * dx + dy * dy))
+        elif edge_type == "ATT":
+            r = math.sqrt((dx * dx + dy * dy) / 10.0)
+            t = int(r + 0.5)
+            total += t + 1 if t < r else t
+        else:  # GEO
+            lat_i, lon_i = (math.pi * _tsplib_geo(v) / 180.0 for v in (xs[i], ys[i]))
+            lat_j, lon_j = (math.pi * _tsplib_geo(v) / 180.0 for v in (xs[j], ys[j]))
+            q1 = math.cos(lon_i - lon_j)
+            q2 = math.cos(lat_i - lat_j)
+            q3 = math.cos(lat_i + lat_j)
+            total += int(6378.388 * math.acos(0.5 * ((1.0 + q1) * q2 - (1.0 - q1) * q3)) + 1.0)
+    return total
+
+# ==========================================
+# Solver modes
+# ==========================================
+# แต่ละโหมด: (instance, time_limit) -> (ระยะทาง, route เป็น index แบบวนกลับ)
+def _heuristic(inst, **options):
+    # วัดเฉพาะ heuristic: ไม่ต่อด้วย exact solver และไม่คำนวณ lower bound (ไม่นับรวมในเวลา/หน่วยความจำ)
+    return calc.solve_tsp(inst["cities"], metric=inst["metric"], exact=False, bound=False, **options)[:2]
+
+MODES = {
+    "nn": lambda inst, tl: _heuristic(inst, improve=False),
+    "nn+improve": lambda inst, tl: _heuristic(inst, time_limit=tl),
+    "hilbert": lambda inst, tl: _heuristic(inst, improve=False, construction="hilbert"),
+    "hilbert+improve": lambda inst, tl: _heuristic(inst, time_limit=tl, construction="hilbert"),
+    "multistart": lambda inst, tl: _heuristic(inst, improve=False, n_starts=8),
+    "partition": lambda inst, tl: _heuristic(inst, time_limit=tl, construction="partition"),
+}
+DEFAULT_MODES = ("nn", "nn+improve", "hilbert", "hilbert+improve")
+# โหมดที่แก้ใน worker process (หน่วยความจำส่วนใหญ่อยู่ใน worker ซึ่ง tracemalloc ของ process หลักมองไม่เห็น)
+POOL_MODES = ("multistart", "partition")
+
+def check_route(route, n):
+    """ตรวจว่า route เป็นทัวร์ที่ถูกต้อง (ผ่านทุกเมืองครั้งเดียวและวนกลับจุดเริ่มต้น)"""
+    route = [int(i) for i in route]
+    if n == 1:
+        return route == [0]
+    return len(route) == n + 1 and route[0] == route[-1] and sorted(route[:-1]) == list(range(n))
+
+def _maxrss_mb(who):
+    # ru_maxrss: Linux เป็น KB, macOS เป็น byte
+    rss = resource.getrusage(who).ru_maxrss
+    return rss / (2**20 if sys.platform == "darwin" else 2**10)
+
+def measure_memory(inst, mode, time_limit=None, children=False):
+    """
+    แก้ 1 รอบภายใต้ tracemalloc คืนค่า {'peak_mb': ..., 'worker_rss_mb': ...}
+    children=True (เรียกใน process ใหม่เท่านั้น): worker_rss_mb = max RSS ของ worker process (RUSAGE_CHILDREN)
+      ใส่เฉพาะเมื่อโหมดนั้นใช้ worker จริง (workers = 1 แก้ใน process เดียว)
+    """
+    result = {}
+    tracemalloc.start()
+    try:
+        MODES[mode](inst, time_limit)
+        result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+    if children and _maxrss_mb(resource.RUSAGE_CHILDREN) > 0:
+        result["worker_rss_mb"] = _maxrss_mb(resource.RUSAGE_CHILDREN)
+    return result
+
+def run_one(inst, mode, time_limit=None, memory=True):
+    """
+    วัดผล 1 instance x 1 โหมด
+    - seconds: เวลาจริง (รอบที่ไม่เปิด tracemalloc เพราะ tracemalloc ทำให้ช้าลง)
+    - peak_mb: หน่วยความจำสูงสุดที่ solver จองเพิ่มใน process หลัก (รอบแยก, ผ่าน tracemalloc)
+    - worker_rss_mb: (POOL_MODES) max RSS ของ worker process
+      RUSAGE_CHILDREN เป็นค่าสูงสุดสะสมของทั้ง process จึงวัดใน process ใหม่ (spawn) ต่อ 1 รอบ
+    คืนค่า: dict ผลลัพธ์
+    """
+    cities = inst["cities"]
+    n = len(cities)
+    result = {"instance": inst["name"], "n": n, "mode": mode, "metric": inst["metric"]}
+    for key in ("layout", "seed", "edge_weight_type"):
+        if key in inst:
+            result[key] = inst[key]
+
+    solver = MODES[mode]
+    started = time.perf_counter()
+    length, route = solver(inst, time_limit)
+    result["seconds"] = time.perf_counter() - started
+    result["length"] = length
+    result["valid"] = check_route(route, n)
+
+    if memory:
+        if mode in POOL_MODES and HAS_RESOURCE:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                result.update(pool.submit(measure_memory, inst, mode, time_limit, True).result())
+        else:
+            result.update(measure_memory(inst, mode, time_limit))
+
+    optimum = inst.get("optimum")
+    if "raw" in inst:
+        result["tsplib_length"] = tsplib_length(inst, [int(i) for i in route])
+    if optimum:
+        result["optimum"] = optimum
+        result["gap"] = result.get("tsplib_length", length) / optimum - 1.0
+    return result
+
+def run_suite(instances, modes, time_limit=None, memory=True, log=None):
+    """รันทุก instance x ทุกโหมด คืนค่า list ของผลลัพธ์ (log = ฟังก์ชันพิมพ์ความคืบหน้า)"""
+    results = []
+    for inst in instances:
+        for mode in modes:
+            result = run_one(inst, mode, time_limit=time_limit, memory=memory)
+            results.append(result)
+            if log:
+                log(format_result(result))
+    return results
+
+def format_result(r):
+    gap = f" gap {r['gap']:+.2%}" if "gap" in r else ""
+    mem = f" {r['peak_mb']:.1f} MB" if "peak_mb" in r else ""
+    if "worker_rss_mb" in r:
+        mem += f" (workers {r['worker_rss_mb']:.1f} MB RSS)"
+    valid = "" if r["valid"] else " INVALID ROUTE"
+    return f"{r['instance']:<24} {r['mode']:<16} {r['seconds']:9.3f}s{mem} length {r['length']:.4f}{gap}{valid}"
+
+def environment():
+    """ข้อมูลเครื่อง/เวอร์ชัน เก็บไว้กับผลเพื่อให้เทียบข้ามรอบได้อย่างมีความหมาย"""
+    return {
+        "python": platform.python_version(),
+        "numpy": calc.np.__version__ if calc.HAS_NUMPY else None,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+# ==========================================
+# Compare (Regression check)
+# ==========================================
+def compare(base, new, time_tolerance=0.25, length_tolerance=0.001, min_seconds=0.05):
+    """
+    เทียบผล 2 รอบ (จับคู่ด้วย instance + mode)
+    regression = ช้าลงเกิน time_tolerance (เฉพาะรายการที่ใช้เวลาเกิน min_seconds) หรือทัวร์ยาวขึ้นเกิน length_tolerance
+    คืนค่า: (list ของแถวเปรียบเทียบ, จำนวน regression)
+    """
+    base_rows = {(r["instance"], r["mode"]): r for r in base["results"]}
+    rows, regressions = [], 0
+    for r in new["results"]:
+        b = base_rows.get((r["instance"], r["mode"]))
+        if b is None:
+            continue
+        time_ratio = r["seconds"] / b["seconds"] if b["seconds"] else 1.0
+        length_delta = r["length"] / b["length"] - 1.0 if b["length"] else 0.0
+        flags = []
+        if time_ratio > 1.0 + time_tolerance and max(r["seconds"], b["seconds"]) >= min_seconds:
+            flags.append("SLOWER")
+        if length_delta > length_tolerance:
+            flags.append("LONGER")
+        if not r["valid"]:
+            flags.append("INVALID")
+        regressions += bool(flags)
+        rows.append({"instance": r["instance"], "mode": r["mode"], "base_seconds": b["seconds"],
+                     "seconds": r["seconds"], "time_ratio": time_ratio, "length_delta": length_delta, "flags": flags})
+    return rows, regressions
+
+def format_compare(rows):
+    lines = [f"{'instance':<24} {'mode':<16} {'base s':>9} {'new s':>9} {'ratio':>7} {'length':>8}"]
+    for row in rows:
+        lines.append(f"{row['instance']:<24} {row['mode']:<16} {row['base_seconds']:9.3f} {row['seconds']:9.3f} "
+                     f"{row['time_ratio']:6.2f}x {row['length_delta']:+8.3%} {' '.join(row['flags'])}")
+    return "\n".join(lines)
+
+# ==========================================
+# CLI
+# ==========================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark TSP solver speed and tour quality.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="run the benchmark and write results as JSON")
+    run.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="synthetic instance sizes")
+    run.add_argument("--layouts", nargs="+", choices=LAYOUTS, default=list(LAYOUTS))
+    run.add_argument("--seeds", type=int, nargs="+", default=[0])
+    run.add_argument("--tsplib", nargs="+", default=[], help="TSPLIB .tsp files to include")
+    run.add_argument("--optima", help="JSON file {instance name: optimal length} (overrides built-in TSPLIB optima)")
+    run.add_argument("--no-synthetic", action="store_true", help="only run the TSPLIB files")
+    run.add_argument("--modes", nargs="+", choices=sorted(MODES), default=list(DEFAULT_MODES))
+    run.add_argument("--time-limit", type=float, help="improvement time limit per solve (seconds)")
+    run.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass (halves run time)")
+    run.add_argument("-o", "--output", help="write results JSON here (default: stdout)")
+
+    cmp_ = sub.add_parser("compare", help="compare two result files and report regressions")
+    cmp_.add_argument("base")
+    cmp_.add_argument("new")
+    cmp_.add_argument("--time-tolerance", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    cmp_.add_argument("--length-tolerance", type=float, default=0.001, help="allowed tour length increase")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        with open(args.base, encoding="utf-8") as f:
+            base = json.load(f)
+        with open(args.new, encoding="utf-8") as f:
+            new = json.load(f)
+        rows, regressions = compare(base, new, args.time_tolerance, args.length_tolerance)
+        print(format_compare(rows))
+        print(f"{regressions} regression(s) in {len(rows)} matched result(s)", file=sys.stderr)
+        return 1 if regressions else 0
+
+    optima = {}
+    if args.optima:
+        with open(args.optima, encoding="utf-8") as f:
+            optima = json.load(f)
+
+    def instances():
+        # สร้างทีละ instance (ไม่เก็บ instance ใหญ่ไว้พร้อมกันทั้งหมด)
+        for path in args.tsplib:
+            inst = load_tsplib(path)
+            inst["optimum"] = optima.get(inst["name"], inst["optimum"])
+            yield inst
+        if not args.no_synthetic:
+            for layout in args.layouts:
+                for n in args.sizes:
+                    for seed in args.seeds:
+                        yield generate(layout, n, seed)
+
+    log = lambda line: print(line, file=sys.stderr, flush=True)
+    results = run_suite(instances(), args.modes, time_limit=args.time_limit, memory=not args.no_memory, log=log)
+    report = {"environment": environment(), "args": vars(args), "results": results}
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 1 if not all(r["valid"] for r in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,40 +1,2867 @@
+import cProfile
+import hashlib
+import heapq
+import json
 import math
+import os
+import random
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
+from functools import cached_property
+
+from multiprocessing import shared_memory
+
+try:
+    import numpy as np
+except ImportError:  # ไม่มี NumPy ในเครื่อง -> ใช้ Python แท้ (fallback)
+    np = None
+
+HAS_NUMPY = np is not None
+
+# จำนวนเมืองที่ engine="auto" จะเปลี่ยนไปใช้ KD-tree แทนการ scan ทุกเมือง
+KDTREE_THRESHOLD = 10000
 
 def get_dist(c1, c2):
     """คำนวณระยะห่างระหว่างเมือง 2 เมือง"""
     return math.sqrt((c1['x'] - c2['x'])**2 + (c1['y'] - c2['y'])**2)
 
-def solve_tsp_nearest_neighbor(cities):
+# ==========================================
+# City Table (struct-of-arrays)
+# ==========================================
+class CityTable:
     """
-    Algorithm: Nearest Neighbor Method
-    คืนค่า: (Total Distance, Route Path List)
-    """
-    if not cities:
-        return 0, []
-    
-    # Clone list เพื่อไม่ให้กระทบข้อมูลหลัก
-    unvisited = cities[:]
-    
+    ตารางเมืองแบบ struct-of-arrays: พิกัดเป็นคอลัมน์ float64 (NumPy หรือ array('d')) + ชื่อใน list แยก
+    ~16 bytes ต่อเมือง (+ ชื่อ) แทน dict ทีละเมือง และ solver อ่านพิกัดได้โดยไม่ผ่าน dict
+    - xs / ys: view ของคอลัมน์ (ไม่ copy) สำหรับ solver และตัววาดกราฟ
+    - Adapter ของ API เดิม: table[i] และการวนลูปได้ dict {'name','x','y'}, append(dict), extend(list ของ dict)
+    solver ที่รับ CityTable จะคืน route เป็น index array แบบวนกลับ (แทน list ของ dict)
+    """
+
+    def __init__(self, names=(), xs=(), ys=()):
+        self.names = [str(v) for v in names]
+        n = len(self.names)
+        if HAS_NUMPY:
+            self._x = np.array(xs, dtype=np.float64)
+            self._y = np.array(ys, dtype=np.float64)
+        else:
+            self._x = array('d', xs)
+            self._y = array('d', ys)
+        if len(self._x) != n or len(self._y) != n:
+            raise ValueError("names, xs and ys must have the same length")
+
+    @classmethod
+    def from_dicts(cls, cities):
+        cities = list(cities)
+        return cls([c['name'] for c in cities], [c['x'] for c in cities], [c['y'] for c in cities])
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def xs(self):
+        # NumPy: เก็บแบบจองที่เผื่อ (doubling) -> คืน view เฉพาะส่วนที่ใช้
+        return self._x[:len(self.names)] if HAS_NUMPY else self._x
+
+    @property
+    def ys(self):
+        return self._y[:len(self.names)] if HAS_NUMPY else self._y
+
+    @property
+    def nbytes(self):
+        return 8 * 2 * len(self.names) + sum(len(v) for v in self.names)
+
+    def _reserve(self, need):
+        cap = len(self._x)
+        if need <= cap:
+            return
+        cap = max(16, cap)
+        while cap < need:
+            cap *= 2
+        n = len(self.names)
+        for attr in ("_x", "_y"):
+            col = np.empty(cap)
+            col[:n] = getattr(self, attr)[:n]
+            setattr(self, attr, col)
+
+    def add(self, name, x, y):
+        """เพิ่มเมือง 1 เมือง คืนค่า index ของเมืองนั้น"""
+        n = len(self.names)
+        if HAS_NUMPY:
+            self._reserve(n + 1)
+            self._x[n] = x
+            self._y[n] = y
+        else:
+            self._x.append(x)
+            self._y.append(y)
+        self.names.append(str(name))
+        return n
+
+    def append(self, city):
+        return self.add(city['name'], city['x'], city['y'])
+
+    def extend(self, cities):
+        """เพิ่มหลายเมือง (CityTable หรือ list ของ dict) ในครั้งเดียว"""
+        if not isinstance(cities, CityTable):
+            cities = CityTable.from_dicts(cities)
+        n, m = len(self.names), len(self.names) + len(cities)
+        if HAS_NUMPY:
+            self._reserve(m)
+            self._x[n:m] = cities.xs
+            self._y[n:m] = cities.ys
+        else:
+            self._x.extend(cities.xs)
+            self._y.extend(cities.ys)
+        self.names.extend(cities.names)
+
+    def remove(self, i):
+        """ลบเมือง i (เมืองหลังจากนั้นเลื่อน index ลง 1) คืนค่า dict ของเมืองที่ลบ"""
+        n = len(self.names)
+        i = range(n)[i]     # index ติดลบแบบ list (และ IndexError ถ้าเกิน)
+        city = self.city(i)
+        if HAS_NUMPY:
+            if not self._x.flags.writeable:
+                # คอลัมน์ map จากไฟล์ของ InstanceStore (อ่านอย่างเดียว) -> copy ก่อนแก้
+                self._x, self._y = self._x.copy(), self._y.copy()
+            self._x[i:n - 1] = self._x[i + 1:n]
+            self._y[i:n - 1] = self._y[i + 1:n]
+        else:
+            del self._x[i]
+            del self._y[i]
+        del self.names[i]
+        return city
+
+    def copy(self):
+        return CityTable(self.names, self.xs, self.ys)
+
+    def city(self, i):
+        return {'name': self.names[i], 'x': float(self.xs[i]), 'y': float(self.ys[i])}
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.city(j) for j in range(*i.indices(len(self.names)))]
+        return self.city(i)
+
+    def __iter__(self):
+        for i in range(len(self.names)):
+            yield self.city(i)
+
+    def to_dicts(self, order=None):
+        """แปลงกลับเป็น list ของ dict (ตามลำดับ order ถ้าส่งมา เช่น route)"""
+        return [self.city(int(i)) for i in (range(len(self.names)) if order is None else order)]
+
+def _xy(cities):
+    """คอลัมน์พิกัด (xs, ys): CityTable = view ไม่ copy, list ของ dict = ดึงค่าออกมาครั้งเดียว"""
+    if isinstance(cities, CityTable):
+        return cities.xs, cities.ys
+    if HAS_NUMPY:
+        n = len(cities)
+        return (np.fromiter((c['x'] for c in cities), dtype=np.float64, count=n),
+                np.fromiter((c['y'] for c in cities), dtype=np.float64, count=n))
+    return [c['x'] for c in cities], [c['y'] for c in cities]
+
+def _route_order(cities, route_path):
+    """กลับด้านของ _route: route แบบวนกลับ -> ลำดับ index (ไม่ซ้ำเมืองแรก)"""
+    if isinstance(cities, CityTable):
+        return [int(i) for i in route_path[:-1]]
+    index = {id(c): i for i, c in enumerate(cities)}
+    return [index[id(c)] for c in route_path[:-1]]
+
+def _route(cities, order):
+    """
+    ลำดับ index -> route แบบวนกลับ (เมืองแรก = เมืองสุดท้าย)
+    CityTable = index array, list ของ dict = list ของ dict (API เดิม)
+    """
+    order = order.tolist() if HAS_NUMPY and isinstance(order, np.ndarray) else list(order)
+    if order:
+        order.append(order[0])
+    if isinstance(cities, CityTable):
+        return np.array(order, dtype=np.intp) if HAS_NUMPY else order
+    return [cities[i] for i in order]
+
+# ==========================================
+# Distance Metrics (Euclidean / Haversine / Manhattan)
+# ==========================================
+# พิกัดตามหน้าจอ: x = Latitude, y = Longitude (หน่วยองศา)
+EARTH_RADIUS_KM = 6371.0088
+
+class _Kernel:
+    """
+    ฐานของ kernel ต่อ instance: เตรียมคอลัมน์ที่ต้องใช้ (radians, cos ฯลฯ) ครั้งเดียว
+    - arrays: คอลัมน์เป็น NumPy array (สำหรับ kernel แบบ batch)
+    - cols: คอลัมน์เป็น list (สำหรับคำนวณทีละคู่ใน Python)
+    - key(): ค่าที่เรียงลำดับเหมือนระยะจริงแต่ถูกกว่า, to_dist() แปลงกลับเป็นระยะจริง
+    """
+    kd_norm = 2
+
+    def __init__(self, xs, ys):
+        self.n = len(xs)
+        if HAS_NUMPY:
+            self.arrays = self._prepare_arrays(np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64))
+        else:
+            self.cols = self._prepare_lists([float(v) for v in xs], [float(v) for v in ys])
+
+    @cached_property
+    def cols(self):
+        return tuple(a.tolist() for a in self.arrays)
+
+    @property
+    def kd_columns(self):
+        return self.cols
+
+    def subset(self, ids):
+        """kernel ของเมืองบางส่วน (index ใหม่ = ตำแหน่งใน ids) ใช้คอลัมน์ที่เตรียมแล้ว -> ระยะเท่าเดิมทุกประการ"""
+        sub = object.__new__(type(self))
+        sub.n = len(ids)
+        if HAS_NUMPY:
+            sub.arrays = tuple(col[ids] for col in self.arrays)
+        else:
+            sub.cols = tuple([col[i] for i in ids] for col in self.cols)
+        return sub
+
+class _EuclideanKernel(_Kernel):
+    """ระยะแบบระนาบ: key = ระยะกำลังสอง (ไม่ต้อง sqrt ทุกคู่)"""
+
+    def _prepare_arrays(self, xs, ys):
+        return (xs, ys)
+
+    def _prepare_lists(self, xs, ys):
+        return (xs, ys)
+
+    def pair(self, i, j):
+        xs, ys = self.cols
+        return math.sqrt((xs[i] - xs[j])**2 + (ys[i] - ys[j])**2)
+
+    @staticmethod
+    def key(cols, point):
+        dx = cols[0] - point[0]
+        dy = cols[1] - point[1]
+        return dx * dx + dy * dy
+
+    @staticmethod
+    def to_dist(key):
+        return math.sqrt(key)
+
+    @staticmethod
+    def to_dist_array(keys):
+        return np.sqrt(keys)
+
+class _HaversineKernel(_Kernel):
+    """ระยะตามผิวโลก (km): เก็บ lat/lon เป็น radians และ cos(lat), key = chord^2 บนทรงกลมหนึ่งหน่วย (= 4 * hav)"""
+
+    def _prepare_arrays(self, xs, ys):
+        lat = np.radians(xs)
+        return (lat, np.radians(ys), np.cos(lat))
+
+    def _prepare_lists(self, xs, ys):
+        lat = [math.radians(v) for v in xs]
+        return (lat, [math.radians(v) for v in ys], [math.cos(v) for v in lat])
+
+    @cached_property
+    def kd_columns(self):
+        # จุดบนทรงกลม 3 มิติ: ระยะตรง (chord) เรียงลำดับเหมือนระยะตามผิวโลก
+        if HAS_NUMPY:
+            lat, lon, cos_lat = self.arrays
+            return ((cos_lat * np.cos(lon)).tolist(), (cos_lat * np.sin(lon)).tolist(), np.sin(lat).tolist())
+        lat, lon, cos_lat = self.cols
+        return ([c * math.cos(o) for c, o in zip(cos_lat, lon)],
+                [c * math.sin(o) for c, o in zip(cos_lat, lon)],
+                [math.sin(v) for v in lat])
+
+    def pair(self, i, j):
+        lat, lon, cos_lat = self.cols
+        a = math.sin((lat[i] - lat[j]) * 0.5)**2 + cos_lat[i] * cos_lat[j] * math.sin((lon[i] - lon[j]) * 0.5)**2
+        return 2.0 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+    @staticmethod
+    def key(cols, point):
+        s_lat = np.sin((cols[0] - point[0]) * 0.5)
+        s_lon = np.sin((cols[1] - point[1]) * 0.5)
+        return 4.0 * (s_lat * s_lat + cols[2] * point[2] * s_lon * s_lon)
+
+    @staticmethod
+    def to_dist(key):
+        return 2.0 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(key) * 0.5))
+
+    @staticmethod
+    def to_dist_array(keys):
+        return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(keys) * 0.5))
+
+class _ManhattanKernel(_Kernel):
+    """
+    ระยะแบบตาราง (km): ฉายพิกัดลงระนาบ (equirectangular) ที่ละติจูดของเมืองแรก (จุดเริ่มต้น)
+    แล้วใช้ |dx| + |dy| -> ระยะเดิมไม่เปลี่ยนเมื่อเพิ่มเมืองต่อท้าย
+    """
+    kd_norm = 1
+
+    @staticmethod
+    def _scales(lat0_deg):
+        ky = EARTH_RADIUS_KM * math.pi / 180.0
+        return ky, ky * math.cos(math.radians(lat0_deg))
+
+    def _prepare_arrays(self, xs, ys):
+        ky, kx = self._scales(float(xs[0]) if len(xs) else 0.0)
+        return (xs * ky, ys * kx)
+
+    def _prepare_lists(self, xs, ys):
+        ky, kx = self._scales(xs[0] if xs else 0.0)
+        return ([v * ky for v in xs], [v * kx for v in ys])
+
+    def pair(self, i, j):
+        xs, ys = self.cols
+        return abs(xs[i] - xs[j]) + abs(ys[i] - ys[j])
+
+    @staticmethod
+    def key(cols, point):
+        return np.abs(cols[0] - point[0]) + np.abs(cols[1] - point[1])
+
+    @staticmethod
+    def to_dist(key):
+        return key
+
+    @staticmethod
+    def to_dist_array(keys):
+        return keys
+
+class Metric:
+    """
+    วิธีวัดระยะทาง
+    - metric(c1, c2): ระยะระหว่าง 2 เมือง (เหมือน get_dist)
+    - metric.prepare(xs, ys): เตรียม kernel ต่อ instance ครั้งเดียว ให้ solver ใช้ทั้งแบบทีละคู่และแบบ batch
+    """
+    name = ""
+    unit = ""
+    kernel = None
+
+    def prepare(self, xs, ys):
+        return self.kernel(xs, ys)
+
+    def __call__(self, c1, c2):
+        return self.prepare([c1['x'], c2['x']], [c1['y'], c2['y']]).pair(0, 1)
+
+    def __repr__(self):
+        return f"{type(self).__name__}()"
+
+class EuclideanMetric(Metric):
+    """ระยะแบบระนาบบนพิกัดที่กรอก (ค่าเดิมของระบบ)"""
+    name = "euclidean"
+    unit = "Units"
+    kernel = _EuclideanKernel
+
+    def __call__(self, c1, c2):
+        return get_dist(c1, c2)
+
+class HaversineMetric(Metric):
+    """ระยะตามผิวโลก (great-circle) หน่วย km"""
+    name = "haversine"
+    unit = "km"
+    kernel = _HaversineKernel
+
+class ManhattanMetric(Metric):
+    """ระยะแบบตาราง (เหนือ-ใต้ + ตะวันออก-ตะวันตก) หน่วย km ฉายที่ละติจูดของเมืองแรก"""
+    name = "manhattan"
+    unit = "km"
+    kernel = _ManhattanKernel
+
+    def __call__(self, c1, c2, lat0=None):
+        # ทีละคู่: ฉายที่ละติจูดเฉลี่ยของคู่ (หรือ lat0 ของ instance ถ้าส่งมา) -> m(a, b) == m(b, a)
+        if lat0 is None:
+            lat0 = (c1['x'] + c2['x']) / 2
+        ky, kx = _ManhattanKernel._scales(lat0)
+        return abs(c1['x'] - c2['x']) * ky + abs(c1['y'] - c2['y']) * kx
+
+METRICS = {m.name: m for m in (EuclideanMetric(), HaversineMetric(), ManhattanMetric())}
+
+def get_metric(metric=None):
+    """แปลงชื่อ metric ("euclidean", "haversine", "manhattan") เป็น object, None = Euclidean"""
+    if metric is None:
+        return METRICS["euclidean"]
+    if isinstance(metric, str):
+        try:
+            return METRICS[metric.lower()]
+        except KeyError:
+            raise ValueError(f"Unknown metric: {metric!r}") from None
+    return metric
+
+# ==========================================
+# Distance Cache (Distance Matrix + LRU)
+# ==========================================
+# ขนาดสูงสุดที่ยอมสร้าง matrix n x n (float64 -> ~200 MB ที่ 5000 เมือง)
+MATRIX_MAX_CITIES = 5000
+
+class DistanceMatrix:
+    """
+    Distance matrix ที่เป็นเจ้าของชุดเมือง (cities)
+    - append()/extend(): คำนวณเฉพาะแถว/คอลัมน์ของเมืองใหม่ (ไม่คำนวณทั้ง matrix ใหม่)
+    - เพิ่มทีละเมือง: จองพื้นที่เผื่อแบบ doubling -> amortized O(n) / เพิ่มหลายเมืองพร้อมกัน: จองพอดี
+    - ใช้ NumPy ถ้ามี, ไม่มีก็ใช้ list ของ list
+    """
+
+    def __init__(self, cities=(), metric=None):
+        self.metric = get_metric(metric)
+        self.cities = []
+        self._index = {}    # id(city dict) -> index ใน matrix
+        self._cap = 0
+        self._xs = []
+        self._ys = []
+        self._d = [] if not HAS_NUMPY else np.zeros((0, 0))
+        self.extend(cities)
+
+    @classmethod
+    def from_matrix(cls, cities, matrix, metric=None):
+        """DistanceMatrix จาก matrix n x n ที่คำนวณไว้แล้ว (เช่น memmap ของ InstanceStore) ไม่คำนวณใหม่และไม่ copy"""
+        dm = cls(metric=metric)
+        dm.cities = cities.to_dicts() if isinstance(cities, CityTable) else list(cities)
+        dm._index = {id(c): i for i, c in enumerate(dm.cities)}
+        dm._cap = len(dm.cities)
+        xs, ys = _xy(dm.cities)
+        if HAS_NUMPY:
+            dm._xs, dm._ys, dm._d = xs, ys, matrix
+        else:
+            dm._xs, dm._ys, dm._d = xs, ys, [list(row) for row in matrix]
+        return dm
+
+    def __len__(self):
+        return len(self.cities)
+
+    @property
+    def nbytes(self):
+        if HAS_NUMPY:
+            return self._d.nbytes
+        return len(self.cities) ** 2 * 8
+
+    @property
+    def matrix(self):
+        """View ของ matrix ขนาด n x n (ไม่ copy)"""
+        n = len(self.cities)
+        if HAS_NUMPY:
+            return self._d[:n, :n]
+        if self._d and len(self._d[0]) != n:
+            return [row[:n] for row in self._d]   # view ที่ตัวเดิมต่อท้ายไปแล้ว (แถวยาวกว่า n)
+        return self._d
+
+    def _reserve(self, need):
+        if need <= self._cap or not HAS_NUMPY:
+            self._cap = max(self._cap, need)
+            return
+        n = len(self.cities)
+        if need == n + 1:
+            # เพิ่มทีละเมือง: จองเผื่อแบบ doubling (ไม่เกิน MATRIX_MAX_CITIES) -> amortized O(n)
+            cap = max(16, self._cap)
+            while cap < need:
+                cap *= 2
+            cap = max(need, min(cap, MATRIX_MAX_CITIES))
+        else:
+            # เพิ่มหลายเมืองในครั้งเดียว (import): จองพอดี ไม่เผื่อ (5000 เมือง = 200 MB ไม่ใช่ 8192^2 = 512 MB)
+            cap = need
+        d = np.zeros((cap, cap))
+        d[:n, :n] = self._d[:n, :n]
+        xs = np.zeros(cap)
+        ys = np.zeros(cap)
+        xs[:n] = self._xs[:n]
+        ys[:n] = self._ys[:n]
+        self._d, self._xs, self._ys, self._cap = d, xs, ys, cap
+
+    def append(self, city):
+        self.extend([city])
+
+    def extend(self, cities):
+        """เพิ่มเมือง: คำนวณเฉพาะแถว/คอลัมน์ใหม่ O(n * จำนวนเมืองใหม่)"""
+        cities = list(cities)
+        if not cities:
+            return
+        n = len(self.cities)
+        m = n + len(cities)
+        self._reserve(m)
+
+        if HAS_NUMPY:
+            self._xs[n:m] = [c['x'] for c in cities]
+            self._ys[n:m] = [c['y'] for c in cities]
+            kern = self.metric.prepare(self._xs[:m], self._ys[:m])
+            rows = [a[n:m, None] for a in kern.arrays]
+            cols = [a[None, :] for a in kern.arrays]
+            block = kern.to_dist_array(kern.key(cols, rows))
+            self._d[n:m, :m] = block
+            self._d[:m, n:m] = block.T
+        else:
+            if self._d and len(self._d[0]) != n:
+                self._d = [row[:n] for row in self._d]   # view: แยกแถวออกจากตัวเดิมก่อนต่อท้าย
+            self._xs.extend(c['x'] for c in cities)
+            self._ys.extend(c['y'] for c in cities)
+            kern = self.metric.prepare(self._xs, self._ys)
+            for i in range(n, m):
+                row = [kern.pair(i, j) for j in range(i)]
+                for r, v in zip(self._d, row):
+                    r.append(v)
+                row.append(0.0)
+                self._d.append(row)
+
+        for i, c in enumerate(cities, start=n):
+            self._index[id(c)] = i
+        self.cities.extend(cities)
+
+    def view(self):
+        """
+        DistanceMatrix ของ n เมืองตอนนี้ที่ใช้ storage ร่วมกับตัวนี้ O(n) (ไม่ copy matrix)
+        ตัวเดิมต่อท้ายภายหลังเขียนเฉพาะแถว/คอลัมน์ >= n (หรือจองที่ใหม่) -> view ไม่เห็นการเปลี่ยนแปลง
+        """
+        dm = DistanceMatrix(metric=self.metric)
+        dm.cities = list(self.cities)
+        dm._index = dict(self._index)
+        if HAS_NUMPY:
+            dm._xs, dm._ys, dm._d = self._xs, self._ys, self._d
+        else:
+            dm._xs, dm._ys, dm._d = list(self._xs), list(self._ys), list(self._d)
+        dm._cap = len(self.cities)   # view ต่อท้ายเอง -> จองที่ใหม่ ไม่เขียนทับ storage ร่วม
+        return dm
+
+    def index_of(self, city):
+        return self._index[id(city)]
+
+    def dist(self, i, j):
+        """ระยะทางระหว่างเมือง index i และ j"""
+        if HAS_NUMPY:
+            return self._d.item(i, j)
+        return self._d[i][j]
+
+    def get_dist(self, c1, c2):
+        """เหมือน get_dist แต่อ่านจาก matrix (c1, c2 ต้องเป็นเมืองใน matrix นี้)"""
+        return self.dist(self._index[id(c1)], self._index[id(c2)])
+
+    @property
+    def unit(self):
+        return self.metric.unit
+
+    def route_length(self, route_path):
+        """ระยะทางรวมของ route_path (list ของ dict) จาก matrix"""
+        idx = [self._index[id(c)] for c in route_path]
+        return sum(self.dist(a, b) for a, b in zip(idx, idx[1:]))
+
+    def covers(self, cities, n=None):
+        """True ถ้า cities (เฉพาะ n เมืองแรก ถ้าระบุ) เป็นชุดเดียวกับใน matrix (เรียงตามลำดับเดียวกัน)"""
+        n = len(cities) if n is None else n
+        if n != len(self.cities):
+            return False
+        if isinstance(cities, CityTable):
+            # CityTable สร้าง dict ใหม่ทุกครั้ง -> เทียบเนื้อหา (ชื่อ + พิกัด) แทน identity
+            return (list(cities.xs[:n]) == list(self._xs[:n]) and list(cities.ys[:n]) == list(self._ys[:n])
+                    and cities.names[:n] == [c['name'] for c in self.cities])
+        return all(a is b for a, b in zip(cities, self.cities))
+
+def instance_key(cities):
+    """Content hash ของชุดเมือง (ชื่อ + พิกัด ตามลำดับ)"""
+    h = hashlib.sha1()
+    for c in cities:
+        h.update(f"{c['name']}\x1f{c['x']!r}\x1f{c['y']!r}\x1e".encode())
+    return h.hexdigest()
+
+class DistanceCache:
+    """
+    เก็บ DistanceMatrix หลายชุด (หลาย instance) แบบ LRU ภายใต้เพดานหน่วยความจำ
+    - get(cities): ถ้าเคยคำนวณแล้วคืนของเดิมทันที
+    - ถ้า cities คือชุดเดิมที่ "ต่อท้าย" เพิ่มมา -> คำนวณเฉพาะแถว/คอลัมน์ใหม่
+    - แยก entry ตาม metric (ชุดเมืองเดียวกันคนละ metric = คนละ matrix)
+    - thread-safe (ใช้ร่วมกันหลาย session ได้): เก็บ matrix แบบต่อท้ายอย่างเดียวแล้วคืน view (ดู DistanceMatrix.view)
+      ต่อท้ายทำในที่เดิม (ไม่ copy n x n) ผู้ที่ถือ view เดิมอยู่ (กำลัง solve) จึงไม่เห็นการเปลี่ยนแปลง
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # key -> DistanceMatrix ตัวจริง (ท้ายสุด = ใช้ล่าสุด) ไม่ส่งออกไปตรงๆ
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    @property
+    def nbytes(self):
+        with self._lock:
+            return sum(dm.nbytes for dm in self._entries.values())
+
+    def get(self, cities, metric=None):
+        if len(cities) > MATRIX_MAX_CITIES:
+            return None
+        metric = get_metric(metric)
+        with self._lock:
+            return self._get(cities, metric)
+
+    def _get(self, cities, metric):
+
+        # hash แบบต่อเนื่อง: เก็บ hash ของ prefix ทุกความยาวที่มีใน cache ระหว่างทาง
+        prefix_lens = {len(dm) for dm in self._entries.values() if 0 < len(dm) < len(cities)}
+        prefix_keys = {}
+        h = hashlib.sha1(metric.name.encode())
+        for i, c in enumerate(cities, start=1):
+            h.update(f"{c['name']}\x1f{c['x']!r}\x1f{c['y']!r}\x1e".encode())
+            if i in prefix_lens:
+                prefix_keys[h.hexdigest()] = i
+        key = h.hexdigest()
+
+        dm = self._entries.get(key)
+        if dm is not None and dm.covers(cities):
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return dm.view()
+
+        self.misses += 1
+        base = None
+        for k, n in sorted(prefix_keys.items(), key=lambda kv: -kv[1]):
+            cand = self._entries.get(k)
+            if cand is not None and cand.covers(cities, n):
+                base = cand
+                del self._entries[k]
+                break
+
+        if base is None:
+            dm = DistanceMatrix(cities, metric)
+        else:
+            # ต่อท้ายในที่เดิม (doubling ของ _reserve) view ที่คืนไปก่อนหน้ายังเห็นแค่ prefix ของมัน
+            dm = base
+            dm.extend(cities[len(dm):])
+
+        self._entries[key] = dm
+        self._evict()
+        return dm.view()
+
+    def _evict(self):
+        # ทิ้งตัวที่ไม่ได้ใช้นานที่สุดจนกว่าจะอยู่ใต้เพดาน (ตัวล่าสุดเก็บไว้เสมอ)
+        while len(self._entries) > 1 and self.nbytes > self.max_bytes:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# ==========================================
+# Progress / Cancel (สำหรับรัน solver ใน thread เบื้องหลัง)
+# ==========================================
+# เรียก progress callback ไม่ถี่กว่านี้ (วินาที)
+PROGRESS_INTERVAL = 0.2
+
+class SolveCancelled(Exception):
+    """progress callback สั่งยกเลิกก่อนได้ทัวร์แรก (ระหว่าง Nearest Neighbor)"""
+
+class _Reporter:
+    """
+    ห่อ progress(stage, done, total, tour) ของผู้ใช้ ให้เรียกจริงไม่ถี่เกิน PROGRESS_INTERVAL
+    callback คืนค่า True = สั่งยกเลิก (หยุดแบบ cooperative ที่จุดตรวจถัดไป)
+    cities: ถ้ามี จะแปลงลำดับ index เป็น route (วนกลับ, ดู _route) ส่งให้ callback เป็น tour
+    """
+    def __init__(self, progress, stage, cities=None):
+        self.progress = progress
+        self.stage = stage
+        self.cities = cities
+        self.next_time = 0.0
+
+    def __call__(self, done, total, order_fn=None):
+        now = time.perf_counter()
+        if now < self.next_time:
+            return False
+        self.next_time = now + PROGRESS_INTERVAL
+        tour = None
+        if order_fn is not None and self.cities is not None:
+            tour = _route(self.cities, order_fn())
+        return bool(self.progress(self.stage, done, total, tour))
+
+# ==========================================
+# Instrumentation (สถิติการแก้ 1 ครั้ง)
+# ==========================================
+class SolveStats:
+    """
+    เก็บสถิติของการแก้ 1 ครั้ง: ส่งเป็น stats= ให้ solver (ไม่ส่ง = ไม่เก็บอะไรเลย, แทบไม่มี overhead)
+    - phases: เวลาของแต่ละขั้น (วินาที) "setup", "construction", "candidates", "improvement", "exact", "bound"
+    - counters: "distance_evals" (จำนวนครั้งที่คำนวณ/อ่านระยะ), "nn_steps", "improve_checks",
+      "two_opt_moves", "or_opt_moves", "multistart_starts"
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.counters = {}
+
+    @contextmanager
+    def phase(self, name):
+        """จับเวลาขั้น name (เรียกซ้ำได้ เวลาจะถูกรวมกัน)"""
+        started = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - started
+
+    def count(self, name, k=1):
+        self.counters[name] = self.counters.get(name, 0) + k
+
+    @property
+    def seconds(self):
+        return sum(self.phases.values())
+
+    def as_dict(self):
+        """คืนค่าเป็น dict ธรรมดา (pickle / JSON ได้)"""
+        return {"seconds": self.seconds, "phases": dict(self.phases), "counters": dict(self.counters)}
+
+    def format(self):
+        """ข้อความสรุป 2 บรรทัด สำหรับแสดงในหน้าจอผลลัพธ์"""
+        return format_stats(self.as_dict())
+
+# ลำดับการแสดงผลของแต่ละขั้น (ตามลำดับที่ solver ทำงาน)
+STAT_PHASES = ("setup", "construction", "candidates", "improvement", "exact", "bound")
+
+def format_stats(stats):
+    """แปลง SolveStats.as_dict() เป็นข้อความ: บรรทัดแรก = เวลาแต่ละขั้น, บรรทัดสอง = ตัวนับ"""
+    order = sorted(stats["phases"], key=lambda p: STAT_PHASES.index(p) if p in STAT_PHASES else len(STAT_PHASES))
+    phases = " | ".join(f"{name} {stats['phases'][name] * 1000:.1f} ms" for name in order)
+    counters = " | ".join(f"{name.replace('_', ' ')} {value:,}" for name, value in stats["counters"].items())
+    return f"{phases}\n{counters}" if counters else phases
+
+def _phase(stats, name):
+    return stats.phase(name) if stats is not None else nullcontext()
+
+def _counted(dist, stats):
+    """ห่อฟังก์ชันระยะให้นับ distance_evals (ใช้เฉพาะตอนเปิด stats)"""
+    counters = stats.counters
+    counters.setdefault("distance_evals", 0)
+
+    def counted(i, j):
+        counters["distance_evals"] += 1
+        return dist(i, j)
+    return counted
+
+def _nn_order_python(kern, start=0, dist=None, progress=None):
+    """
+    Nearest Neighbor แบบ Python แท้ (ไม่ต้องใช้ NumPy)
+    dist(i, j): ระยะระหว่าง index (ค่าเริ่มต้น = kern.pair)
+    progress: _Reporter (ถ้ามี) คืนค่า True = ยกเลิก -> raise SolveCancelled
+    คืนค่า: (ระยะทางรวมแบบยังไม่วนกลับ, ลำดับ index ของเมือง)
+    """
+    dist = dist or kern.pair
+    unvisited = list(range(kern.n))
+
     # เริ่มต้นที่เมืองแรกที่ User เพิ่มเข้ามา
-    current_city = unvisited.pop(0)
-    route_path = [current_city]
+    current = unvisited.pop(start)
+    order = [current]
     total_distance = 0
 
     while unvisited:
-        # หาเมืองที่ใกล้ current_city ที่สุด (Greedy Approach)
-        nearest_city = min(unvisited, key=lambda city: get_dist(current_city, city))
-        
+        if progress is not None and len(order) % 64 == 0 and progress(len(order), kern.n):
+            raise SolveCancelled()
+        # หาเมืองที่ใกล้ current ที่สุด (Greedy Approach)
+        nearest = min(unvisited, key=lambda c: dist(current, c))
+
         # บวกระยะทาง
-        total_distance += get_dist(current_city, nearest_city)
-        
+        total_distance += dist(current, nearest)
+
         # Move ไปเมืองนั้น
-        current_city = nearest_city
-        route_path.append(current_city)
-        unvisited.remove(current_city)
-
-    # วนกลับจุดเริ่มต้น (Loop back to start)
-    if len(route_path) > 1:
-        total_distance += get_dist(route_path[-1], route_path[0])
-        route_path.append(route_path[0])
-        
-    return total_distance, route_path
\ No newline at end of file
+        current = nearest
+        order.append(current)
+        unvisited.remove(current)
+
+    return total_distance, order
+
+def _nn_order_numpy(kern, start=0, dmat=None, progress=None, stats=None):
+    """
+    Nearest Neighbor แบบ Vectorized (NumPy)
+    kern: kernel ของ metric (พิกัดที่เตรียมไว้เป็น float array ต่อเนื่องกันในหน่วยความจำ)
+    dmat: distance matrix (ถ้ามี) -> อ่านระยะจากแถวของ matrix แทนการคำนวณใหม่
+    stats: SolveStats (ถ้ามี) บวกจำนวนระยะที่คำนวณเข้า distance_evals
+    คืนค่า: (ระยะทางรวมแบบยังไม่วนกลับ, ลำดับ index ของเมือง)
+    """
+    n = kern.n
+    arrays = kern.arrays
+    order = np.empty(n, dtype=np.intp)
+    order[0] = start
+
+    # ชุดเมืองที่ยังไม่ไป (เรียงตามลำดับเดิมเสมอ เพื่อให้ผลตอนระยะเท่ากันตรงกับแบบ Python)
+    ids = np.delete(np.arange(n), start)
+    cols = [a[ids] for a in arrays]
+    dead = np.zeros(len(ids), dtype=bool)
+    n_dead = 0
+
+    cur = start
+    total_distance = 0.0
+    evals = 0
+    for step in range(1, n):
+        if progress is not None and step % 256 == 0 and progress(step, n):
+            raise SolveCancelled()
+        if dmat is not None:
+            keys = dmat[cur, ids]
+        else:
+            keys = kern.key(cols, [a[cur] for a in arrays])
+        keys[dead] = np.inf
+        evals += len(keys)
+
+        # Masked argmin = เมืองที่ใกล้ที่สุดที่ยังไม่ได้ไป
+        k = int(np.argmin(keys))
+        total_distance += keys.item(k) if dmat is not None else kern.to_dist(keys.item(k))
+        cur = int(ids[k])
+        order[step] = cur
+        dead[k] = True
+        n_dead += 1
+
+        # บีบ array ทิ้งเมืองที่ไปแล้วเมื่อเกินครึ่ง (amortized O(n) ต่อรอบ)
+        if n_dead * 2 > len(ids):
+            keep = ~dead
+            ids = ids[keep]
+            cols = [c[keep] for c in cols]
+            dead = np.zeros(len(ids), dtype=bool)
+            n_dead = 0
+
+    if stats is not None:
+        stats.count("distance_evals", evals)
+    return total_distance, order
+
+class KDTree:
+    """
+    KD-tree สำหรับหา "เมืองที่ยังไม่ได้ไป" ที่ใกล้ที่สุด
+    - ลบจุดออกได้ (ใช้ตอนเดินทางไปเมืองนั้นแล้ว)
+    - แต่ละ node เก็บจำนวนจุดที่ยังเหลือ เพื่อตัด subtree ที่ว่างทิ้งทันที
+    - ไม่ต้องสร้าง distance matrix n x n
+    - กี่มิติก็ได้ (KDTree(xs, ys) หรือ KDTree(xs, ys, zs)), norm=2 คืนค่าระยะกำลังสอง, norm=1 คืนค่าระยะ Manhattan
+    """
+
+    def __init__(self, *columns, leaf_size=8, norm=2):
+        self.cols = [[float(v) for v in col] for col in columns]
+        self.dims = len(self.cols)
+        self.norm = norm
+        n = len(self.cols[0])
+        self.size = n
+        self.evals = 0      # จำนวนจุดที่วัดระยะไปแล้วในทุก query (สำหรับ SolveStats)
+
+        # โครงสร้าง node แบบ flat list (index = node id, root = 0)
+        self.axis = []      # แกนที่ใช้แบ่ง, -1 = leaf
+        self.split = []     # ค่าที่ใช้แบ่ง
+        self.left = []
+        self.right = []
+        self.parent = []
+        self.count = []     # จำนวนจุดที่ยังไม่ถูกลบใน subtree
+        self.points = []    # รายการจุดใน leaf (node ภายในเป็น None)
+        self.leaf_of = [0] * n
+
+        self._build(list(range(n)), leaf_size)
+
+    def _new_node(self, parent, size):
+        self.axis.append(-1)
+        self.split.append(0.0)
+        self.left.append(-1)
+        self.right.append(-1)
+        self.parent.append(parent)
+        self.count.append(size)
+        self.points.append(None)
+        return len(self.axis) - 1
+
+    def _build(self, ids, leaf_size):
+        root = self._new_node(-1, len(ids))
+        stack = [(root, ids)]
+        while stack:
+            node, ids = stack.pop()
+            if len(ids) <= leaf_size:
+                self.points[node] = ids
+                for i in ids:
+                    self.leaf_of[i] = node
+                continue
+
+            # แบ่งตามแกนที่ข้อมูลกระจายกว้างที่สุด ที่ค่ามัธยฐาน
+            spread = []
+            for col in self.cols:
+                vals = [col[i] for i in ids]
+                spread.append(max(vals) - min(vals))
+            axis = spread.index(max(spread))
+            col = self.cols[axis]
+            ids.sort(key=col.__getitem__)
+            mid = len(ids) // 2
+
+            self.axis[node] = axis
+            self.split[node] = col[ids[mid]]
+            left = self._new_node(node, mid)
+            right = self._new_node(node, len(ids) - mid)
+            self.left[node] = left
+            self.right[node] = right
+            stack.append((left, ids[:mid]))
+            stack.append((right, ids[mid:]))
+
+    def __len__(self):
+        return self.size
+
+    def remove(self, i):
+        """ลบจุด i ออกจาก tree (O(leaf_size + ความลึก))"""
+        node = self.leaf_of[i]
+        self.points[node].remove(i)
+        while node != -1:
+            self.count[node] -= 1
+            node = self.parent[node]
+        self.size -= 1
+
+    def insert(self, *q):
+        """เพิ่มจุดใหม่ลงใน leaf ที่ครอบคลุมจุดนั้น (O(ความลึก), ไม่ balance ใหม่) คืนค่า index ของจุด"""
+        i = len(self.cols[0])
+        for col, v in zip(self.cols, q):
+            col.append(float(v))
+        node = 0
+        while self.axis[node] >= 0:
+            self.count[node] += 1
+            node = self.left[node] if q[self.axis[node]] < self.split[node] else self.right[node]
+        self.count[node] += 1
+        self.points[node].append(i)
+        self.leaf_of.append(node)
+        self.size += 1
+        return i
+
+    def point(self, i):
+        return tuple(col[i] for col in self.cols)
+
+    def _key(self, i, q):
+        # ระยะจากจุด i ถึง q (norm=2 -> กำลังสอง)
+        if self.norm == 2:
+            return sum((col[i] - v)**2 for col, v in zip(self.cols, q))
+        return sum(abs(col[i] - v) for col, v in zip(self.cols, q))
+
+    def nearest(self, *q):
+        """คืนค่า (index, key) ของจุดที่ใกล้ q ที่สุด, (-1, inf) ถ้า tree ว่าง"""
+        axis, split, count, points = self.axis, self.split, self.count, self.points
+        left, right = self.left, self.right
+        fast = self.dims == 2 and self.norm == 2
+        l2 = self.norm == 2
+        if fast:
+            xs, ys = self.cols
+            x, y = q
+        best, best_key = -1, math.inf
+        evals = 0
+
+        stack = [(0.0, 0)]
+        while stack:
+            bound, node = stack.pop()
+            if bound >= best_key or count[node] == 0:
+                continue
+            a = axis[node]
+            if a < 0:
+                evals += len(points[node])
+                for i in points[node]:
+                    if fast:
+                        dx = xs[i] - x
+                        dy = ys[i] - y
+                        key = dx * dx + dy * dy
+                    else:
+                        key = self._key(i, q)
+                    if key < best_key:
+                        best, best_key = i, key
+                continue
+
+            diff = q[a] - split[node]
+            if diff < 0:
+                near, far = left[node], right[node]
+            else:
+                near, far = right[node], left[node]
+            # ใส่ฝั่งไกลก่อน เพื่อให้ฝั่งใกล้ถูก pop ออกมาตรวจก่อน
+            stack.append((max(bound, diff * diff if l2 else abs(diff)), far))
+            stack.append((bound, near))
+
+        self.evals += evals
+        return best, best_key
+
+    def nearest_k(self, k, *q):
+        """คืนค่า list ของ (key, index) ที่ใกล้ q ที่สุด k จุด เรียงจากใกล้ไปไกล"""
+        axis, split, count, points = self.axis, self.split, self.count, self.points
+        left, right = self.left, self.right
+        fast = self.dims == 2 and self.norm == 2
+        l2 = self.norm == 2
+        if fast:
+            xs, ys = self.cols
+            x, y = q
+        heap = []  # max-heap ขนาด k (เก็บค่าติดลบ)
+        worst = math.inf
+        evals = 0
+
+        stack = [(0.0, 0)]
+        while stack:
+            bound, node = stack.pop()
+            if bound >= worst or count[node] == 0:
+                continue
+            a = axis[node]
+            if a < 0:
+                evals += len(points[node])
+                for i in points[node]:
+                    if fast:
+                        dx = xs[i] - x
+                        dy = ys[i] - y
+                        key = dx * dx + dy * dy
+                    else:
+                        key = self._key(i, q)
+                    if key < worst:
+                        if len(heap) < k:
+                            heapq.heappush(heap, (-key, i))
+                        else:
+                            heapq.heapreplace(heap, (-key, i))
+                        if len(heap) == k:
+                            worst = -heap[0][0]
+                continue
+
+            diff = q[a] - split[node]
+            if diff < 0:
+                near, far = left[node], right[node]
+            else:
+                near, far = right[node], left[node]
+            stack.append((max(bound, diff * diff if l2 else abs(diff)), far))
+            stack.append((bound, near))
+
+        self.evals += evals
+        return sorted((-key, i) for key, i in heap)
+
+def _nn_order_kdtree(kern, start=0, progress=None, stats=None):
+    """
+    Nearest Neighbor ผ่าน KD-tree: แต่ละก้าว query + ลบจุด ~O(log n)
+    รวมทั้งเส้นทาง ~O(n log n) และใช้หน่วยความจำ O(n)
+    คืนค่า: (ระยะทางรวมแบบยังไม่วนกลับ, ลำดับ index ของเมือง)
+    """
+    tree = KDTree(*kern.kd_columns, norm=kern.kd_norm)
+    tree.remove(start)
+    order = [start]
+    total_distance = 0.0
+    cur = start
+    while len(tree):
+        if progress is not None and len(order) % 256 == 0 and progress(len(order), kern.n):
+            raise SolveCancelled()
+        i, key = tree.nearest(*tree.point(cur))
+        tree.remove(i)
+        order.append(i)
+        total_distance += kern.to_dist(key)
+        cur = i
+    if stats is not None:
+        stats.count("distance_evals", tree.evals)
+    return total_distance, order
+
+def _resolve_metric(metric, distances):
+    if distances is None:
+        return get_metric(metric)
+    if metric is not None and get_metric(metric).name != distances.metric.name:
+        raise ValueError("metric does not match the metric of distances")
+    return distances.metric
+
+def _resolve_engine(engine, n):
+    if engine == "auto":
+        if n >= KDTREE_THRESHOLD:
+            return "kdtree"
+        return "numpy" if HAS_NUMPY else "python"
+    if engine == "numpy" and not HAS_NUMPY:
+        raise ValueError("engine='numpy' requires NumPy to be installed")
+    if engine not in ("numpy", "kdtree", "python"):
+        raise ValueError(f"Unknown engine: {engine!r}")
+    return engine
+
+def _nn_order(kern, start, engine, distances=None, progress=None, stats=None):
+    """เรียก Nearest Neighbor ตาม engine ที่เลือก (engine ต้องผ่าน _resolve_engine แล้ว)"""
+    if engine == "numpy":
+        dmat = distances.matrix if distances is not None else None
+        return _nn_order_numpy(kern, start, dmat=dmat, progress=progress, stats=stats)
+    if engine == "kdtree":
+        return _nn_order_kdtree(kern, start, progress=progress, stats=stats)
+    dist = distances.dist if distances is not None else None
+    if stats is not None:
+        dist = _counted(dist or kern.pair, stats)
+    return _nn_order_python(kern, start, dist=dist, progress=progress)
+
+def solve_tsp_nearest_neighbor(cities, engine="auto", distances=None, metric=None, progress=None, stats=None):
+    """
+    Algorithm: Nearest Neighbor Method
+    engine: "auto", "numpy", "kdtree" หรือ "python"
+      - "auto": ใช้ KD-tree เมื่อมีเมืองตั้งแต่ KDTREE_THRESHOLD ขึ้นไป, นอกนั้นใช้ NumPy ถ้ามี
+    distances: DistanceMatrix ของชุดเมืองนี้ (ถ้ามี) -> อ่านระยะจาก cache แทนการคำนวณใหม่
+    metric: "euclidean" (ค่าเริ่มต้น), "haversine" หรือ "manhattan" (km) หรือ Metric object
+    progress: callback(stage, done, total, tour) คืนค่า True = ยกเลิก (raise SolveCancelled)
+    stats: SolveStats (ถ้ามี) บันทึกเวลา setup/construction และจำนวนการคำนวณระยะ
+    คืนค่า: (Total Distance, Route Path List) หรือ route เป็น index array ถ้า cities เป็น CityTable
+    """
+    if not len(cities):
+        return 0, _route(cities, [])
+    with _phase(stats, "setup"):
+        if distances is not None and not distances.covers(cities):
+            raise ValueError("distances must be built from the same cities (same order)")
+        metric = _resolve_metric(metric, distances)
+        kern = metric.prepare(*_xy(cities))
+        engine = _resolve_engine(engine, len(cities))
+
+    with _phase(stats, "construction"):
+        dist = distances.dist if distances is not None else kern.pair
+        reporter = _Reporter(progress, "nearest_neighbor") if progress is not None else None
+        total_distance, order = _nn_order(kern, 0, engine, distances, progress=reporter, stats=stats)
+
+        route_path = _route(cities, order)
+
+        # วนกลับจุดเริ่มต้น (Loop back to start)
+        if len(order) > 1:
+            total_distance += dist(int(order[-1]), int(order[0]))
+        else:
+            route_path = route_path[:1]
+    if stats is not None:
+        stats.count("nn_steps", len(order) - 1)
+    return total_distance, route_path
+
+# ==========================================
+# Multi-start Nearest Neighbor (Process Pool)
+# ==========================================
+# สถานะใน worker process แต่ละตัว: kernel ที่เตรียมจากพิกัดใน shared memory ครั้งเดียว
+_WORKER = {}
+
+def _worker_init(coords, metric):
+    # coords = ("shm", ชื่อ segment, n)  -> อ่านพิกัดจาก shared memory โดยตรง (ไม่ copy)
+    #          ("mmap", ไฟล์ x, ไฟล์ y, n) -> เปิดคอลัมน์จากไฟล์ของ InstanceStore เอง (ไม่ copy)
+    #          ("list", xs, ys)          -> กรณีไม่มี NumPy
+    if coords[0] == "mmap":
+        xs = np.memmap(coords[1], dtype=np.float64, mode="r", shape=(coords[3],))
+        ys = np.memmap(coords[2], dtype=np.float64, mode="r", shape=(coords[3],))
+    elif coords[0] == "shm":
+        # worker เป็น child process จึงใช้ resource tracker ตัวเดียวกับ process หลัก
+        # (process หลักเป็นคน unlink segment เมื่อเสร็จงาน)
+        shm = shared_memory.SharedMemory(name=coords[1])
+        _WORKER['shm'] = shm  # ต้องถือ reference ไว้ตลอดอายุ worker
+        xy = np.ndarray((2, coords[2]), dtype=np.float64, buffer=shm.buf)
+        xs, ys = xy[0], xy[1]
+    else:
+        xs, ys = coords[1], coords[2]
+    _WORKER['kern'] = metric.prepare(xs, ys)
+
+@contextmanager
+def _kernel_workers(xs, ys, metric, workers):
+    """
+    เตรียม kernel ของ instance ไว้ใน _WORKER ของทุก worker
+    workers <= 1: เตรียมใน process นี้แล้ว yield None / มากกว่านั้น: yield ProcessPoolExecutor
+    (พิกัดส่งผ่าน shared memory ถ้ามี NumPy ไม่ต้อง pickle ให้ทุก worker
+     ถ้าพิกัด map มาจาก InstanceStore ทั้งไฟล์ worker เปิดไฟล์เดียวกันแทน ไม่ต้อง copy เข้า shared memory)
+    """
+    if workers <= 1:
+        _worker_init(("list", xs, ys), metric)
+        try:
+            yield None
+        finally:
+            _WORKER.clear()
+        return
+
+    n = len(xs)
+    shm = None
+    mapped = (_mapped_file(xs), _mapped_file(ys))
+    if None not in mapped:
+        coords = ("mmap", *mapped, n)
+    elif HAS_NUMPY:
+        shm = shared_memory.SharedMemory(create=True, size=2 * n * 8)
+        xy = np.ndarray((2, n), dtype=np.float64, buffer=shm.buf)
+        xy[0] = xs
+        xy[1] = ys
+        coords = ("shm", shm.name, n)
+    else:
+        coords = ("list", xs, ys)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_worker_init, initargs=(coords, metric)) as pool:
+            yield pool
+    finally:
+        if shm is not None:
+            del xy
+            shm.close()
+            shm.unlink()
+
+def _multistart_chunk(starts, engine):
+    """รัน NN จากหลายจุดเริ่มต้น คืนค่าเฉพาะทัวร์ที่สั้นที่สุดของ chunk (ลดข้อมูลที่ส่งกลับ)"""
+    kern = _WORKER['kern']
+    best = None
+    for start in starts:
+        total, order = _nn_order(kern, start, engine)
+        total += kern.pair(order[-1], order[0])
+        if best is None or total < best[0]:
+            best = (total, start, [int(i) for i in order])
+    return best
+
+def solve_tsp_multistart(cities, n_starts=None, workers=None, engine="auto", metric=None, seed=0, progress=None,
+                         stats=None):
+    """
+    Algorithm: Multi-start Nearest Neighbor
+    รัน NN จากหลายเมืองเริ่มต้นพร้อมกันใน process pool (ใช้ทุก core) แล้วเลือกทัวร์ที่สั้นที่สุด
+    n_starts: จำนวนจุดเริ่มต้น (สุ่มด้วย seed โดยมีเมืองแรกเสมอ), None = ทุกเมือง
+    workers: จำนวน process (None = จำนวน core), 1 = รันใน process นี้
+    progress: callback(stage, done, total, tour) ตรวจทุกครั้งที่ chunk เสร็จ คืนค่า True = ยกเลิก
+    stats: SolveStats (ถ้ามี) บันทึกเวลารวมเป็น construction และจำนวนจุดเริ่มต้น (งานใน worker ไม่ถูกนับ distance_evals)
+    คืนค่า: (Total Distance, Route Path List หรือ index array ถ้าเป็น CityTable) ที่หมุนให้เริ่ม/จบที่เมืองแรก (depot)
+    """
+    n = len(cities)
+    if n < 3:
+        return solve_tsp_nearest_neighbor(cities, engine=engine, metric=metric, progress=progress, stats=stats)
+    with _phase(stats, "construction"):
+        total_distance, route_path, n_starts = _multistart(cities, n_starts, workers, engine, metric, seed, progress)
+    if stats is not None:
+        stats.count("multistart_starts", n_starts)
+    return total_distance, route_path
+
+def _multistart(cities, n_starts, workers, engine, metric, seed, progress):
+    n = len(cities)
+    metric = get_metric(metric)
+    engine = _resolve_engine(engine, n)
+
+    if n_starts is None or n_starts >= n:
+        starts = list(range(n))
+    else:
+        starts = [0] + random.Random(seed).sample(range(1, n), max(0, n_starts - 1))
+
+    workers = min(workers or os.cpu_count() or 1, len(starts))
+    xs, ys = _xy(cities)
+    # แบ่งงานเป็น chunk ละหลายจุดเริ่มต้น (~4 chunk ต่อ worker) ลด overhead การส่งงาน
+    size = max(1, math.ceil(len(starts) / (workers * 4)))
+    chunks = [starts[i:i + size] for i in range(0, len(starts), size)]
+    reporter = _Reporter(progress, "multistart") if progress is not None else None
+
+    with _kernel_workers(xs, ys, metric, workers) as pool:
+        results = []
+        if pool is None:
+            for chunk in chunks:
+                results.append(_multistart_chunk(chunk, engine))
+                if reporter is not None and reporter(len(results), len(chunks)):
+                    raise SolveCancelled()
+        else:
+            futures = [pool.submit(_multistart_chunk, chunk, engine) for chunk in chunks]
+            for fut in as_completed(futures):
+                results.append(fut.result())
+                if reporter is not None and reporter(len(results), len(chunks)):
+                    for f in futures:
+                        f.cancel()
+                    raise SolveCancelled()
+    best = min(results, key=lambda r: (r[0], r[1]))
+
+    total_distance, _, order = best
+    # หมุนทัวร์ให้เริ่มที่ depot (เมืองแรก) ระยะทางรวมเท่าเดิม
+    k = order.index(0)
+    return total_distance, _route(cities, order[k:] + order[:k]), len(starts)
+
+# ==========================================
+# Space-filling Curve (Hilbert) Construction
+# ==========================================
+# ความละเอียดสูงสุดของ grid ต่อแกน (bits) -> Hilbert index ไม่เกิน 2 * bits บิต
+HILBERT_MAX_BITS = 16
+
+def _hilbert_bits(n):
+    # ~4 cell ต่อเมืองก็พอ (เมืองใน cell เดียวกันเรียงตามลำดับเดิม) ใช้ bit น้อย = รอบ loop น้อย
+    return max(1, min(HILBERT_MAX_BITS, math.ceil(math.log2(max(n, 2)) / 2) + 1))
+
+def _hilbert_index_numpy(xs, ys, bits):
+    """Hilbert index ของทุกจุดพร้อมกัน (vectorized): วน bits รอบ แต่ละรอบเป็น array op บนทุกเมือง"""
+    side = 1 << bits
+    top = side - 1
+
+    def to_grid(v):
+        lo, span = v.min(), np.ptp(v)
+        if span == 0:
+            return np.zeros(len(v), dtype=np.uint32)
+        return np.minimum((v - lo) * (side / span), top).astype(np.uint32)
+
+    x, y = to_grid(xs), to_grid(ys)
+    d = np.zeros(len(x), dtype=np.uint32)
+    rx = np.empty_like(x)
+    ry = np.empty_like(x)
+    t = np.empty_like(x)
+    for k in range(bits - 1, -1, -1):
+        s = np.uint32(1 << k)
+        np.right_shift(x, k, out=rx); rx &= 1
+        np.right_shift(y, k, out=ry); ry &= 1
+        # d += s*s * ((3 * rx) ^ ry)
+        np.multiply(rx, 3, out=t); t ^= ry; t *= s * s; d += t
+        # หมุน/สะท้อน quadrant (rot ของ xy2d) แบบไม่แตก branch: mask = 0 หรือ top
+        ry ^= 1                         # ry = 1 เมื่อต้องหมุน
+        np.multiply(rx & ry, top, out=t)
+        x ^= t; y ^= t                  # สะท้อนเมื่อ rx = 1, ry = 0
+        ry *= top
+        np.bitwise_xor(x, y, out=t); t &= ry
+        x ^= t; y ^= t                  # สลับ x, y เมื่อ ry = 0
+    return d
+
+def _hilbert_index_python(xs, ys, bits):
+    side = 1 << bits
+    top = side - 1
+    lo_x, lo_y = min(xs), min(ys)
+    kx = side / ((max(xs) - lo_x) or 1.0)
+    ky = side / ((max(ys) - lo_y) or 1.0)
+    out = []
+    for vx, vy in zip(xs, ys):
+        x = min(int((vx - lo_x) * kx), top)
+        y = min(int((vy - lo_y) * ky), top)
+        d = 0
+        s = side >> 1
+        while s > 0:
+            rx = 1 if x & s else 0
+            ry = 1 if y & s else 0
+            d += s * s * ((3 * rx) ^ ry)
+            if not ry:
+                if rx:
+                    x, y = x ^ top, y ^ top
+                x, y = y, x
+            s >>= 1
+        out.append(d)
+    return out
+
+def _tour_length_kernel(kern, order):
+    """ความยาวทัวร์แบบวนกลับ คำนวณทุกเส้นพร้อมกันด้วย kernel ของ metric"""
+    if HAS_NUMPY:
+        a = [col[order] for col in kern.arrays]
+        b = [np.roll(col, -1) for col in a]
+        return float(kern.to_dist_array(kern.key(a, b)).sum())
+    return _tour_length(kern.pair, order)
+
+def solve_tsp_hilbert(cities, distances=None, metric=None, stats=None):
+    """
+    Algorithm: Space-filling Curve (Hilbert Curve) Construction
+    เรียงเมืองตามลำดับบนเส้นโค้ง Hilbert (เมืองที่อยู่ใกล้กันในระนาบจะอยู่ติดกันบนเส้นโค้ง)
+    ~O(n log n) และเร็วกว่า Nearest Neighbor มาก เหมาะเป็นทัวร์เริ่มต้นของ instance ขนาดใหญ่
+    (ทัวร์ยาวกว่า NN ประมาณ 25% ก่อนส่งต่อให้ improve_route)
+    stats: SolveStats (ถ้ามี) บันทึกเวลา construction
+    คืนค่า: (Total Distance, Route Path List หรือ index array ถ้าเป็น CityTable) ที่เริ่ม/จบที่เมืองแรก (depot)
+    """
+    if not len(cities):
+        return 0, _route(cities, [])
+    with _phase(stats, "construction"):
+        total_distance, route_path = _hilbert_tour(cities, distances, metric)
+    if stats is not None:
+        stats.count("distance_evals", len(cities))
+    return total_distance, route_path
+
+def _hilbert_tour(cities, distances, metric):
+    metric = _resolve_metric(metric, distances)
+    n = len(cities)
+    bits = _hilbert_bits(n)
+    xs, ys = _xy(cities)
+
+    if HAS_NUMPY:
+        # เรียงแบบ stable ด้วยการรวม (Hilbert index, ลำดับเดิม) เป็น uint64 แล้ว sort ค่า (เร็วกว่า argsort มาก)
+        packed = _hilbert_index_numpy(xs, ys, bits).astype(np.uint64) << np.uint64(32)
+        packed |= np.arange(n, dtype=np.uint64)
+        packed.sort()
+        order = (packed & np.uint64(0xFFFFFFFF)).astype(np.intp)
+        # หมุนให้เริ่มที่ depot (เมืองแรก)
+        order = np.roll(order, -int(np.flatnonzero(order == 0)[0]))
+    else:
+        index = _hilbert_index_python(xs, ys, bits)
+        order = sorted(range(n), key=index.__getitem__)
+        k = order.index(0)
+        order = order[k:] + order[:k]
+
+    kern = metric.prepare(xs, ys)
+    if n == 1:
+        return 0, _route(cities, order)[:1]
+    return _tour_length_kernel(kern, order), _route(cities, order)
+
+# ==========================================
+# Local Search: 2-opt + Or-opt (Tour Improvement)
+# ==========================================
+IMPROVE_EPS = 1e-10
+
+def _tour_length(dist, order):
+    """ความยาวทัวร์แบบวนกลับจุดเริ่มต้น"""
+    total = 0.0
+    prev = order[-1]
+    for c in order:
+        total += dist(prev, c)
+        prev = c
+    return total
+
+def _candidate_lists(kern, k, stats=None):
+    """Candidate list: k เมืองที่ใกล้ที่สุดของแต่ละเมือง (ไม่รวมตัวเอง) เรียงจากใกล้ไปไกล"""
+    tree = KDTree(*kern.kd_columns, norm=kern.kd_norm)
+    k = min(k, kern.n - 1)
+    neigh = []
+    for me in range(kern.n):
+        near = [i for _, i in tree.nearest_k(k + 1, *tree.point(me)) if i != me]
+        neigh.append(near[:k])
+    if stats is not None:
+        stats.count("distance_evals", tree.evals)
+    return neigh
+
+def _improve_order(kern, order, k=8, time_limit=None, dist=None, progress=None, stats=None, neigh=None):
+    """
+    ปรับปรุงทัวร์ (ลำดับ index) ด้วย 2-opt + Or-opt
+    - พิจารณาเฉพาะ k เมืองใกล้สุด (candidate list) แทนการ scan ทุกคู่ O(n^2)
+    - Don't-look bits: ตรวจเฉพาะเมืองที่เส้นทางรอบๆ เพิ่งเปลี่ยน (คิวของเมืองที่ active)
+    dist: ฟังก์ชันระยะทางระหว่าง index (เช่นอ่านจาก DistanceMatrix) ถ้าไม่ส่งมาจะใช้ kern.pair
+    progress: _Reporter (ถ้ามี) ได้รับทัวร์ปัจจุบัน (ดีที่สุดเสมอ) คืนค่า True = หยุดและคืนทัวร์ตอนนั้น
+    stats: SolveStats (ถ้ามี) บันทึกเวลา candidates/improvement, distance_evals, จำนวนรอบและ move
+    neigh: candidate list ที่สร้างไว้แล้ว (ดู _candidate_lists) ถ้าไม่ส่งมาจะสร้างใหม่
+    คืนค่า: ลำดับ index ใหม่ (เริ่มที่เมืองเดิม)
+    """
+    n = len(order)
+    if n < 4:
+        return list(order)
+
+    if neigh is None:
+        with _phase(stats, "candidates"):
+            neigh = _candidate_lists(kern, k, stats)
+    with _phase(stats, "improvement"):
+        return _local_search(kern, order, neigh, time_limit, dist, progress, stats)
+
+def _local_search(kern, order, neigh, time_limit, dist, progress, stats, active=None):
+    # active: เมืองที่เริ่มตรวจ (None = ทุกเมือง) เมืองอื่นจะถูกตรวจเมื่อเส้นทางรอบๆ มันเปลี่ยนเท่านั้น
+    n = len(order)
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+
+    tour = list(order)
+    pos = [0] * n
+    for p, c in enumerate(tour):
+        pos[c] = p
+
+    dist = dist or kern.pair
+    if stats is not None:
+        dist = _counted(dist, stats)
+
+    def succ(c):
+        p = pos[c] + 1
+        return tour[p if p < n else 0]
+
+    def pred(c):
+        return tour[pos[c] - 1]
+
+    def reverse(i, j):
+        # กลับลำดับตำแหน่ง i..j (วนรอบได้) เลือกกลับฝั่งที่สั้นกว่าเสมอ
+        inner = (j - i) % n + 1
+        if inner * 2 > n:
+            i, j = (j + 1) % n, (i - 1) % n
+            inner = n - inner
+        if inner < 2:
+            return
+        if i <= j:
+            tour[i:j + 1] = tour[i:j + 1][::-1]
+            for p in range(i, j + 1):
+                pos[tour[p]] = p
+        else:
+            for _ in range(inner // 2):
+                a, b = tour[i], tour[j]
+                tour[i] = b
+                pos[b] = i
+                tour[j] = a
+                pos[a] = j
+                i = i + 1 if i + 1 < n else 0
+                j = j - 1 if j > 0 else n - 1
+
+    def two_opt_move(a, b, c, d):
+        # แทนเส้น (a,b),(c,d) ด้วย (a,c),(b,d) โดยไม่สนว่าทัวร์หันทิศไหนอยู่
+        if succ(a) == b:
+            reverse(pos[b], pos[c])
+        else:
+            reverse(pos[a], pos[d])
+
+    if active is None:
+        queue = deque(tour)
+        queued = [True] * n
+    else:
+        queue = deque(active)
+        queued = [False] * n
+        for c in queue:
+            queued[c] = True
+
+    def push(*cs):
+        for c in cs:
+            if not queued[c]:
+                queued[c] = True
+                queue.append(c)
+
+    def try_two_opt(a):
+        for step in (succ, pred):
+            b = step(a)
+            d_ab = dist(a, b)
+            for c in neigh[a]:
+                d_ac = dist(a, c)
+                if d_ac >= d_ab:
+                    break  # candidate list เรียงแล้ว ตัวถัดไปไม่มีทางได้กำไร
+                d = step(c)
+                if c == b or d == a:
+                    continue
+                delta = d_ac + dist(b, d) - d_ab - dist(c, d)
+                if delta < -IMPROVE_EPS:
+                    two_opt_move(a, b, c, d)
+                    push(a, b, c, d)
+                    return True
+        return False
+
+    def move_segment(s1, s2, u, v, first):
+        # ย้าย segment s1..s2 (ตามทิศทัวร์) ไปแทรกระหว่าง u -> v (v = succ(u))
+        # first = เมืองปลาย segment ที่จะติดกับ u
+        p, nx = pred(s1), succ(s2)
+        two_opt_move(p, s1, u, v)
+        if u != nx:
+            two_opt_move(p, u, nx, s2)
+        if first == s1:
+            two_opt_move(u, s2, s1, v)
+        push(p, nx, u, v, s1, s2)
+
+    def try_or_opt(a):
+        for seg_len in (1, 2, 3):
+            if n < seg_len + 3:
+                break
+            for step in (succ, pred):
+                seg = [a]
+                for _ in range(seg_len - 1):
+                    seg.append(step(seg[-1]))
+                s1, s2 = (seg[0], seg[-1]) if step is succ else (seg[-1], seg[0])
+                p, nx = pred(s1), succ(s2)
+                gain = dist(p, s1) + dist(s2, nx) - dist(p, nx)
+                if gain <= IMPROVE_EPS:
+                    continue
+                for end, other in ((s1, s2), (s2, s1)):
+                    for c in neigh[end]:
+                        d_c = dist(end, c)
+                        if d_c >= gain:
+                            break
+                        if c in seg:
+                            continue
+                        for e in (succ(c), pred(c)):
+                            if e in seg or (c == p and e == pred(p)) or (e == p and c == pred(p)):
+                                continue
+                            delta = d_c + dist(other, e) - dist(c, e) - gain
+                            if delta < -IMPROVE_EPS:
+                                if succ(c) == e:
+                                    move_segment(s1, s2, c, e, end)
+                                else:
+                                    move_segment(s1, s2, e, c, other)
+                                return True
+        return False
+
+    def current_order():
+        start = pos[order[0]]
+        return tour[start:] + tour[:start]
+
+    checks = two_opt_moves = or_opt_moves = 0
+    while queue:
+        checks += 1
+        if checks % 256 == 0:
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+            if progress is not None and progress(n - len(queue), n, current_order):
+                break
+        a = queue.popleft()
+        queued[a] = False
+        if try_two_opt(a):
+            two_opt_moves += 1
+            push(a)
+        elif try_or_opt(a):
+            or_opt_moves += 1
+            push(a)
+
+    if stats is not None:
+        stats.count("improve_checks", checks)
+        stats.count("two_opt_moves", two_opt_moves)
+        stats.count("or_opt_moves", or_opt_moves)
+    # หมุนให้เริ่มที่เมืองเดิม
+    return current_order()
+
+def improve_route(route_path, k=8, time_limit=None, distances=None, metric=None, progress=None, cities=None,
+                  stats=None, candidates=None):
+    """
+    Algorithm: 2-opt + Or-opt Local Search (ใช้ต่อจาก Nearest Neighbor)
+    route_path: เส้นทางแบบวนกลับ (เมืองแรก = เมืองสุดท้าย)
+    k: จำนวน candidate (เมืองใกล้สุด) ที่พิจารณาต่อเมือง
+    time_limit: จำกัดเวลา (วินาที) ถ้าหมดเวลาจะคืนทัวร์ที่ดีที่สุดตอนนั้น
+    distances: DistanceMatrix ที่มีทุกเมืองใน route (ถ้ามี) -> อ่านระยะจาก cache
+    metric: metric ที่ใช้วัดระยะ (ดู solve_tsp_nearest_neighbor)
+    progress: callback(stage, done, total, tour) ได้รับทัวร์ที่ดีที่สุดตอนนั้น คืนค่า True = หยุดก่อนกำหนด
+    cities: CityTable เมื่อ route_path เป็น index (วนกลับ) -> คืน route เป็น index array เช่นกัน
+    stats: SolveStats (ถ้ามี) บันทึกเวลาแต่ละขั้นและตัวนับ (ดู SolveStats)
+    candidates: candidate list ตาม index ของ cities ที่สร้างไว้แล้ว (ใช้คู่กับ cities) จะได้ไม่ต้องสร้างใหม่
+    คืนค่า: (Total Distance, Route Path List) ที่เริ่มจากเมืองเดิม
+    """
+    if len(route_path) < 2:
+        return 0, route_path[:]
+    with _phase(stats, "setup"):
+        cities, order, kern, dist = _improve_setup(route_path, distances, metric, cities)
+
+    reporter = _Reporter(progress, "improve", cities) if progress is not None else None
+    order = _improve_order(kern, order, k=k, time_limit=time_limit, dist=dist, progress=reporter, stats=stats,
+                           neigh=candidates)
+    return _tour_length(dist, order), _route(cities, order)
+
+def _improve_setup(route_path, distances, metric, cities):
+    """เตรียม (cities, ลำดับ index, kernel, ฟังก์ชันระยะ) ให้ improve_route"""
+    metric = _resolve_metric(metric, distances)
+
+    stops = route_path[:-1]
+    if cities is not None:
+        # route เป็น index ของ CityTable อยู่แล้ว
+        order = [int(i) for i in stops]
+        dist = None
+        if distances is not None and distances.covers(cities):
+            dist = distances.matrix.item if HAS_NUMPY else distances.dist
+    elif distances is not None and len(stops) == len(distances):
+        # ทำงานบน index ของ matrix โดยตรง (ไม่ copy matrix)
+        order = [distances.index_of(c) for c in stops]
+        cities = distances.cities
+        dist = distances.matrix.item if HAS_NUMPY else distances.dist
+    else:
+        order = list(range(len(stops)))
+        cities = stops
+        dist = None
+    kern = metric.prepare(*_xy(cities))
+    return cities, order, kern, dist or kern.pair
+
+# ==========================================
+# Exact Solver (Held-Karp DP / Branch-and-Bound)
+# ==========================================
+# solve_tsp(exact="auto") ใช้ exact solver เมื่อจำนวนเมืองไม่เกินค่านี้
+EXACT_THRESHOLD = 20
+# จำนวนเมืองสูงสุดที่ใช้ Held-Karp DP (เกินนี้ใช้ branch-and-bound)
+HELD_KARP_MAX = 18 if HAS_NUMPY else 12
+# เวลาสูงสุด (วินาที) ของ exact solver ก่อนยอมใช้ทัวร์ heuristic แทน
+EXACT_TIME_LIMIT = 2.0
+# จำนวน state (เซต, เมืองปัจจุบัน) สูงสุดที่ branch-and-bound จำไว้ตัดกิ่งซ้ำ
+BNB_MEMO_MAX = 1 << 20
+
+class _ExactStopped(Exception):
+    """หมดเวลา/ถูกยกเลิกระหว่างหาคำตอบที่ดีที่สุด"""
+
+def _dense_distances(kern, distances=None):
+    """ตารางระยะ n x n (list ของ list) สำหรับ instance เล็กของ exact solver"""
+    if distances is not None:
+        if HAS_NUMPY:
+            return distances.matrix.tolist()
+        return [[distances.dist(i, j) for j in range(kern.n)] for i in range(kern.n)]
+    return [[kern.pair(i, j) if i != j else 0.0 for j in range(kern.n)] for i in range(kern.n)]
+
+def _held_karp_numpy(d, check):
+    """
+    Held-Karp DP ทีละชั้น (layer = ขนาดของเซตเมืองที่ไปแล้ว) แบบ Vectorized
+    เก็บค่า DP แค่ชั้นก่อนหน้า + parent (uint8) ของทุกชั้น -> หน่วยความจำ ~ n * 2^n bytes
+    คืนค่า: (ระยะทาง, ลำดับ index เริ่มที่ 0)
+    """
+    n = len(d)
+    m = n - 1                                   # เมืองที่ไม่ใช่ depot (index 1..n-1 -> bit 0..m-1)
+    d = np.asarray(d, dtype=np.float64)
+    dd = d[1:, 1:]
+    masks = np.arange(1 << m, dtype=np.int64)
+    popcount = np.zeros(1 << m, dtype=np.int8)
+    for b in range(m):
+        popcount += ((masks >> b) & 1).astype(np.int8)
+    by_size = np.argsort(popcount, kind="stable")
+    bounds = np.searchsorted(popcount[by_size], np.arange(m + 2))
+    layers = [by_size[bounds[k]:bounds[k + 1]] for k in range(m + 1)]
+    # rank[mask] = ตำแหน่งของ mask ภายในชั้นของมัน
+    rank = np.empty(1 << m, dtype=np.int64)
+    for layer in layers:
+        rank[layer] = np.arange(len(layer))
+
+    prev = np.full((m, m), np.inf)
+    prev[rank[layers[1]], np.arange(m)] = d[0, 1:]
+    parents = [None, None]
+    for k in range(2, m + 1):
+        check(k, m)
+        layer = layers[k]
+        cur = np.full((len(layer), m), np.inf)
+        par = np.zeros((len(layer), m), dtype=np.uint8)
+        for j in range(m):
+            rows = np.flatnonzero((layer >> j) & 1)
+            # ค่าของเซตก่อนหน้า (ไม่มี j) + ระยะจากเมืองสุดท้าย i ไป j; i ที่ไม่อยู่ในเซตเป็น inf อยู่แล้ว
+            cand = prev[rank[layer[rows] ^ (1 << j)]] + dd[:, j]
+            best = cand.argmin(axis=1)
+            cur[rows, j] = cand[np.arange(len(rows)), best]
+            par[rows, j] = best
+        prev = cur
+        parents.append(par)
+
+    closing = prev[0] + d[1:, 0]
+    j = int(closing.argmin())
+    total = float(closing[j])
+    mask = (1 << m) - 1
+    order = []
+    for k in range(m, 0, -1):
+        order.append(j + 1)
+        if k > 1:
+            i = int(parents[k][rank[mask], j])
+            mask ^= 1 << j
+            j = i
+    return total, [0] + order[::-1]
+
+def _held_karp_python(d, check):
+    """Held-Karp DP แบบ Python แท้ (แต่ละชั้นเป็น dict ของ (mask, เมืองสุดท้าย)) สำหรับเครื่องที่ไม่มี NumPy"""
+    m = len(d) - 1
+    layers = [{(1 << j, j): (d[0][j + 1], -1) for j in range(m)}]
+    for k in range(2, m + 1):
+        check(k, m)
+        nxt = {}
+        for (mask, i), (cost, _) in layers[-1].items():
+            row = d[i + 1]
+            for j in range(m):
+                if mask >> j & 1:
+                    continue
+                key = (mask | 1 << j, j)
+                c = cost + row[j + 1]
+                old = nxt.get(key)
+                if old is None or c < old[0]:
+                    nxt[key] = (c, i)
+        layers.append(nxt)
+
+    mask = (1 << m) - 1
+    total, j = min((layers[-1][(mask, j)][0] + d[j + 1][0], j) for j in range(m))
+    order = []
+    for layer in reversed(layers):
+        order.append(j + 1)
+        i = layer[(mask, j)][1]
+        mask ^= 1 << j
+        j = i
+    return total, [0] + order[::-1]
+
+def _branch_and_bound(d, upper, upper_order, check):
+    """
+    Branch-and-bound (DFS) เริ่มจาก upper bound = ทัวร์ heuristic
+    lower bound ของแต่ละ node = ระยะที่เดินมาแล้ว + MST ของเมืองที่เหลือ (cache ตามเซต)
+      + เส้นที่สั้นที่สุดจากเมืองปัจจุบัน และจาก depot ไปยังเมืองที่เหลือ
+    และตัดกิ่งที่มาถึง (เซต, เมืองปัจจุบัน) เดิมด้วยระยะที่ไม่ดีกว่า
+    คืนค่า: (ระยะทาง, ลำดับ index เริ่มที่ 0, ค้นครบทุกกิ่งหรือไม่) ถ้าถูกหยุดกลางทางได้ทัวร์ที่ดีที่สุดที่เจอ
+    """
+    n = len(d)
+    full = (1 << n) - 1
+    near = [sorted((j for j in range(n) if j != i), key=d[i].__getitem__) for i in range(n)]
+    mst_cache = {}
+    seen = {}
+    best = [upper, list(upper_order)]
+    path = [0]
+    nodes = [0]
+
+    def mst(mask):
+        # Prim O(k^2) บนเซต mask
+        if mask in mst_cache:
+            return mst_cache[mask]
+        members = [i for i in range(n) if mask >> i & 1]
+        key = {i: d[members[0]][i] for i in members[1:]}
+        total = 0.0
+        while key:
+            v = min(key, key=key.__getitem__)
+            total += key.pop(v)
+            row = d[v]
+            for u in key:
+                if row[u] < key[u]:
+                    key[u] = row[u]
+        mst_cache[mask] = total
+        return total
+
+    def visit(cur, mask, cost):
+        nodes[0] += 1
+        if nodes[0] & 1023 == 0:
+            check(nodes[0], None)
+        if mask == full:
+            total = cost + d[cur][0]
+            if total < best[0] - IMPROVE_EPS:
+                best[0], best[1] = total, list(path)
+            return
+        state = (mask, cur)
+        if seen.get(state, math.inf) <= cost:
+            return
+        if state in seen or len(seen) < BNB_MEMO_MAX:
+            seen[state] = cost
+        rest = full ^ mask
+        row = d[cur]
+        bound = (cost + mst(rest) + min(row[u] for u in near[cur] if rest >> u & 1)
+                 + min(d[0][u] for u in near[0] if rest >> u & 1))
+        if bound >= best[0] - IMPROVE_EPS:
+            return
+        for nxt in near[cur]:
+            if rest >> nxt & 1:
+                path.append(nxt)
+                visit(nxt, mask | 1 << nxt, cost + row[nxt])
+                path.pop()
+
+    try:
+        visit(0, 1, 0.0)
+    except _ExactStopped:
+        return best[0], best[1], False
+    return best[0], best[1], True
+
+def solve_tsp_exact(cities, distances=None, metric=None, time_limit=EXACT_TIME_LIMIT, upper_bound=None,
+                    progress=None, stats=None):
+    """
+    Algorithm: Exact TSP (ได้ทัวร์ที่สั้นที่สุดจริง) สำหรับ instance เล็ก
+    - ไม่เกิน HELD_KARP_MAX เมือง: Held-Karp DP แบบ bitmask (NumPy ทีละชั้น) O(n^2 2^n)
+    - มากกว่านั้น: Branch-and-bound โดยใช้ upper_bound (ทัวร์ heuristic) ตัดกิ่ง
+    time_limit: เวลาสูงสุด (วินาที, None = ไม่จำกัด) ถ้าหมดเวลา/ถูกยกเลิกจะคืนทัวร์ที่ดีที่สุดที่มี (ไม่รับประกันว่าดีที่สุด)
+    upper_bound: (ระยะทาง, ลำดับ index เริ่มที่ 0) ของทัวร์ที่มีอยู่แล้ว (ไม่ส่ง = ใช้ Nearest Neighbor)
+    progress: callback(stage, done, total, tour) stage = "exact" คืนค่า True = หยุด
+      Held-Karp: done/total = ชั้นของ DP / Branch-and-bound: วินาทีที่ใช้ไป/time_limit (ไม่จำกัดเวลา: total = None)
+    คืนค่า: (Total Distance, Route Path List หรือ index array ถ้าเป็น CityTable, พิสูจน์แล้วว่าดีที่สุดหรือไม่)
+    """
+    n = len(cities)
+    if n <= 3:
+        total, route = solve_tsp_nearest_neighbor(cities, distances=distances, metric=metric)
+        return total, route, True
+    with _phase(stats, "setup"):
+        metric = _resolve_metric(metric, distances)
+        kern = metric.prepare(*_xy(cities))
+        if distances is not None and not distances.covers(cities):
+            distances = None
+        d = _dense_distances(kern, distances)
+        if upper_bound is None:
+            total, order = _nn_order(kern, 0, _resolve_engine("auto", n))
+            upper_bound = (total + kern.pair(int(order[-1]), int(order[0])), [int(i) for i in order])
+
+    started = time.perf_counter()
+    deadline = None if time_limit is None else started + time_limit
+    reporter = _Reporter(progress, "exact") if progress is not None else None
+
+    def check(done, total):
+        now = time.perf_counter()
+        if deadline is not None and now > deadline:
+            raise _ExactStopped()
+        if total is None and time_limit:
+            # branch-and-bound ไม่รู้จำนวน node ทั้งหมด -> รายงานสัดส่วนของเวลาที่ใช้ไปแทน (ไม่เกิน 100%)
+            done, total = min(now - started, time_limit), time_limit
+        if reporter is not None and reporter(done, total):
+            raise _ExactStopped()
+
+    held_karp = n <= HELD_KARP_MAX
+    with _phase(stats, "exact"):
+        if held_karp:
+            try:
+                total, order = (_held_karp_numpy if HAS_NUMPY else _held_karp_python)(d, check)
+                optimal = True
+            except _ExactStopped:
+                (total, order), optimal = upper_bound, False
+        else:
+            total, order, optimal = _branch_and_bound(d, upper_bound[0], upper_bound[1], check)
+    if stats is not None:
+        stats.count("exact_held_karp" if held_karp else "exact_branch_and_bound")
+    if total > upper_bound[0]:
+        total, order = upper_bound
+    return total, _route(cities, order), optimal
+
+# ==========================================
+# Lower Bound (1-tree + Held-Karp Subgradient Ascent)
+# ==========================================
+# ไม่เกินจำนวนเมืองนี้ใช้กราฟสมบูรณ์ (bound ถูกต้องแน่นอน) เกินนี้ใช้ candidate graph (k เมืองใกล้สุด) = ค่าประมาณ
+BOUND_DENSE_MAX = 500
+BOUND_K = 5
+BOUND_ITERATIONS = 60
+# solve_tsp: เวลาสูงสุดของ lower_bound ต่อการแก้ 1 ครั้ง (วินาที)
+BOUND_TIME_LIMIT = 2.0
+
+def bound_is_proven(n):
+    """lower_bound ของ n เมืองเป็น bound ที่พิสูจน์ได้หรือไม่ (False = ค่าประมาณจาก candidate graph)"""
+    return n <= BOUND_DENSE_MAX
+
+def _bound_edges(kern, xs, ys, candidates=None, k=BOUND_K):
+    """
+    เส้นเชื่อมที่ใช้หา 1-tree คืนค่า (u, v) โดย u < v
+    - n เล็ก: ทุกคู่ (กราฟสมบูรณ์)
+    - n ใหญ่: candidate list (ไม่ส่งมา = _grid_candidates ไม่ต้องสร้าง KDTree)
+      + เส้นเชื่อมเมืองที่ติดกันเมื่อเรียงตาม x (ไม่นับ depot) เพื่อให้กราฟเชื่อมกันเสมอแม้เมืองแยกเป็นกลุ่มห่างกัน
+    """
+    n = kern.n
+    if bound_is_proven(n):
+        if HAS_NUMPY:
+            return np.triu_indices(n, 1)
+        return [(i, j) for i in range(n) for j in range(i + 1, n)]
+    if candidates is None:
+        candidates = _grid_candidates(kern, xs, ys, k)
+    if HAS_NUMPY:
+        near = np.array([c[:k] for c in candidates], dtype=np.int64)
+        chain = np.argsort(np.asarray(xs)[1:], kind="stable") + 1
+        a = np.concatenate([np.repeat(np.arange(n), near.shape[1]), chain[:-1]])
+        b = np.concatenate([near.ravel(), chain[1:]])
+        a, b = a[b >= 0], b[b >= 0]
+        key = np.unique(np.minimum(a, b) * n + np.maximum(a, b))
+        return key // n, key % n
+    pairs = [(i, j) for i, near in enumerate(candidates) for j in near[:k]]
+    chain = sorted(range(1, n), key=xs.__getitem__)
+    pairs.extend(zip(chain, chain[1:]))
+    return sorted({(min(i, j), max(i, j)) for i, j in pairs})
+
+# _grid_candidates: จำนวนเมืองสูงสุดที่ดูต่อ cell / จำนวนเมืองต่อ cell โดยเฉลี่ย / จำนวนแถวที่คำนวณต่อรอบ (NumPy)
+GRID_CELL_CAP = 8
+GRID_CELL_FILL = 2
+GRID_CHUNK = 16384
+
+def _grid_candidates(kern, xs, ys, k):
+    """
+    candidate list แบบประมาณสำหรับ lower_bound (NumPy: vectorized ทั้งหมด เร็วกว่า _candidate_lists หลายเท่า)
+    แบ่งพื้นที่เป็นตาราง ~GRID_CELL_FILL เมืองต่อ cell แล้วเลือก k เมืองใกล้สุดจาก 3x3 cell รอบๆ
+    (ดูไม่เกิน GRID_CELL_CAP เมืองต่อ cell -> บริเวณที่หนาแน่นมากหรือเมืองโดดเดี่ยวอาจไม่ใช่เมืองใกล้สุดจริง)
+    คืนค่า: NumPy = array n x k (-1 = มีเมืองใน 3x3 cell ไม่พอ) / ไม่มี NumPy = list ของ list
+    """
+    n = kern.n
+    k = min(k, n - 1)
+    side = max(1, int(math.sqrt(n / GRID_CELL_FILL)))
+    if not HAS_NUMPY:
+        x0, y0 = min(xs), min(ys)
+        sx, sy = (max(xs) - x0) or 1.0, (max(ys) - y0) or 1.0
+        at = [(min(int((x - x0) / sx * side), side - 1), min(int((y - y0) / sy * side), side - 1))
+              for x, y in zip(xs, ys)]
+        grid = {}
+        for i, c in enumerate(at):
+            members = grid.setdefault(c, [])
+            if len(members) < GRID_CELL_CAP:
+                members.append(i)
+        neigh = []
+        for i, (cx, cy) in enumerate(at):
+            near = [j for dx in (-1, 0, 1) for dy in (-1, 0, 1) for j in grid.get((cx + dx, cy + dy), ()) if j != i]
+            neigh.append(heapq.nsmallest(k, near, key=lambda j: kern.pair(i, j)))
+        return neigh
+
+    x, y = np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64)
+    cx = np.minimum(((x - x.min()) / ((x.max() - x.min()) or 1.0) * side).astype(np.int64), side - 1)
+    cy = np.minimum(((y - y.min()) / ((y.max() - y.min()) or 1.0) * side).astype(np.int64), side - 1)
+    cell = cx * side + cy
+    by_cell = np.argsort(cell, kind="stable")
+    counts = np.bincount(cell, minlength=side * side)
+    first = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    out = np.full((n, k), -1, dtype=np.int64)
+    for lo in range(0, n, GRID_CHUNK):
+        rows = np.arange(lo, min(lo + GRID_CHUNK, n))
+        cand = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                nx, ny = cx[rows] + dx, cy[rows] + dy
+                inside = (nx >= 0) & (nx < side) & (ny >= 0) & (ny < side)
+                nc = np.where(inside, nx * side + ny, 0)
+                count = np.where(inside, counts[nc], 0)
+                for j in range(GRID_CELL_CAP):
+                    cand.append(np.where(j < count, by_cell[np.minimum(first[nc] + j, n - 1)], -1))
+        cand = np.stack(cand, axis=1)
+        valid = (cand >= 0) & (cand != rows[:, None])
+        safe = np.where(valid, cand, 0)
+        d = kern.to_dist_array(kern.key([a[safe] for a in kern.arrays], [a[rows, None] for a in kern.arrays]))
+        d = np.where(valid, d, np.inf)
+        pick = np.argpartition(d, k - 1, axis=1)[:, :k]
+        out[rows] = np.where(np.isfinite(np.take_along_axis(d, pick, 1)), np.take_along_axis(safe, pick, 1), -1)
+    return out
+
+def _mst_boruvka(n, u, v, w):
+    """
+    Minimum spanning forest แบบ Borůvka (NumPy): ทุกรอบแต่ละ component เลือกเส้นที่เบาที่สุดที่ออกไป
+    ~log n รอบ แต่ละรอบ vectorized ทั้งหมด และตัดเส้นที่อยู่ใน component เดียวกันทิ้งไปเรื่อยๆ
+    เรียงน้ำหนักครั้งเดียวแล้วเทียบกันด้วยตำแหน่งหลังเรียง (ไม่มีค่าเท่ากัน -> ไม่เกิด cycle แม้น้ำหนักซ้ำ)
+    คืนค่า: boolean mask ของเส้นที่อยู่ใน tree
+    """
+    order = np.argsort(w)
+    picked = np.zeros(len(order), dtype=bool)
+    eu, ev, pos = u[order], v[order], order      # เส้นที่ยังเชื่อมต่าง component (ปลายเป็น label ของ component)
+    label = np.arange(n)
+    while len(pos):
+        idx = np.arange(len(pos))
+        best = np.full(n, len(pos))
+        np.minimum.at(best, eu, idx)
+        np.minimum.at(best, ev, idx)
+        mark = np.zeros(len(pos) + 1, dtype=bool)
+        mark[best] = True
+        chosen = np.flatnonzero(mark[:-1])
+        picked[pos[chosen]] = True
+        # รวม component: ชี้ root ที่ใหญ่กว่าไปหา root ที่เล็กกว่า แล้วบีบ path (pointer jumping)
+        a, b = eu[chosen], ev[chosen]
+        while len(a):
+            np.minimum.at(label, np.maximum(a, b), np.minimum(a, b))
+            while True:
+                nxt = label[label]
+                if np.array_equal(nxt, label):
+                    break
+                label = nxt
+            a, b = label[a], label[b]
+            diff = a != b
+            a, b = a[diff], b[diff]
+        eu, ev = label[eu], label[ev]
+        cross = eu != ev
+        eu, ev, pos = eu[cross], ev[cross], pos[cross]
+    return picked
+
+def _one_tree_numpy(n, u, v, w, depot_v, depot_w, pi):
+    """
+    1-tree ที่สั้นที่สุดภายใต้ penalty pi: MST ของเมือง 1..n-1 (เส้น u, v, w)
+    + 2 เส้นที่สั้นที่สุดจาก depot (เมือง 0 ไปยัง depot_v ยาว depot_w)
+    คืนค่า: (ความยาว 1-tree - 2 * sum(pi), degree ของแต่ละเมือง)
+    """
+    wp = w + pi[u] + pi[v]
+    tree = _mst_boruvka(n, u, v, wp)
+    dp = depot_w + pi[depot_v]
+    two = np.argpartition(dp, 1)[:2]
+    length = float(wp[tree].sum() + dp[two].sum() + 2.0 * pi[0] - 2.0 * pi.sum())
+    degree = np.bincount(u[tree], minlength=n) + np.bincount(v[tree], minlength=n)
+    degree += np.bincount(depot_v[two], minlength=n)
+    degree[0] = 2
+    return length, degree
+
+def _one_tree_python(n, edges, w, pi):
+    # Kruskal + union-find (กรณีไม่มี NumPy)
+    wp = [w[e] + pi[i] + pi[j] for e, (i, j) in enumerate(edges)]
+    parent = list(range(n))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    degree = [0] * n
+    length = 0.0
+    depot = sorted(e for e, (i, _) in enumerate(edges) if i == 0)
+    for e in sorted(depot, key=wp.__getitem__)[:2]:
+        length += wp[e]
+        degree[edges[e][1]] += 1
+    degree[0] = 2
+    for e in sorted(range(len(edges)), key=wp.__getitem__):
+        i, j = edges[e]
+        if i == 0:
+            continue
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[ri] = rj
+            length += wp[e]
+            degree[i] += 1
+            degree[j] += 1
+    return length - 2.0 * sum(pi), degree
+
+def lower_bound(cities, metric=None, upper=None, iterations=BOUND_ITERATIONS, time_limit=None, candidates=None,
+                k=BOUND_K, progress=None, stats=None):
+    """
+    Algorithm: Held-Karp Lower Bound (1-tree + Subgradient Ascent)
+    ทุกทัวร์ยาวอย่างน้อยเท่ากับ 1-tree ที่สั้นที่สุด; ปรับ penalty pi ของแต่ละเมืองตาม (degree - 2)
+    ทีละรอบ (step แบบ Polyak เทียบกับ upper, ลด step ครึ่งหนึ่งและกลับไปที่ pi ที่ดีที่สุดเมื่อไม่ดีขึ้น)
+    ให้ bound สูงขึ้นจนใกล้ความยาวทัวร์ที่ดีที่สุด
+    - ไม่เกิน BOUND_DENSE_MAX เมือง: ใช้ทุกคู่เมือง -> เป็น lower bound ที่ถูกต้องแน่นอน
+    - มากกว่านั้น: ใช้ candidate graph (k เมืองใกล้สุด แบบเดียวกับ LKH) -> เร็วพอสำหรับ 100k เมือง
+      แต่เป็นค่าประมาณ ไม่ใช่ bound ที่พิสูจน์ได้ (1-tree บน candidate graph อาจยาวกว่า 1-tree ที่สั้นที่สุดจริง)
+      ดู bound_is_proven
+    upper: ความยาวทัวร์ที่มีอยู่ (ไม่ส่ง = ใช้ทัวร์ Hilbert) ใช้คำนวณขนาด step และเป็นเพดานของ bound
+    candidates: candidate list ที่สร้างไว้แล้ว (เช่นจาก solve_tsp) จะได้ไม่ต้องสร้างใหม่
+    time_limit: นับรวมการหาทัวร์ upper และ candidate list; คำนวณ 1-tree อย่างน้อย 1 รอบเสมอ
+    time_limit / progress (stage = "bound", คืนค่า True = หยุด): หยุดก่อนได้ bound ที่ดีที่สุดตอนนั้น
+    คืนค่า: lower bound ของความยาวทัวร์ (หน่วยเดียวกับ metric)
+    """
+    n = len(cities)
+    if n <= 3:
+        return solve_tsp_nearest_neighbor(cities, metric=metric)[0]
+    metric = get_metric(metric)
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    expired = lambda: deadline is not None and time.perf_counter() > deadline
+    if upper is None:
+        upper = solve_tsp_hilbert(cities, metric=metric)[0]
+    reporter = _Reporter(progress, "bound") if progress is not None else None
+
+    with _phase(stats, "bound"):
+        xs, ys = _xy(cities)
+        kern = metric.prepare(xs, ys)
+        edges = _bound_edges(kern, xs, ys, candidates, k)
+        if HAS_NUMPY:
+            u, v = edges
+            w = kern.to_dist_array(kern.key([c[u] for c in kern.arrays], [c[v] for c in kern.arrays]))
+            at_depot = u == 0
+            rest = ~at_depot
+            u, v, w, depot_v, depot_w = u[rest], v[rest], w[rest], v[at_depot], w[at_depot]
+            pi = np.zeros(n)
+            one_tree = lambda pi: _one_tree_numpy(n, u, v, w, depot_v, depot_w, pi)
+        else:
+            w = [kern.pair(i, j) for i, j in edges]
+            pi = [0.0] * n
+            one_tree = lambda pi: _one_tree_python(n, edges, w, pi)
+
+        best = -math.inf
+        best_pi = pi
+        step_scale = 0.25
+        stall = 0
+        done = 0
+        for done in range(1, iterations + 1):
+            length, degree = one_tree(pi)
+            improved = length > best + IMPROVE_EPS
+            if improved:
+                best, best_pi, stall = length, pi, 0
+            if best >= upper - IMPROVE_EPS:
+                break  # bound ชนเพดาน (ทัวร์ upper ดีที่สุดแล้ว)
+            if expired():
+                break
+            if reporter is not None and reporter(done, iterations):
+                break
+            if not improved:
+                stall += 1
+                if stall >= 3:
+                    step_scale, stall, pi = step_scale / 2, 0, best_pi
+                    continue
+            if HAS_NUMPY:
+                g = degree - 2
+                norm = float(g @ g)
+            else:
+                g = [d - 2 for d in degree]
+                norm = sum(x * x for x in g)
+            if norm == 0:
+                break  # 1-tree เป็นทัวร์แล้ว -> bound = ความยาวทัวร์ที่ดีที่สุด
+            step = step_scale * (upper - length) / norm
+            if HAS_NUMPY:
+                pi = pi + step * g
+            else:
+                pi = [p + step * x for p, x in zip(pi, g)]
+    if stats is not None:
+        stats.count("bound_iterations", done)
+    return min(best, upper)
+
+def optimality_gap(distance, bound):
+    """ระยะทางยาวกว่า lower bound กี่เท่า (0.02 = ไม่เกิน 2% จากทัวร์ที่สั้นที่สุด) / None ถ้าไม่มี bound"""
+    if bound is None:
+        return None
+    return (distance - bound) / bound if bound > 0 else 0.0
+
+# ==========================================
+# Spatial Decomposition (แบ่งพื้นที่แล้วแก้แต่ละส่วนขนานกัน)
+# ==========================================
+# จำนวนเมืองสูงสุดต่อ cluster (แต่ละ cluster มีประมาณ PARTITION_SIZE/2 .. PARTITION_SIZE เมือง)
+PARTITION_SIZE = 2000
+# หลังต่อทัวร์ เมืองที่ถูกตรวจซ้ำด้วย 2-opt + Or-opt:
+# - SEAM_WINDOW เมืองแต่ละฝั่งของรอยต่อระหว่าง cluster
+# - เมืองในแถบขอบของแต่ละ cluster กว้าง BORDER_BAND เท่าของรัศมี k เมืองใกล้สุด (โดยประมาณ)
+SEAM_WINDOW = 30
+BORDER_BAND = 0.5
+
+def _partition(xs, ys, size):
+    """
+    แบ่งเมืองตามพื้นที่แบบ KD-tree: ผ่าที่ค่ามัธยฐานของแกนที่กว้างกว่า ซ้ำจนแต่ละส่วนไม่เกิน size เมือง
+    คืนค่า: list ของ index (array ถ้ามี NumPy) ของแต่ละ cluster
+    """
+    n = len(xs)
+    if HAS_NUMPY:
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        stack = [np.arange(n)]
+    else:
+        stack = [list(range(n))]
+    parts = []
+    while stack:
+        ids = stack.pop()
+        if len(ids) <= size:
+            parts.append(ids)
+            continue
+        mid = len(ids) // 2
+        if HAS_NUMPY:
+            px, py = xs[ids], ys[ids]
+            split = np.argpartition(px if np.ptp(px) >= np.ptp(py) else py, mid)
+            stack.append(ids[split[mid:]])
+            stack.append(ids[split[:mid]])
+        else:
+            px, py = [xs[i] for i in ids], [ys[i] for i in ids]
+            col = xs if max(px) - min(px) >= max(py) - min(py) else ys
+            ids = sorted(ids, key=col.__getitem__)
+            stack.append(ids[mid:])
+            stack.append(ids[:mid])
+    return parts
+
+def _border_nodes(xs, ys, ids, k):
+    """เมืองของ cluster ที่อยู่ใกล้ขอบกรอบ cluster (เมืองใกล้สุดบางเมืองอาจอยู่ใน cluster ข้างเคียง)"""
+    if HAS_NUMPY:
+        px, py = xs[ids], ys[ids]
+        x0, x1, y0, y1 = px.min(), px.max(), py.min(), py.max()
+        band = BORDER_BAND * math.sqrt((x1 - x0) * (y1 - y0) * k / len(ids))
+        edge = np.minimum(np.minimum(px - x0, x1 - px), np.minimum(py - y0, y1 - py))
+        return ids[edge < band].tolist()
+    px, py = [xs[i] for i in ids], [ys[i] for i in ids]
+    x0, x1, y0, y1 = min(px), max(px), min(py), max(py)
+    band = BORDER_BAND * math.sqrt((x1 - x0) * (y1 - y0) * k / len(ids))
+    return [i for i, x, y in zip(ids, px, py) if min(x - x0, x1 - x, y - y0, y1 - y) < band]
+
+def _partition_chunk(ids, engine, k, time_limit, improve):
+    """
+    แก้ 1 cluster ใน worker: Nearest Neighbor แล้ว 2-opt + Or-opt (ถ้า improve)
+    คืนค่า: (ทัวร์ NN, ทัวร์ที่ปรับปรุงแล้ว, candidate list หรือ None) เป็น index ของทั้ง instance
+    """
+    sub = _WORKER['kern'].subset(ids)
+    ids = [int(i) for i in ids]
+    _, nn_order = _nn_order(sub, 0, _resolve_engine(engine, len(ids)))
+    if not improve:
+        nn_tour = [ids[i] for i in nn_order]
+        return nn_tour, nn_tour, None
+    neigh = _candidate_lists(sub, k)
+    order = _local_search(sub, nn_order, neigh, time_limit, None, None, None) if len(ids) >= 4 else nn_order
+    return [ids[i] for i in nn_order], [ids[i] for i in order], [[ids[j] for j in near] for near in neigh]
+
+def _dist_from(kern, a, ids):
+    """ระยะจากเมือง a ไปทุกเมืองใน ids"""
+    if HAS_NUMPY:
+        return kern.to_dist_array(kern.key([col[ids] for col in kern.arrays], tuple(col[a] for col in kern.arrays)))
+    return [kern.pair(a, i) for i in ids]
+
+def _stitch(kern, tours, anchors):
+    """
+    ต่อทัวร์ของแต่ละ cluster (เรียงตามทัวร์ระดับ cluster แล้ว) เป็นทัวร์เดียว
+    แต่ละ cluster ตัดเส้น (a, b) ออก 1 เส้นแล้วเดินจาก a วนไปจบที่ b โดยเลือกเส้นและทิศที่
+    d(ทางออกของ cluster ก่อนหน้า, a) - d(a, b) + d(b, anchor ของ cluster ถัดไป) น้อยที่สุด
+    anchors: เมืองตัวแทน (ใกล้จุดศูนย์กลาง) ของแต่ละ cluster
+    คืนค่า: (ลำดับ index, ตำแหน่งเริ่มของแต่ละ cluster ในลำดับ)
+    """
+    m = len(tours)
+    order, starts = [], []
+    prev = anchors[-1]
+    for c, tour in enumerate(tours):
+        starts.append(len(order))
+        s = len(tour)
+        if s < 3:
+            path = list(tour)
+        else:
+            nxt = anchors[(c + 1) % m]
+            d_in = _dist_from(kern, prev, tour)
+            d_out = _dist_from(kern, nxt, tour)
+            if HAS_NUMPY:
+                tour = np.asarray(tour)
+                edge = kern.to_dist_array(kern.key([col[tour] for col in kern.arrays],
+                                                   [col[np.roll(tour, -1)] for col in kern.arrays]))
+                forward = np.roll(d_in, -1) + d_out - edge     # เข้าที่ tour[j+1] เดินหน้า จบที่ tour[j]
+                backward = d_in + np.roll(d_out, -1) - edge    # เข้าที่ tour[j] เดินถอยหลัง จบที่ tour[j+1]
+                jf, jb = int(forward.argmin()), int(backward.argmin())
+                use_forward = forward[jf] <= backward[jb]
+            else:
+                edge = [kern.pair(tour[j], tour[(j + 1) % s]) for j in range(s)]
+                forward = [d_in[(j + 1) % s] + d_out[j] - edge[j] for j in range(s)]
+                backward = [d_in[j] + d_out[(j + 1) % s] - edge[j] for j in range(s)]
+                jf = min(range(s), key=forward.__getitem__)
+                jb = min(range(s), key=backward.__getitem__)
+                use_forward = forward[jf] <= backward[jb]
+            tour = list(tour)
+            if use_forward:
+                path = tour[jf + 1:] + tour[:jf + 1]
+            else:
+                path = tour[jb::-1] + tour[:jb:-1]
+        order.extend(int(i) for i in path)
+        prev = order[-1]
+    return order, starts
+
+def solve_tsp_partitioned(cities, cluster_size=PARTITION_SIZE, workers=None, engine="auto", k=8, time_limit=None,
+                          metric=None, progress=None, stats=None):
+    """
+    Algorithm: Spatial Decomposition (Divide and Conquer) สำหรับ instance ขนาดใหญ่มาก (หลายแสนเมือง)
+    1. แบ่งเมืองเป็น cluster ตามพื้นที่ (KD-tree ผ่าที่ค่ามัธยฐาน ไม่เกิน cluster_size เมือง)
+    2. แก้แต่ละ cluster (NN + 2-opt/Or-opt) พร้อมกันใน process pool -> เวลาลดลงตามจำนวน core
+    3. เรียง cluster ตามทัวร์ของจุดศูนย์กลาง แล้วต่อทัวร์ย่อยเข้าด้วยกัน (ดู _stitch)
+    4. ปรับรอยต่อด้วย 2-opt + Or-opt โดยเริ่มตรวจเฉพาะเมืองรอบรอยต่อและขอบ cluster (SEAM_WINDOW, BORDER_BAND)
+    workers: จำนวน process (None = จำนวน core), 1 = รันใน process นี้
+    time_limit: จำกัดเวลาปรับปรุงของแต่ละ cluster และของรอยต่อ (วินาที)
+    progress: callback(stage, done, total, tour) stage = "partition" (จำนวน cluster ที่เสร็จ, คืนค่า True = ยกเลิก
+      -> SolveCancelled) แล้ว "improve" (ปรับรอยต่อ, คืนค่า True = คืนทัวร์ตอนนั้น)
+    stats: SolveStats (ถ้ามี) บันทึกเวลา setup (แบ่ง cluster + ทัวร์ระดับ cluster), construction (แก้ทุก cluster)
+      และ improvement (ต่อทัวร์ + รอยต่อ) งานใน worker ไม่ถูกนับ distance_evals
+    คืนค่า: (Total Distance, Route Path List หรือ index array ถ้าเป็น CityTable) ที่เริ่ม/จบที่เมืองแรก (depot)
+    """
+    if len(cities) <= 3:
+        return solve_tsp_nearest_neighbor(cities, engine=engine, metric=metric, stats=stats)
+    _, total_distance, route_path, _ = _partitioned(cities, cluster_size, workers, engine, k, time_limit, True,
+                                                    metric, progress, stats)
+    return total_distance, route_path
+
+def _partitioned(cities, cluster_size, workers, engine, k, time_limit, improve, metric, progress, stats):
+    """คืนค่า: (ความยาวทัวร์ NN ที่ต่อแล้ว, Total Distance, Route, candidate list ของทุกเมืองหรือ None)"""
+    n = len(cities)
+    metric = get_metric(metric)
+    xs, ys = _xy(cities)
+
+    with _phase(stats, "setup"):
+        kern = metric.prepare(xs, ys)
+        # cluster ต้องมีมากกว่า k เมือง -> candidate list ของทุกเมืองยาว k เท่ากัน
+        parts = _partition(xs, ys, max(cluster_size, 2 * (k + 1)))
+        if HAS_NUMPY:
+            xs, ys = np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64)
+            cx = [float(xs[ids].mean()) for ids in parts]
+            cy = [float(ys[ids].mean()) for ids in parts]
+            anchors = [int(ids[np.argmin((xs[ids] - x)**2 + (ys[ids] - y)**2)]) for ids, x, y in zip(parts, cx, cy)]
+        else:
+            cx = [sum(xs[i] for i in ids) / len(ids) for ids in parts]
+            cy = [sum(ys[i] for i in ids) / len(ids) for ids in parts]
+            anchors = [min(ids, key=lambda i: (xs[i] - x)**2 + (ys[i] - y)**2) for ids, x, y in zip(parts, cx, cy)]
+        # ลำดับการเดินระหว่าง cluster = ทัวร์ของจุดศูนย์กลาง
+        cluster_order = [0]
+        if len(parts) > 1:
+            _, centers, _ = solve_tsp(CityTable(range(len(parts)), cx, cy), metric=metric, bound=False)
+            cluster_order = [int(c) for c in centers[:-1]]
+
+    workers = min(workers or os.cpu_count() or 1, len(parts))
+    reporter = _Reporter(progress, "partition") if progress is not None else None
+    results = [None] * len(parts)
+    with _phase(stats, "construction"):
+        with _kernel_workers(xs, ys, metric, workers) as pool:
+            if pool is None:
+                for c, ids in enumerate(parts):
+                    results[c] = _partition_chunk(ids, engine, k, time_limit, improve)
+                    if reporter is not None and reporter(c + 1, len(parts)):
+                        raise SolveCancelled()
+            else:
+                futures = {pool.submit(_partition_chunk, ids, engine, k, time_limit, improve): c
+                           for c, ids in enumerate(parts)}
+                for done, fut in enumerate(as_completed(futures), 1):
+                    results[futures[fut]] = fut.result()
+                    if reporter is not None and reporter(done, len(parts)):
+                        for f in futures:
+                            f.cancel()
+                        raise SolveCancelled()
+
+    with _phase(stats, "improvement"):
+        anchors = [anchors[c] for c in cluster_order]
+        nn_order, _ = _stitch(kern, [results[c][0] for c in cluster_order], anchors)
+        order, starts = _stitch(kern, [results[c][1] for c in cluster_order], anchors)
+        # หมุนให้เริ่มที่ depot (เมืองแรก) ระยะทางรวมเท่าเดิม
+        shift = order.index(0)
+        order = order[shift:] + order[:shift]
+        starts = [(s - shift) % n for s in starts]
+        neigh = None
+        border = []
+        if improve and n >= 4:
+            neigh = [None] * n
+            for ids, (_, _, near) in zip(parts, results):
+                for i, cands in zip(ids, near):
+                    neigh[i] = cands
+            # เมืองรอบรอยต่อและขอบ cluster: เพิ่มเมืองใกล้ที่อยู่คนละ cluster เข้า candidate list แล้วตรวจซ้ำ
+            border = {order[(s + d) % n] for s in starts for d in range(-SEAM_WINDOW, SEAM_WINDOW)}
+            for ids in parts:
+                border.update(_border_nodes(xs, ys, ids, k))
+            border = sorted(border)
+            # รับเฉพาะเมืองที่อยู่ห่างในทัวร์ไม่เกิน 2 cluster (cluster ที่ติดกันในทัวร์ระดับ cluster)
+            # -> การกลับลำดับของ 2-opt สั้นเสมอ ไม่ต้องกลับครึ่งทัวร์ทุกครั้งที่เชื่อม cluster ที่อยู่ไกลกันในทัวร์
+            reach = 2 * max(len(ids) for ids in parts)
+            pos = [0] * n
+            for p, c in enumerate(order):
+                pos[c] = p
+
+            def within_reach(a, b):
+                gap = abs(pos[a] - pos[b])
+                return min(gap, n - gap) <= reach
+
+            for i, near in zip(border, _candidate_lists(kern.subset(border), k)):
+                cands = set(neigh[i]).union(border[j] for j in near if within_reach(i, border[j]))
+                neigh[i] = sorted(cands, key=lambda j: kern.pair(i, j))[:k]
+            reporter = _Reporter(progress, "improve", cities) if progress is not None else None
+            order = _local_search(kern, order, neigh, time_limit, None, reporter, stats, active=border)
+
+    if stats is not None:
+        stats.count("partition_clusters", len(parts))
+        stats.count("border_nodes", len(border))
+    return _tour_length_kernel(kern, nn_order), _tour_length_kernel(kern, order), _route(cities, order), neigh
+
+# วิธีสร้างทัวร์เริ่มต้นที่ solve_tsp รองรับ
+CONSTRUCTIONS = ("nearest_neighbor", "hilbert", "partition")
+
+def solve_tsp(cities, engine="auto", improve=True, k=8, time_limit=None, distances=None, metric=None,
+              n_starts=1, workers=None, progress=None, construction="nearest_neighbor", stats=None,
+              exact="auto", exact_max=EXACT_THRESHOLD, exact_time_limit=EXACT_TIME_LIMIT, bound="auto",
+              bound_time_limit=BOUND_TIME_LIMIT, candidates=None):
+    """
+    Nearest Neighbor (สร้างทัวร์เริ่มต้น) + 2-opt/Or-opt (ปรับปรุง)
+    distances: DistanceMatrix ของชุดเมืองนี้ (ถ้ามี) ใช้ร่วมกันทั้ง 2 ขั้นตอน
+    metric: "euclidean" (Units), "haversine" หรือ "manhattan" (km)
+    n_starts: จำนวนจุดเริ่มต้นของ NN (1 = เริ่มที่เมืองแรกอย่างเดียว, None = ทุกเมือง) ดู solve_tsp_multistart
+    construction: ทัวร์เริ่มต้น "nearest_neighbor" หรือ "hilbert" (เร็วมากสำหรับ instance ใหญ่ ดู solve_tsp_hilbert)
+      หรือ "partition" = แบ่งพื้นที่แล้วแก้แต่ละส่วนขนานกันด้วย workers process (instance หลายแสนเมือง
+      ดู solve_tsp_partitioned) info['initial_distance'] = ทัวร์ NN ของแต่ละ cluster ที่ต่อกันแล้ว
+    progress: callback(stage, done, total, tour) เรียกจาก thread ที่รัน solver (ไม่ถี่กว่า PROGRESS_INTERVAL)
+      - stage: "nearest_neighbor", "multistart", "partition", "improve" (tour = ทัวร์ดีที่สุดตอนนั้น, นอกนั้น None), "exact" หรือ "bound"
+      - done/total: ความคืบหน้าของขั้นนั้น (0..1 เมื่อหารกัน), total = None = ไม่ทราบ (แสดงแบบไม่มีเปอร์เซ็นต์)
+      - คืนค่า True = ยกเลิก: ก่อนได้ทัวร์แรก raise SolveCancelled, ระหว่าง improve คืนทัวร์ตอนนั้น,
+        ระหว่าง bound แค่หยุดคำนวณ bound (ทัวร์ไม่ถือว่าถูกยกเลิก)
+    stats: SolveStats (ถ้ามี) เก็บเวลาแต่ละขั้นและตัวนับ -> info['stats'] (ดู SolveStats, profile_solve)
+    exact: "auto" = ต่อด้วย solve_tsp_exact เมื่อ improve และมีไม่เกิน exact_max เมือง, True = เสมอ, False = ไม่ใช้
+      exact_time_limit: เวลาสูงสุดของ exact solver ถ้าหมดเวลาจะใช้ทัวร์ heuristic (info['optimal'] = False)
+    bound: "auto" = คำนวณ lower_bound เมื่อ improve, True = เสมอ, False = ไม่คำนวณ
+      bound_time_limit: เวลาสูงสุดของ lower_bound (หมดเวลาได้ bound ที่ดีที่สุดตอนนั้น)
+      มากกว่า BOUND_DENSE_MAX เมือง: candidate list ของ improve ใช้ต่อกับ lower_bound เสมอ (รวม list ของ dict)
+    candidates: candidate list ที่สร้างไว้แล้วตาม index ของ cities (CityTable) เช่น InstanceStore.candidates
+      ใช้ทั้ง improve และ lower_bound แทนการสร้างใหม่ (ไม่ใช้กับ construction="partition")
+    คืนค่า: (Total Distance, Route Path List, Info dict) / route เป็น index array ถ้า cities เป็น CityTable
+      info['initial_distance'] = ระยะทางของทัวร์เริ่มต้น (ก่อนปรับปรุง)
+      info['cancelled'] = ถูกยกเลิกระหว่างปรับปรุงหรือไม่
+      info['optimal'] = พิสูจน์แล้วว่าเป็นทัวร์ที่สั้นที่สุด (exact solver ทำงานจนจบ)
+      info['lower_bound'], info['gap'] = lower bound และ (distance - bound) / bound (None ถ้าไม่ได้คำนวณ)
+      info['bound_proven'] = lower bound พิสูจน์ได้ (gap เป็นเพดานจริง) / False = ค่าประมาณ (ดู bound_is_proven)
+      info['stats'] = stats.as_dict() (เฉพาะเมื่อส่ง stats มา)
+    """
+    # จำว่าถูกยกเลิกหรือไม่ (ระหว่าง improve จะยังได้ทัวร์กลับมา)
+    cancelled = []
+    track = None
+    if progress is not None:
+        def track(stage, done, total, tour=None):
+            if progress(stage, done, total, tour):
+                cancelled.append(stage)
+                return True
+            return False
+
+    if construction not in CONSTRUCTIONS:
+        raise ValueError(f"Unknown construction: {construction!r}")
+    stored, candidates = candidates, None
+    partitioned = construction == "partition" and len(cities) > 3
+    if construction == "hilbert":
+        initial_distance, route_path = solve_tsp_hilbert(cities, distances=distances, metric=metric, stats=stats)
+    elif partitioned:
+        metric = _resolve_metric(metric, distances)
+        initial_distance, partition_distance, route_path, candidates = _partitioned(
+            cities, PARTITION_SIZE, workers, engine, k, time_limit, improve, metric, track, stats)
+    elif n_starts == 1:
+        initial_distance, route_path = solve_tsp_nearest_neighbor(cities, engine=engine, distances=distances,
+                                                                  metric=metric, progress=track, stats=stats)
+    else:
+        metric = _resolve_metric(metric, distances)
+        initial_distance, route_path = solve_tsp_multistart(cities, n_starts=n_starts, workers=workers,
+                                                            engine=engine, metric=metric, progress=track,
+                                                            stats=stats)
+    total_distance = initial_distance
+    want_bound = bound is True or (bound == "auto" and improve)
+    if partitioned:
+        # แต่ละ cluster และรอยต่อถูกปรับปรุงแล้วใน _partitioned (candidate list ใช้ต่อกับ lower_bound ได้)
+        total_distance = partition_distance
+    elif improve and len(cities) > 3:
+        table = cities if isinstance(cities, CityTable) else None
+        work, route, on_progress = table, route_path, track
+        if stored is not None and table is not None:
+            # แปลง n x k (memmap) เป็น list ครั้งเดียวใน C (local search อ่านทีละแถวเร็วกว่า)
+            candidates = stored.tolist() if HAS_NUMPY and isinstance(stored, np.ndarray) else [list(r) for r in stored]
+        elif want_bound and len(cities) > BOUND_DENSE_MAX:
+            # candidate list ชุดเดียวใช้ทั้ง improve และ lower_bound (ส่วนที่แพงที่สุดของ bound บน instance ใหญ่)
+            if table is None:
+                # list ของ dict: ปรับปรุงบน CityTable ชั่วคราว -> candidate list อยู่ตาม index ของ cities
+                work = CityTable.from_dicts(cities)
+                route = _route(work, _route_order(cities, route_path))
+                if track is not None:
+                    def on_progress(stage, done, total, tour=None):
+                        return track(stage, done, total, None if tour is None else [cities[int(i)] for i in tour])
+            with _phase(stats, "candidates"):
+                kern = _resolve_metric(metric, distances).prepare(*_xy(work))
+                candidates = _candidate_lists(kern, k, stats)
+        total_distance, route = improve_route(route, k=k, time_limit=time_limit, distances=distances,
+                                              metric=metric, progress=on_progress, cities=work, stats=stats,
+                                              candidates=candidates)
+        route_path = route if work is table else [cities[int(i)] for i in route]
+
+    optimal = len(cities) <= 3
+    if (exact is True or (exact == "auto" and improve and len(cities) <= exact_max)) and not cancelled and not optimal:
+        order = _route_order(cities, route_path)
+        total_distance, route_path, optimal = solve_tsp_exact(
+            cities, distances=distances, metric=metric, time_limit=exact_time_limit,
+            upper_bound=(total_distance, order), progress=track, stats=stats)
+
+    bound_value = None
+    if optimal:
+        bound_value = total_distance
+    elif want_bound and not cancelled:
+        bound_value = lower_bound(cities, metric=_resolve_metric(metric, distances), upper=total_distance,
+                                  time_limit=bound_time_limit, candidates=candidates, progress=progress, stats=stats)
+
+    info = {
+        'initial_distance': initial_distance,
+        'distance': total_distance,
+        'improvement': (initial_distance - total_distance) / initial_distance if initial_distance else 0.0,
+        'unit': _resolve_metric(metric, distances).unit,
+        'cancelled': bool(cancelled),
+        'optimal': optimal,
+        'lower_bound': bound_value,
+        'gap': optimality_gap(total_distance, bound_value),
+        'bound_proven': bound_value is not None and (optimal or bound_is_proven(len(cities))),
+    }
+    if stats is not None:
+        info['stats'] = stats.as_dict()
+    return total_distance, route_path, info
+
+def profile_solve(path, cities, **kwargs):
+    """
+    แก้ 1 ครั้งภายใต้ cProfile แล้วบันทึกผลลง path (.prof เปิดด้วย pstats / snakeviz)
+    เปิด SolveStats ให้ด้วยถ้าไม่ได้ส่ง stats มา (งานใน worker process ของ multistart ไม่ถูก profile)
+    คืนค่า: เหมือน solve_tsp
+    """
+    kwargs.setdefault("stats", SolveStats())
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(solve_tsp, cities, **kwargs)
+    finally:
+        profiler.dump_stats(path)
+
+# ==========================================
+# Dynamic Route (เพิ่ม/ลบเมืองทีละจุดโดยไม่ต้องแก้ใหม่ทั้งหมด)
+# ==========================================
+# จำนวนเมืองในทัวร์ที่ใกล้จุดใหม่ที่สุด ที่ใช้หาตำแหน่งแทรก (เทียบเฉพาะเส้นที่ติดกับเมืองเหล่านี้)
+DYNAMIC_K = 8
+# จำนวนเมืองแต่ละฝั่งของจุดที่เปลี่ยน ที่ถูกปรับปรุงซ้ำด้วย 2-opt + Or-opt
+DYNAMIC_WINDOW = 20
+
+def _improve_path(dist, path):
+    """
+    2-opt + Or-opt บนเส้นทางสั้นๆ ที่ปลายทั้งสองข้างคงที่ (ตรวจทุกคู่ O(m^2) ต่อรอบ ใช้กับ m ไม่กี่สิบเมือง)
+    คืนค่า: (เส้นทางใหม่, ความยาวที่ลดลง)
+    """
+    path = list(path)
+    m = len(path)
+    saved = 0.0
+    improved = True
+    while improved:
+        improved = False
+        # 2-opt: กลับลำดับ path[i..j]
+        for i in range(1, m - 2):
+            for j in range(i + 1, m - 1):
+                delta = (dist(path[i - 1], path[j]) + dist(path[i], path[j + 1])
+                         - dist(path[i - 1], path[i]) - dist(path[j], path[j + 1]))
+                if delta < -IMPROVE_EPS:
+                    path[i:j + 1] = path[i:j + 1][::-1]
+                    saved -= delta
+                    improved = True
+        # Or-opt: ย้าย segment path[i..j] (1-3 เมือง) ไปแทรกระหว่าง path[t], path[t + 1] (กลับทิศได้)
+        for seg_len in (1, 2, 3):
+            i = 1
+            while i + seg_len < m:
+                j = i + seg_len - 1
+                gain = dist(path[i - 1], path[i]) + dist(path[j], path[j + 1]) - dist(path[i - 1], path[j + 1])
+                best = None
+                for t in range(m - 1):
+                    if i - 1 <= t <= j:
+                        continue
+                    base = dist(path[t], path[t + 1])
+                    for first, last in ((path[i], path[j]), (path[j], path[i])):
+                        delta = dist(path[t], first) + dist(last, path[t + 1]) - base - gain
+                        if delta < -IMPROVE_EPS and (best is None or delta < best[0]):
+                            best = (delta, t, first == path[i])
+                if best is not None:
+                    delta, t, forward = best
+                    seg = path[i:j + 1] if forward else path[i:j + 1][::-1]
+                    rest = path[:i] + path[j + 1:]
+                    at = t + 1 if t < i else t + 1 - seg_len
+                    path = rest[:at] + seg + rest[at:]
+                    saved -= delta
+                    improved = True
+                i += 1
+    return path, saved
+
+class DynamicRoute:
+    """
+    เส้นทางที่แก้ไขทีละเมืองได้ (ใช้ต่อจาก solve_tsp) แทนการแก้ TSP ใหม่ทั้งชุดทุกครั้งที่เพิ่ม/ลบเมือง
+    - ทัวร์เก็บเป็น linked list (succ/pred) -> แทรก/ลบ O(1)
+    - spatial index: KDTree ของเมืองในทัวร์ (เพิ่ม/ลบจุดได้) -> หาเมืองใกล้จุดใหม่ ~O(log n)
+    - insert: cheapest insertion เทียบเฉพาะเส้นที่ติดกับ DYNAMIC_K เมืองที่ใกล้ที่สุด
+    - remove: ต่อเมืองก่อนหน้ากับเมืองถัดไปเข้าหากัน (local repair)
+    - reoptimize (ค่าเริ่มต้น): 2-opt + Or-opt ช่วงทัวร์ DYNAMIC_WINDOW เมืองแต่ละฝั่งของจุดที่เปลี่ยน
+    cities: CityTable ที่ route อ้างถึง -> insert/remove เพิ่ม/ลบเมืองในตารางนี้ด้วย (index ตรงกับตารางเสมอ)
+    route: route แบบวนกลับจาก solve_tsp (index array ของ cities)
+    ภายในใช้ "slot" ที่ไม่เปลี่ยนตามการลบ (เรียงตามลำดับแถวในตาราง) -> ลบเมืองไม่ต้องไล่แก้ index ทั้งทัวร์
+    (Manhattan ฉายพิกัดที่ละติจูดของเมืองแรกตอนสร้าง แม้เมืองนั้นถูกลบไปแล้ว)
+    """
+
+    def __init__(self, cities, route, metric=None):
+        self.cities = cities
+        self.metric = get_metric(metric)
+        n = len(cities)
+        xs, ys = _xy(cities)
+        self._origin = (float(xs[0]), float(ys[0])) if n else None
+        self._kern = self.metric.prepare(xs, ys)
+        self._kd = [list(col) for col in self._kern.kd_columns]
+        self._slots = list(range(n))      # slot ของแต่ละแถวในตาราง (เรียงจากน้อยไปมาก)
+        self._alive = [True] * n
+        order = _route_order(cities, route) if n > 1 else list(range(n))
+        if sorted(order) != list(range(n)):
+            raise ValueError("route must visit every city exactly once")
+        self._succ = [0] * n
+        self._pred = [0] * n
+        for a, b in zip(order, order[1:] + order[:1]):
+            self._succ[a] = b
+            self._pred[b] = a
+        self.distance = _tour_length(self._kern.pair, order) if n > 1 else 0.0
+        self._build_index()
+
+    def _build_index(self):
+        self._tree = KDTree(*self._kd, norm=self._kern.kd_norm)
+        for s, alive in enumerate(self._alive):
+            if not alive:
+                self._tree.remove(s)
+        self._inserted = 0
+
+    def _new_slot(self, x, y):
+        # เตรียมคอลัมน์ของเมืองใหม่ด้วย kernel ที่มีเมืองแรก (origin) นำหน้า -> ค่าเหมือนเตรียมพร้อมทั้งตาราง
+        if self._origin is None:
+            self._origin = (x, y)
+        point = self.metric.prepare([self._origin[0], x], [self._origin[1], y])
+        for col, new in zip(self._kern.cols, point.cols):
+            col.append(new[1])
+        for col, new in zip(self._kd, point.kd_columns):
+            col.append(new[1])
+        self._succ.append(0)
+        self._pred.append(0)
+        self._alive.append(True)
+        return len(self._alive) - 1
+
+    def __len__(self):
+        return len(self._slots)
+
+    @property
+    def info(self):
+        """info รูปแบบเดียวกับ solve_tsp (ไม่มี lower bound เพราะทัวร์ถูกแก้เฉพาะจุด) เช่นสำหรับ InstanceStore.save_route"""
+        return {'initial_distance': self.distance, 'distance': self.distance, 'improvement': 0.0,
+                'unit': self.metric.unit, 'cancelled': False, 'optimal': False, 'lower_bound': None, 'gap': None,
+                'bound_proven': False}
+
+    @property
+    def route(self):
+        """route แบบวนกลับเริ่มที่เมืองแรกของตาราง (index array ของ cities เหมือนผลของ solve_tsp)"""
+        if not self._slots:
+            return _route(self.cities, [])
+        start = self._slots[0]
+        order = [start]
+        s = self._succ[start]
+        while s != start:
+            order.append(s)
+            s = self._succ[s]
+        if HAS_NUMPY:
+            rows = np.searchsorted(np.array(self._slots), order)
+        else:
+            row_of = {s: i for i, s in enumerate(self._slots)}
+            rows = [row_of[s] for s in order]
+        return _route(self.cities, rows)
+
+    def insert(self, name, x, y, reoptimize=True):
+        """
+        เพิ่มเมืองท้ายตารางแล้วแทรกเข้าทัวร์ตรงเส้นที่ทำให้ระยะทางเพิ่มน้อยที่สุด (~O(log n))
+        คืนค่า: index ของเมืองใหม่ในตาราง
+        """
+        index = self.cities.add(name, x, y)
+        s = self._new_slot(float(x), float(y))
+        dist = self._kern.pair
+        if not self._slots:
+            self._succ[s] = self._pred[s] = s
+        else:
+            best = None
+            for _, a in self._tree.nearest_k(DYNAMIC_K, *(col[s] for col in self._kd)):
+                for u in (self._pred[a], a):
+                    v = self._succ[u]
+                    cost = dist(u, s) + dist(s, v) - (dist(u, v) if u != v else 0.0)
+                    if best is None or cost < best[0]:
+                        best = (cost, u, v)
+            cost, u, v = best
+            self._succ[u], self._pred[s], self._succ[s], self._pred[v] = s, u, v, s
+            self.distance += cost
+        self._slots.append(s)
+        self._tree.insert(*(col[s] for col in self._kd))
+        self._inserted += 1
+        if self._inserted > max(64, len(self._slots)):
+            self._build_index()  # leaf ที่ถูกเพิ่มจุดเยอะจะช้าลง -> สร้าง tree ใหม่เป็นครั้งคราว
+        if reoptimize:
+            self._reoptimize(s)
+        return index
+
+    def remove(self, index, reoptimize=True):
+        """
+        ลบเมือง index ออกจากตารางและทัวร์ แล้วต่อเมืองก่อนหน้ากับเมืองถัดไป
+        คืนค่า: dict ของเมืองที่ลบ
+        """
+        s = self._slots.pop(index)
+        city = self.cities.remove(index)
+        p, q = self._pred[s], self._succ[s]
+        if p != s:
+            dist = self._kern.pair
+            self.distance += (dist(p, q) if p != q else 0.0) - dist(p, s) - dist(s, q)
+            self._succ[p], self._pred[q] = q, p
+        if len(self._slots) < 2:
+            self.distance = 0.0
+        self._alive[s] = False
+        self._tree.remove(s)
+        if reoptimize and len(self._slots) > 0:
+            self._reoptimize(p)
+        return city
+
+    def _reoptimize(self, s):
+        """2-opt + Or-opt เฉพาะช่วงทัวร์รอบ slot s (ปลายทั้งสองข้างของช่วงคงที่)"""
+        n = len(self._slots)
+        if n < 5:
+            return
+        # ช่วงทัวร์ที่มี s อยู่ตรงกลาง (ถ้าทัวร์สั้นกว่าช่วง ใช้ทั้งทัวร์โดยให้ปลายติดกัน)
+        half = min(DYNAMIC_WINDOW, (n - 1) // 2)
+        start = s
+        for _ in range(half):
+            start = self._pred[start]
+        path = [start]
+        for _ in range(2 * half):
+            path.append(self._succ[path[-1]])
+        path, saved = _improve_path(self._kern.pair, path)
+        if saved <= 0:
+            return
+        for a, b in zip(path, path[1:]):
+            self._succ[a] = b
+            self._pred[b] = a
+        self.distance -= saved
+
+# ==========================================
+# Instance Store (memory-mapped, บนดิสก์)
+# ==========================================
+# ไดเรกทอรีของ store: meta.json + ไฟล์ binary ดิบ (little-endian) ต่อคอลัมน์/matrix
+STORE_META = "meta.json"
+STORE_VERSION = 1
+
+def _store_write(path, values, typecode):
+    """
+    เขียนคอลัมน์/matrix เป็น binary ดิบ little-endian ("d" = float64, "i" = int32, "q" = int64)
+    เขียนไฟล์ชั่วคราวแล้ว os.replace -> CityTable ที่ยัง map ไฟล์เดิมอยู่ไม่เสีย (ยังอ่าน inode เดิม)
+    """
+    tmp = path + ".tmp"
+    if HAS_NUMPY:
+        np.ascontiguousarray(values, dtype="<" + {"d": "f8", "i": "i4", "q": "i8"}[typecode]).tofile(tmp)
+    else:
+        data = array(typecode, values)
+        if sys.byteorder != "little":
+            data.byteswap()
+        with open(tmp, "wb") as f:
+            data.tofile(f)
+    os.replace(tmp, path)
+
+def _store_map(path, typecode, shape):
+    """
+    เปิดไฟล์ของ store: NumPy = np.memmap อ่านอย่างเดียว (ไม่ copy ไม่ parse หน้าจริงถูกอ่านเมื่อใช้)
+    ไม่มี NumPy = อ่านทั้งไฟล์เข้า array (copy ครั้งเดียว ไม่ parse) / matrix 2 มิติเป็น list ของแถว
+    """
+    count = math.prod(shape)
+    if HAS_NUMPY:
+        dtype = "<" + {"d": "f8", "i": "i4", "q": "i8"}[typecode]
+        if count == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+    data = array(typecode)
+    with open(path, "rb") as f:
+        data.fromfile(f, count)
+    if sys.byteorder != "little":
+        data.byteswap()
+    if len(shape) == 2:
+        return [data[i * shape[1]:(i + 1) * shape[1]] for i in range(shape[0])]
+    return data
+
+def _mapped_file(a):
+    """ไฟล์ที่ a ถูก map มาทั้งไฟล์ (คอลัมน์ float64 ของ InstanceStore ที่ยังไม่ถูกแก้) หรือ None"""
+    if not HAS_NUMPY or not isinstance(a, np.ndarray):
+        return None
+    m = a if isinstance(a, np.memmap) else a.base
+    if not isinstance(m, np.memmap) or not m.filename or m.offset != 0:
+        return None
+    if (a.dtype != np.float64 or not a.flags.c_contiguous or a.ctypes.data != m.ctypes.data
+            or a.nbytes != os.path.getsize(m.filename)):
+        return None
+    return m.filename
+
+class InstanceStore:
+    """
+    เก็บ instance ขนาดใหญ่ลงดิสก์แบบเปิดซ้ำได้ทันที (ไม่ต้อง parse CSV/JSON ใหม่)
+    - cities: พิกัดเป็น float64 ดิบ เปิดด้วย np.memmap -> CityTable ที่คอลัมน์ map จากไฟล์ (copy เมื่อแก้ครั้งแรก)
+      ชื่อเมืองเก็บต่อกันคั่นด้วย \\0 (decode ครั้งเดียว)
+    - ส่งให้ worker process ได้โดยไม่ copy: worker เปิดไฟล์เดียวกันเอง (ดู _kernel_workers)
+    - ต่อ metric (ไม่บังคับ): route ที่แก้แล้ว + info, candidate list (n x k), distance matrix (n x n)
+    store หนึ่งผูกกับชุดเมืองชุดเดียว -> สร้างใหม่ด้วย InstanceStore.create เมื่อเมืองเปลี่ยน
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, STORE_META), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != STORE_VERSION:
+            raise ValueError(f"Unsupported store version: {self.meta.get('version')!r}")
+        self.n = self.meta["n"]
+
+    @classmethod
+    def create(cls, path, cities):
+        """เขียนชุดเมือง (CityTable หรือ list ของ dict) ลง path (ไดเรกทอรี) ทับ store เดิมถ้ามี"""
+        if not isinstance(cities, CityTable):
+            cities = CityTable.from_dicts(cities)
+        if any("\0" in name for name in cities.names):
+            raise ValueError("city names must not contain NUL characters")
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(os.path.join(path, STORE_META)):
+            # ไฟล์ route/candidate/matrix ของชุดเมืองเดิมใช้ไม่ได้แล้ว
+            for name in cls(path)._files()[3:]:
+                if os.path.exists(os.path.join(path, name)):
+                    os.remove(os.path.join(path, name))
+        _store_write(os.path.join(path, "x.f64"), cities.xs, "d")
+        _store_write(os.path.join(path, "y.f64"), cities.ys, "d")
+        with open(os.path.join(path, "names.txt.tmp"), "w", encoding="utf-8", newline="") as f:
+            f.write("\0".join(cities.names))
+        os.replace(os.path.join(path, "names.txt.tmp"), os.path.join(path, "names.txt"))
+        # key = content hash ของไฟล์ (ใช้แทน instance_key ได้โดยไม่ต้อง hash ทีละเมืองตอนเปิด)
+        h = hashlib.sha1()
+        for name in ("x.f64", "y.f64", "names.txt"):
+            with open(os.path.join(path, name), "rb") as f:
+                h.update(f.read())
+        store = cls.__new__(cls)
+        store.path, store.n = path, len(cities)
+        store.meta = {"version": STORE_VERSION, "n": len(cities), "key": "store:" + h.hexdigest(),
+                      "routes": {}, "candidates": {}, "distances": {}}
+        store._save_meta()
+        return store
+
+    @property
+    def key(self):
+        """Content hash ของชุดเมืองใน store (ค่าไม่เท่ากับ instance_key แต่ใช้เป็น cache key ได้เหมือนกัน)"""
+        return self.meta["key"]
+
+    def _files(self):
+        files = ["x.f64", "y.f64", "names.txt"]
+        for section in ("routes", "candidates", "distances"):
+            files += [entry["file"] for entry in self.meta.get(section, {}).values()]
+        return files
+
+    def _save_meta(self):
+        # เขียน meta.json ทีหลังสุดแบบ atomic -> store ที่เขียนไม่จบไม่ถูกเปิดเป็นข้อมูลครึ่งๆ
+        tmp = os.path.join(self.path, STORE_META + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, os.path.join(self.path, STORE_META))
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    @cached_property
+    def cities(self):
+        """CityTable ที่คอลัมน์พิกัด map จากไฟล์ (อ่านอย่างเดียว add/remove จะ copy คอลัมน์ก่อนแก้)"""
+        with open(self._file("names.txt"), encoding="utf-8", newline="") as f:
+            names = f.read().split("\0") if self.n else []
+        table = CityTable.__new__(CityTable)
+        table.names = names
+        table._x = _store_map(self._file("x.f64"), "d", (self.n,))
+        table._y = _store_map(self._file("y.f64"), "d", (self.n,))
+        return table
+
+    # --- route ที่แก้แล้ว (ต่อ metric) ---
+    def save_route(self, route, metric=None, info=None):
+        """บันทึก route แบบวนกลับ (index array ของ cities) พร้อม info ของ solve_tsp (ส่วนที่เป็น JSON)"""
+        name = get_metric(metric).name
+        entry = {"file": f"route.{name}.i64", "length": len(route)}
+        _store_write(self._file(entry["file"]), route, "q")
+        entry["info"] = dict(info or {})
+        self.meta["routes"][name] = entry
+        self._save_meta()
+
+    def route(self, metric=None):
+        """คืนค่า (Total Distance, route, info) เหมือน solve_tsp หรือ None ถ้ายังไม่ได้บันทึก"""
+        entry = self.meta["routes"].get(get_metric(metric).name)
+        if entry is None:
+            return None
+        route = _store_map(self._file(entry["file"]), "q", (entry["length"],))
+        route = np.array(route, dtype=np.intp) if HAS_NUMPY else list(route)
+        info = dict(entry["info"])
+        return info.get("distance"), route, info
+
+    # --- candidate list (ต่อ metric) ---
+    def save_candidates(self, metric=None, k=8, candidates=None):
+        """บันทึก candidate list (k เมืองใกล้สุดของแต่ละเมือง) ถ้าไม่ส่งมาจะสร้างด้วย KD-tree (ส่วนที่แพงของ instance ใหญ่)"""
+        metric = get_metric(metric)
+        if candidates is None:
+            candidates = _candidate_lists(metric.prepare(*_xy(self.cities)), k)
+        k = len(candidates[0]) if len(candidates) else 0
+        if any(len(row) != k for row in candidates):
+            raise ValueError("every candidate list must have the same length")
+        entry = {"file": f"candidates.{metric.name}.i32", "k": k}
+        if HAS_NUMPY:
+            _store_write(self._file(entry["file"]), np.asarray(candidates, dtype=np.int32).reshape(len(candidates), k), "i")
+        else:
+            _store_write(self._file(entry["file"]), [i for row in candidates for i in row], "i")
+        self.meta["candidates"][metric.name] = entry
+        self._save_meta()
+
+    def candidates(self, metric=None):
+        """candidate list n x k (memmap) สำหรับ solve_tsp(candidates=...) หรือ None"""
+        entry = self.meta["candidates"].get(get_metric(metric).name)
+        if entry is None:
+            return None
+        return _store_map(self._file(entry["file"]), "i", (self.n, entry["k"]))
+
+    # --- distance matrix (ต่อ metric, instance ไม่เกิน MATRIX_MAX_CITIES) ---
+    def save_distances(self, distances):
+        """บันทึก DistanceMatrix ของชุดเมืองนี้"""
+        if not distances.covers(self.cities):
+            raise ValueError("distances do not match the cities of this store")
+        entry = {"file": f"distances.{distances.metric.name}.f64"}
+        matrix = distances.matrix
+        _store_write(self._file(entry["file"]), matrix if HAS_NUMPY else [v for row in matrix for v in row], "d")
+        self.meta["distances"][distances.metric.name] = entry
+        self._save_meta()
+
+    def distances(self, metric=None):
+        """DistanceMatrix ที่ matrix map จากไฟล์ (ไม่คำนวณใหม่) หรือ None"""
+        metric = get_metric(metric)
+        entry = self.meta["distances"].get(metric.name)
+        if entry is None:
+            return None
+        return DistanceMatrix.from_matrix(self.cities, _store_map(self._file(entry["file"]), "d", (self.n, self.n)),
+                                          metric)
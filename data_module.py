@@ -0,0 +1,155 @@
+import csv
+import json
+import sys
+
+# คอลัมน์ที่ใช้ระบุ instance ในไฟล์ CSV (แถวที่ id เดียวกันติดกัน = instance เดียวกัน)
+INSTANCE_COLUMNS = ("instance_id", "instance", "id")
+
+# ชื่อคอลัมน์ที่ยอมรับได้ (เผื่อไฟล์ส่งออกจากระบบอื่น)
+COLUMN_ALIASES = {
+    'name': ("name", "location", "location name"),
+    'x': ("x", "lat", "latitude", "latitude (x)"),
+    'y': ("y", "lon", "lng", "longitude", "longitude (y)"),
+}
+
+def _open_text(source):
+    """รับ path, "-" (stdin) หรือ file object ที่เปิดแล้ว คืนค่า (file object, ต้องปิดเองหรือไม่)"""
+    if source == "-":
+        return sys.stdin, False
+    if isinstance(source, str):
+        return open(source, "r", encoding="utf-8-sig", newline=""), True
+    return source, False
+
+def detect_format(source, fmt=None):
+    """เดาชนิดไฟล์จากนามสกุล: "csv", "json" หรือ "jsonl" (ค่าเริ่มต้น)"""
+    if fmt:
+        return fmt.lower()
+    name = str(source if isinstance(source, str) else getattr(source, "name", "")).lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith(".json"):
+        return "json"
+    return "jsonl"
+
+def _csv_columns(fieldnames):
+    """จับคู่หัวคอลัมน์ในไฟล์กับ name/x/y คืนค่า dict เช่น {'name': 'Location', 'x': 'lat', ...}"""
+    lookup = {f.strip().lower(): f for f in fieldnames or []}
+    columns = {}
+    for key, aliases in COLUMN_ALIASES.items():
+        columns[key] = next((lookup[a] for a in aliases if a in lookup), None)
+    if columns['x'] is None or columns['y'] is None:
+        raise ValueError(f"CSV needs x/y (or latitude/longitude) columns, got: {fieldnames}")
+    return columns
+
+def make_city(name, x, y):
+    """สร้างเมืองรูปแบบเดียวกับทั้งระบบ {'name','x','y'}"""
+    return {'name': str(name), 'x': float(x), 'y': float(y)}
+
+# record ที่อ่าน/ตรวจไม่ผ่าน -> yield (id, None, {"error": ข้อความ}) แล้วอ่านต่อ (instance เสียตัวเดียวไม่หยุดทั้ง batch)
+RECORD_ERRORS = (ValueError, KeyError, TypeError, AttributeError)
+
+def _iter_jsonl(f):
+    for line_no, line in enumerate(f, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        instance_id = str(line_no)
+        try:
+            record = json.loads(line)
+            if isinstance(record, list):
+                record = {"cities": record}
+            instance_id = str(record.get("id", line_no))
+            cities = [make_city(c['name'], c['x'], c['y']) for c in record.get("cities", [])]
+        except RECORD_ERRORS as e:
+            yield instance_id, None, {"error": f"Line {line_no}: {type(e).__name__}: {e}"}
+            continue
+        options = {k: v for k, v in record.items() if k not in ("id", "cities")}
+        yield instance_id, cities, options
+
+def _iter_csv(f):
+    reader = csv.DictReader(f)
+    try:
+        columns = _csv_columns(reader.fieldnames)
+    except (ValueError, csv.Error) as e:
+        # หัวคอลัมน์เสีย = อ่านทั้งไฟล์ไม่ได้
+        yield "1", None, {"error": f"Header: {e}"}
+        return
+    lookup = {c.strip().lower(): c for c in reader.fieldnames}
+    id_col = next((lookup[c] for c in INSTANCE_COLUMNS if c in lookup), None)
+
+    # error = ข้อความของแถวแรกที่เสียใน instance ปัจจุบัน (อ่านแถวที่เหลือของ instance นั้นทิ้งแล้ว yield เป็น error)
+    current_id, cities, error = None, [], None
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            break
+        except csv.Error as e:
+            yield f"line {reader.line_num}", None, {"error": f"Line {reader.line_num}: {e}"}
+            continue
+        inst = row[id_col] if id_col else "1"
+        if (cities or error) and inst != current_id:
+            yield current_id, (None if error else cities), ({"error": error} if error else {})
+            cities, error = [], None
+        current_id = inst
+        if error:
+            continue
+        try:
+            cities.append(_row_to_city(row, columns, reader.line_num, len(cities) + 1))
+        except ValueError as e:
+            error = str(e)
+    if cities or error:
+        yield current_id, (None if error else cities), ({"error": error} if error else {})
+
+def _row_to_city(row, columns, line_no, default_name):
+    name = row.get(columns['name']) if columns['name'] else None
+    try:
+        return make_city(name or default_name, row[columns['x']], row[columns['y']])
+    except (TypeError, ValueError):
+        raise ValueError(f"Line {line_no}: invalid coordinates {row[columns['x']]!r}, {row[columns['y']]!r}") from None
+
+def iter_instances(source, fmt=None):
+    """
+    อ่านหลาย instance แบบ lazy (ทีละ instance ไม่โหลดทั้งไฟล์เข้าหน่วยความจำ)
+    - JSONL: หนึ่งบรรทัดต่อ instance {"id": ..., "cities": [{"name","x","y"}, ...], ...options}
+    - CSV: คอลัมน์ instance_id,name,x,y (แถวของ instance เดียวกันต้องติดกัน), ไม่มี instance_id = instance เดียว
+    คืนค่า: generator ของ (instance id, cities, options)
+      record ที่เสีย (JSON ผิดรูปแบบ, ไม่มี x/y, แถว CSV เสีย) -> (instance id, None, {"error": ข้อความ}) แล้วอ่านต่อ
+    """
+    f, owned = _open_text(source)
+    try:
+        if detect_format(source, fmt) == "csv":
+            yield from _iter_csv(f)
+        else:
+            yield from _iter_jsonl(f)
+    finally:
+        if owned:
+            f.close()
+
+def load_cities(source, fmt=None):
+    """
+    โหลดเมืองทั้งไฟล์ในรอบเดียว (1 instance) สำหรับปุ่ม Import ของหน้าจอ
+    - CSV: คอลัมน์ name,x,y (หรือ latitude/longitude)
+    - JSON: list ของ {"name","x","y"} หรือ {"cities": [...]}
+    - JSONL: ใช้ instance แรกของไฟล์
+    คืนค่า: list ของ dict เมือง
+    """
+    fmt = detect_format(source, fmt)
+    f, owned = _open_text(source)
+    try:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            columns = _csv_columns(reader.fieldnames)
+            return [_row_to_city(row, columns, reader.line_num, i) for i, row in enumerate(reader, start=1)]
+        if fmt == "json":
+            data = json.load(f)
+            records = data.get("cities", []) if isinstance(data, dict) else data
+            return [make_city(c.get('name', i), c['x'], c['y']) for i, c in enumerate(records, start=1)]
+        for _, cities, options in _iter_jsonl(f):
+            if cities is None:
+                raise ValueError(options["error"])
+            return cities
+        return []
+    finally:
+        if owned:
+            f.close()
@@ -0,0 +1,401 @@
+"""
+Solver Service (Local HTTP API)
+บริการ HTTP แบบ asyncio รอบ calculation_module ให้เครื่องมืออื่นเรียก solver ได้โดยไม่ต้องเปิด Tkinter / Streamlit
+ใช้ stdlib เท่านั้น (ไม่ต้องลง web framework) และ bind ที่ 127.0.0.1 เป็นค่าเริ่มต้น
+
+ตัวอย่าง:
+    python solver_service.py --port 8765 --workers 4
+    curl -s localhost:8765/solve -d '{"cities": [{"name": "A", "x": 0, "y": 0}, ...], "metric": "haversine"}'
+
+Endpoints:
+    POST /solve    {"id"?, "cities": [...], ตัวเลือก solver} -> ผลลัพธ์รูปแบบเดียวกับ batch_solver
+    POST /batch    {"instances": [{"id", "cities", ตัวเลือกของ instance}], ตัวเลือกร่วม} -> {"results": [...]}
+    GET  /metrics  queue depth, cache hit, coalesced, latency (p50/p95/p99)
+    GET  /health
+
+- แก้ใน process pool (event loop ไม่ถูก block ระหว่างแก้)
+- Coalescing: request ที่เหมือนกัน (เมือง + ตัวเลือก) ที่กำลังแก้อยู่รอผลของงานเดียวกัน
+- Cache: ผลลัพธ์ล่าสุดแบบ LRU (--cache-size)
+- Backpressure: งานค้างเกิน --max-pending -> ตอบ 503 + Retry-After ทันที (ไม่รับงานเพิ่มจนหน่วยความจำบวม)
+  /batch ที่มีงานใหม่มากกว่า --max-pending ในตัวเอง (ส่งซ้ำก็ไม่มีวันผ่าน) -> ตอบ 413 พร้อมบอกเพดาน
+"""
+import argparse
+import asyncio
+import hashlib
+import http.client
+import json
+import os
+import sys
+import time
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import batch_solver
+import calculation_module as calc
+import data_module
+from batch_solver import DEFAULT_OPTIONS, solve_instance
+
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 256 * 1024 * 1024
+LATENCY_SAMPLES = 2048      # จำนวน latency ล่าสุดที่เก็บไว้คำนวณ percentile
+
+class RequestError(Exception):
+    """request ผิดรูปแบบ (ตอบ 400)"""
+
+class ServiceBusy(Exception):
+    """งานค้างเต็ม max_pending (ตอบ 503)"""
+
+class BatchTooLarge(Exception):
+    """batch มีงานใหม่เกิน max_pending ในตัวเอง (ตอบ 413 รอแล้วส่งซ้ำก็ไม่ผ่าน ต้องแบ่ง batch)"""
+
+def parse_options(payload, base=None):
+    """ตรวจตัวเลือก solver ด้วย batch_solver.parse_options (ค่าผิด -> RequestError)"""
+    try:
+        return batch_solver.parse_options(payload, base)
+    except ValueError as e:
+        raise RequestError(str(e)) from None
+
+def parse_cities(cities):
+    """list ของ {'name','x','y'} -> รูปแบบมาตรฐานของระบบ (ไม่มี name ใช้ลำดับเป็นชื่อ)"""
+    if not isinstance(cities, list):
+        raise RequestError("cities must be a list")
+    try:
+        return [data_module.make_city(c.get('name', i), c['x'], c['y']) for i, c in enumerate(cities, start=1)]
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
+        raise RequestError(f"invalid city: {e}") from None
+
+def request_key(cities, options):
+    """Content hash ของงาน (เมืองตามลำดับ + ตัวเลือก) ไม่รวม id -> ใช้ทั้ง coalescing และ cache"""
+    h = hashlib.sha1(json.dumps(options, sort_keys=True).encode())
+    for c in cities:
+        h.update(f"{c['name']}\x1f{c['x']!r}\x1f{c['y']!r}\x1e".encode())
+    return h.hexdigest()
+
+def _percentiles(samples):
+    if not samples:
+        return {"count": 0}
+    values = sorted(samples)
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))] * 1000
+    return {"count": len(values), "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": values[-1] * 1000}
+
+class SolverService:
+    """
+    ตัวบริการ (แยกจาก HTTP): รับงาน -> cache / รวมกับงานที่กำลังแก้ / ส่งเข้า process pool
+    workers: จำนวน process, max_pending: งานที่ส่งเข้า pool ค้างได้สูงสุด, cache_size: จำนวนผลลัพธ์ใน LRU
+    options: ตัวเลือกเริ่มต้นของทุกงาน (request ทับได้)
+    """
+
+    def __init__(self, workers=None, max_pending=None, cache_size=256, options=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 8
+        self.cache_size = cache_size
+        # มี process pool ของ service อยู่แล้ว -> partition/multistart ใน worker ไม่ต้องเปิด pool ซ้อน
+        self.options = parse_options(options or {}, {**DEFAULT_OPTIONS, "solver_workers": 1})
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self._cache = OrderedDict()     # key -> ผลลัพธ์ (ไม่มี id)
+        self._inflight = {}             # key -> asyncio.Task ของงานที่กำลังแก้
+        self._pending = 0
+        self.counters = Counter()
+        self.statuses = Counter()
+        self.request_latency = deque(maxlen=LATENCY_SAMPLES)
+        self.solve_latency = deque(maxlen=LATENCY_SAMPLES)
+        self.started = time.time()
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    # --- งานแก้ TSP ---
+    def _lookup(self, key, cities, options):
+        """
+        คืนค่า ("hit", ผลลัพธ์) / ("coalesced", task) / ("miss", task ใหม่) โดยไม่มี await
+        (ตรวจ backpressure และจองที่ใน pool ในจังหวะเดียวกัน ไม่มี request อื่นแทรกกลางทาง)
+        """
+        result = self._cache.get(key)
+        if result is not None:
+            self._cache.move_to_end(key)
+            self.counters["cache_hits"] += 1
+            return "hit", result
+        task = self._inflight.get(key)
+        if task is not None:
+            self.counters["coalesced"] += 1
+            return "coalesced", task
+        if self._pending >= self.max_pending:
+            self.counters["rejected"] += 1
+            raise ServiceBusy()
+        self._pending += 1
+        task = asyncio.ensure_future(self._run(key, cities, options))
+        self._inflight[key] = task
+        return "miss", task
+
+    async def _run(self, key, cities, options):
+        started = time.perf_counter()
+        pool = self.pool
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(pool, solve_instance, None, cities, options)
+        except BrokenProcessPool:
+            # worker ตาย (เช่นหน่วยความจำไม่พอ) -> pool ใช้ต่อไม่ได้อีก สร้างใหม่ให้ request ถัดไป (งานนี้ตอบ 500)
+            if self.pool is pool:
+                self.counters["pool_restarts"] += 1
+                self.pool = ProcessPoolExecutor(max_workers=self.workers)
+                pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            self._pending -= 1
+            self._inflight.pop(key, None)
+        self.solve_latency.append(time.perf_counter() - started)
+        self.counters["solves"] += 1
+        if "error" in result:
+            # ข้อมูลเสีย -> ไม่ cache (ส่งใหม่ก็ได้ error เดิม แต่ไม่ควรกินที่ของผลลัพธ์จริง)
+            self.counters["solve_errors"] += 1
+        else:
+            self._cache[key] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    async def _wait(self, found, instance_id):
+        source, value = found
+        # shield: client ที่ตัดการเชื่อมต่อไม่ยกเลิกงานที่ request อื่นรออยู่ด้วย
+        result = value if source == "hit" else await asyncio.shield(value)
+        return {**result, "id": instance_id}, source
+
+    async def solve(self, payload):
+        """POST /solve คืนค่า (ผลลัพธ์, "hit" | "coalesced" | "miss")"""
+        if not isinstance(payload, dict):
+            raise RequestError("request body must be a JSON object")
+        cities = parse_cities(payload.get("cities"))
+        options = parse_options(payload, self.options)
+        return await self._wait(self._lookup(request_key(cities, options), cities, options), payload.get("id"))
+
+    async def batch(self, payload):
+        """
+        POST /batch: รับทุก instance หรือไม่รับเลย แล้วแก้พร้อมกัน คืนผลตามลำดับใน request
+        ไม่รับ: งานใหม่ (ไม่อยู่ใน cache / ไม่ได้กำลังแก้) เกิน max_pending -> 413, รวมกับงานค้างแล้วเกิน -> 503
+        """
+        if not isinstance(payload, dict) or not isinstance(payload.get("instances"), list):
+            raise RequestError("request body must be a JSON object with an 'instances' list")
+        shared = parse_options(payload, self.options)
+        jobs = []
+        for i, inst in enumerate(payload["instances"], start=1):
+            if not isinstance(inst, dict):
+                raise RequestError(f"instance {i} must be a JSON object")
+            cities = parse_cities(inst.get("cities"))
+            options = parse_options(inst, shared)
+            jobs.append((request_key(cities, options), cities, options, inst.get("id", i)))
+
+        new = {key for key, *_ in jobs if key not in self._cache and key not in self._inflight}
+        if len(new) > self.max_pending:
+            self.counters["rejected"] += 1
+            raise BatchTooLarge(f"batch needs {len(new)} new solves but at most {self.max_pending} are accepted "
+                                f"per request (max_pending); split it into smaller batches")
+        if self._pending + len(new) > self.max_pending:
+            self.counters["rejected"] += 1
+            raise ServiceBusy()
+        found = [self._lookup(key, cities, options) for key, cities, options, _ in jobs]
+        done = await asyncio.gather(*(self._wait(f, job[3]) for f, job in zip(found, jobs)))
+        return {"results": [result for result, _ in done]}
+
+    def metrics(self):
+        """GET /metrics"""
+        return {
+            "uptime_seconds": time.time() - self.started,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending_solves": self._pending,
+            "queue_depth": max(0, self._pending - self.workers),
+            "inflight_keys": len(self._inflight),
+            "cache_entries": len(self._cache),
+            "cache_size": self.cache_size,
+            "counters": dict(self.counters),
+            "responses": {str(k): v for k, v in sorted(self.statuses.items())},
+            "latency_ms": {"request": _percentiles(self.request_latency), "solve": _percentiles(self.solve_latency)},
+        }
+
+    # --- HTTP ---
+    async def dispatch(self, method, path, body):
+        """คืนค่า (status, payload, header เพิ่มเติม)"""
+        routes = {"/solve": "POST", "/batch": "POST", "/metrics": "GET", "/health": "GET"}
+        if path not in routes:
+            return 404, {"error": f"not found: {path}"}, {}
+        if method != routes[path]:
+            return 405, {"error": f"method not allowed: {method}"}, {"Allow": routes[path]}
+        if path == "/health":
+            return 200, {"status": "ok"}, {}
+        if path == "/metrics":
+            return 200, self.metrics(), {}
+        try:
+            payload = json.loads(body or b"null")
+            if path == "/batch":
+                return 200, await self.batch(payload), {}
+            result, source = await self.solve(payload)
+            return (422 if "error" in result else 200), result, {"X-Cache": source}
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            return 400, {"error": f"invalid JSON: {e}"}, {}
+        except RequestError as e:
+            return 400, {"error": str(e)}, {}
+        except BatchTooLarge as e:
+            return 413, {"error": str(e), "max_pending": self.max_pending}, {}
+        except ServiceBusy:
+            return 503, {"error": "solver queue is full, retry later"}, {"Retry-After": "1"}
+        except Exception as e:
+            # งานล้มเหลวใน pool (เช่น BrokenProcessPool) -> 500 แทนการปิด connection เงียบๆ
+            # (_run เอา key ออกจาก _inflight แล้ว request ที่รองานเดียวกันได้ 500 เหมือนกัน ส่งใหม่ได้)
+            self.counters["internal_errors"] += 1
+            return 500, {"error": f"internal error: {type(e).__name__}: {e}"}, {}
+
+    async def handle(self, reader, writer):
+        """1 connection (HTTP/1.1 keep-alive: หลาย request ต่อ connection)"""
+        self.counters["connections"] += 1
+        try:
+            while True:
+                try:
+                    request_line = await reader.readline()
+                    if not request_line:
+                        break
+                    method, target, version = request_line.decode("latin-1").split()
+                    headers = {}
+                    while True:
+                        line = await reader.readline()
+                        if line in (b"\r\n", b"\n", b""):
+                            break
+                        name, _, value = line.decode("latin-1").partition(":")
+                        headers[name.strip().lower()] = value.strip()
+                    length = int(headers.get("content-length") or 0)
+                except (ValueError, asyncio.LimitOverrunError):
+                    await self._respond(writer, 400, {"error": "malformed request"}, {}, False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {"error": "request body too large"}, {}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                started = time.perf_counter()
+                status, payload, extra = await self.dispatch(method, target.split("?", 1)[0], body)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self._respond(writer, status, payload, extra, keep_alive)
+                self.request_latency.append(time.perf_counter() - started)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # client ปิด connection กลางทาง
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _respond(self, writer, status, payload, extra, keep_alive):
+        self.statuses[status] += 1
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        head = [f"HTTP/1.1 {status} {http.client.responses.get(status, '')}",
+                "Content-Type: application/json; charset=utf-8",
+                f"Content-Length: {len(body)}",
+                "Connection: " + ("keep-alive" if keep_alive else "close")]
+        head += [f"{k}: {v}" for k, v in extra.items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT):
+        """เริ่มรับ connection คืนค่า asyncio.Server (port=0 = ให้ระบบเลือก port ว่าง)"""
+        return await asyncio.start_server(self.handle, host, port)
+
+class ServiceError(Exception):
+    """Service ตอบ status >= 400 (status, ข้อความ, payload)"""
+
+    def __init__(self, status, payload):
+        super().__init__(f"HTTP {status}: {payload.get('error', payload)}")
+        self.status = status
+        self.payload = payload
+
+class SolverClient:
+    """
+    Client ของ solver service (stdlib เท่านั้น) ใช้จากเครื่องมืออื่นหรือทดสอบ
+    ใช้ connection เดียวแบบ keep-alive (ไม่ thread-safe: 1 client ต่อ thread)
+    """
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, timeout=None):
+        self.host, self.port, self.timeout = host, port, timeout
+        self._conn = None
+
+    def request(self, method, path, payload=None):
+        """คืนค่า payload ของคำตอบ (dict) หรือ raise ServiceError"""
+        body = json.dumps(payload).encode() if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        for attempt in (1, 2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._conn.request(method, path, body=body, headers=headers)
+                response = self._conn.getresponse()
+                data = json.loads(response.read() or b"null")
+                break
+            except (ConnectionError, http.client.HTTPException):
+                # connection keep-alive เดิมถูก server ปิดไปแล้ว -> ต่อใหม่ 1 ครั้ง
+                self.close()
+                if attempt == 2:
+                    raise
+        if response.getheader("Connection", "").lower() == "close":
+            self.close()
+        if response.status >= 400:
+            raise ServiceError(response.status, data)
+        return data
+
+    def solve(self, cities, **options):
+        """แก้ 1 instance (cities = list ของ {'name','x','y'}) คืนค่าผลลัพธ์รูปแบบเดียวกับ batch_solver"""
+        return self.request("POST", "/solve", {"cities": cities, **options})
+
+    def batch(self, instances, **options):
+        """instances = list ของ {"id", "cities", ...} คืนค่า list ของผลลัพธ์ตามลำดับเดิม"""
+        return self.request("POST", "/batch", {"instances": instances, **options})["results"]
+
+    def metrics(self):
+        return self.request("GET", "/metrics")
+
+    def health(self):
+        return self.request("GET", "/health")
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+async def serve(service, host, port):
+    server = await service.start(host, port)
+    addr = ", ".join(str(sock.getsockname()) for sock in server.sockets)
+    print(f"Solver service listening on {addr} ({service.workers} workers, max {service.max_pending} pending)",
+          file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP service around the TSP solver.")
+    parser.add_argument("--host", default="127.0.0.1", help="bind address (default: local only)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="solver processes")
+    parser.add_argument("--max-pending", type=int, help="max solves queued or running before answering 503 "
+                                                         "(default: 8 x workers)")
+    parser.add_argument("--cache-size", type=int, default=256, help="number of results kept in the LRU cache")
+    parser.add_argument("--metric", choices=sorted(calc.METRICS), default="euclidean", help="default metric")
+    parser.add_argument("--time-limit", type=float, help="default improvement time limit per solve (seconds)")
+    args = parser.parse_args(argv)
+
+    service = SolverService(workers=args.workers, max_pending=args.max_pending, cache_size=args.cache_size,
+                            options={"metric": args.metric, "time_limit": args.time_limit})
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,41 +1,17 @@
+import io
+import os
+import pstats
+import tempfile
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
-import math
+import calculation_module as calc
+import data_module
 
 # ==========================================
-# 1. ส่วนคำนวณ (LOGIC: Python แท้ๆ)
-# ==========================================
-def get_dist(c1, c2):
-    return math.sqrt((c1['x'] - c2['x'])**2 + (c1['y'] - c2['y'])**2)
-
-def solve_tsp_nearest_neighbor(cities):
-    if not cities:
-        return 0, []
-    
-    unvisited = cities[:]
-    # เริ่มที่เมืองแรกที่ User ใส่เข้ามา
-    current_city = unvisited.pop(0)
-    route_path = [current_city]
-    total_distance = 0
-
-    while unvisited:
-        # หาเมืองที่ใกล้ที่สุด
-        nearest_city = min(unvisited, key=lambda city: get_dist(current_city, city))
-        total_distance += get_dist(current_city, nearest_city)
-        current_city = nearest_city
-        route_path.append(current_city)
-        unvisited.remove(current_city)
-
-    # วนกลับจุดเริ่มต้น
-    if len(route_path) > 1:
-        total_distance += get_dist(route_path[-1], route_path[0])
-        route_path.append(route_path[0])
-        
-    return total_distance, route_path
-
-# ==========================================
-# 2. ส่วนหน้าจอเว็บ (UI: Streamlit)
+# ส่วนหน้าจอเว็บ (UI: Streamlit)
+# ส่วนคำนวณใช้ calculation_module ตัวเดียวกับ Desktop App / Batch Solver
 # ==========================================
 st.set_page_config(page_title="Logistics Planner Pro", layout="wide", page_icon="🚚")
 
@@ -66,12 +42,159 @@ with col2:
 
 st.divider()
 
+@st.cache_resource
+def get_distance_cache():
+    # Distance matrix cache ใช้ร่วมกันทุก rerun และทุก session (LRU ตามเพดานหน่วยความจำ, DistanceCache มี lock ในตัว)
+    return calc.DistanceCache()
+
+@st.cache_data(ttl=3600, max_entries=64, show_spinner="Optimizing route...")
+def solve_route(instance_key, metric, _cities, _store=None):
+    """
+    แก้ TSP (NN + 2-opt/Or-opt) แล้ว memoize ตาม content hash ของชุดเมือง + ตัวเลือก solver
+    _cities (CityTable) ไม่ถูก hash เพราะ instance_key แทนเนื้อหาแล้ว
+    _store: InstanceStore ของชุดเมืองนี้ (ถ้ามี) -> ใช้ route / distance matrix / candidate list ที่บันทึกไว้
+    คืนค่า: (Total Distance, route เป็น index array แบบวนกลับ, Info dict พร้อม info['stats'] ของการแก้ครั้งแรก)
+    """
+    if _store is not None:
+        stored = _store.route(metric)
+        if stored is not None:
+            return stored
+        distances = _store.distances(metric) or get_distance_cache().get(_cities, metric)
+        return calc.solve_tsp(_cities, distances=distances, metric=metric, stats=calc.SolveStats(),
+                              candidates=_store.candidates(metric))
+    distances = get_distance_cache().get(_cities, metric)
+    return calc.solve_tsp(_cities, distances=distances, metric=metric, stats=calc.SolveStats())
+
+def profile_route(metric, cities):
+    """
+    แก้ 1 ครั้งภายใต้ cProfile (ไม่ผ่าน cache)
+    คืนค่า: (ไฟล์ .prof เป็น bytes, ข้อความสรุป 25 ฟังก์ชันที่ใช้เวลารวมสูงสุด)
+    """
+    distances = get_distance_cache().get(cities, metric)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "solve.prof")
+        calc.profile_solve(path, cities, distances=distances, metric=metric)
+        text = io.StringIO()
+        pstats.Stats(path, stream=text).strip_dirs().sort_stats("cumulative").print_stats(25)
+        with open(path, "rb") as f:
+            return f.read(), text.getvalue()
+
+@st.cache_data(ttl=3600, max_entries=256)
+def table_page(instance_key, start, stop, _cities):
+    """DataFrame ของตารางเฉพาะหน้าที่แสดง (ไม่สร้างใหม่ทุก rerun)"""
+    return pd.DataFrame({'name': _cities.names[start:stop], 'x': _cities.xs[start:stop], 'y': _cities.ys[start:stop]},
+                        index=range(start, stop))
+
+def live_route():
+    """
+    DynamicRoute ของเส้นทางที่คำนวณล่าสุด (สร้างตอนแก้ไขครั้งแรก) -> เพิ่ม/ลบเมืองแล้วซ่อมเส้นทางเฉพาะจุด
+    คืนค่า None ถ้ายังไม่ได้คำนวณ หรือชุดเมืองถูกเปลี่ยนนอก live edit (import / reset)
+    """
+    live = st.session_state.get('live')
+    if live is None:
+        return None
+    if live['dynamic'] is None:
+        live['dynamic'] = calc.DynamicRoute(st.session_state.cities, live['route'], live['metric'])
+    return live['dynamic']
+
+# --- ROUTE MAP (Plotly) ---
+LARGE_ROUTE = 200          # เกินนี้ใช้โหมด WebGL: ไม่มี label บนจุด (แสดงตอน hover) และลูกศรแบบสุ่มตัวอย่าง
+ARROW_SAMPLES = 40         # จำนวนลูกศรบอกทิศทางในโหมดเส้นทางใหญ่ (กระจายเท่าๆ กันตามเส้นทาง)
+AGGREGATE_POINTS = 20000   # เกินนี้รวมจุดที่อยู่ grid cell เดียวกันเป็นจุดเดียว
+AGGREGATE_BINS = 150       # จำนวน cell ต่อแกน
+ROUTE_TEXT_LIMIT = 60      # จำนวนเมืองสูงสุดใน Sequence
+
+def show_route(cities, route):
+    """ลำดับการเดินทาง (ไม่เกิน ROUTE_TEXT_LIMIT เมือง) + กราฟเส้นทาง"""
+    names = cities.names
+    route_str = " ➔ ".join([names[i] for i in route[:ROUTE_TEXT_LIMIT]])
+    if len(route) > ROUTE_TEXT_LIMIT:
+        route_str += f" ➔ … (+{len(route) - ROUTE_TEXT_LIMIT} more)"
+    st.code(f"Sequence: {route_str}", language="text")
+
+    # วาดกราฟ Plotly (Interactive บน iPad)
+    st.plotly_chart(route_figure(cities, route), use_container_width=True)
+
+def arrow_trace(xs, ys, edges, size):
+    """
+    ลูกศรทุกเส้นใน trace เดียว: แต่ละเส้น = จุดต้นทาง (ขนาด 0) + หัวลูกศรที่กึ่งกลางเส้น
+    angleref="previous" หมุนหัวลูกศรตามทิศจากจุดก่อนหน้าบนหน้าจอ (ไม่เพี้ยนตามสัดส่วนแกน)
+    """
+    ax = np.empty(2 * len(edges), dtype=xs.dtype)
+    ay = np.empty(2 * len(edges), dtype=ys.dtype)
+    ax[0::2], ay[0::2] = xs[edges], ys[edges]
+    ax[1::2], ay[1::2] = (xs[edges] + xs[edges + 1]) / 2, (ys[edges] + ys[edges + 1]) / 2
+    sizes = np.tile([0, size], len(edges))
+    return go.Scatter(x=ax, y=ay, mode='markers', hoverinfo='skip', showlegend=False,
+                      marker=dict(symbol='arrow', angleref='previous', size=sizes, color='#2563EB', line=dict(width=0)))
+
+def route_figure(cities, route):
+    """สร้างกราฟเส้นทาง (route = index array แบบวนกลับ ของ CityTable) เลือกโหมดตามขนาด: เล็ก = label + ลูกศรทุกเส้น, ใหญ่ = WebGL"""
+    # อ่านพิกัดจากคอลัมน์ของตารางตรงๆ / float32 พอสำหรับการแสดงผล และทำให้ข้อมูลที่ส่งไป browser เล็กลงครึ่งหนึ่ง
+    route = np.asarray(route, dtype=np.intp)
+    xs = np.asarray(cities.xs)[route].astype(np.float32)
+    ys = np.asarray(cities.ys)[route].astype(np.float32)
+    names = cities.names
+    n_edges = len(route) - 1
+    fig = go.Figure()
+
+    if n_edges <= LARGE_ROUTE:
+        # เส้นทาง
+        fig.add_trace(go.Scatter(
+            x=xs, y=ys,
+            mode='lines+markers+text',
+            text=[names[i] for i in route], textposition="top center",
+            line=dict(color='#2563EB', width=3),
+            marker=dict(size=12, color='#F59E0B', line=dict(width=2, color='white')),
+            name='Route'
+        ))
+        # ลูกศร (ทุกเส้น ใน trace เดียว)
+        fig.add_trace(arrow_trace(xs, ys, np.arange(n_edges), 14))
+    else:
+        # เส้นทางทั้งหมดเป็น WebGL polyline เส้นเดียว
+        fig.add_trace(go.Scattergl(x=xs, y=ys, mode='lines', line=dict(color='#2563EB', width=1),
+                                   hoverinfo='skip', name='Route'))
+        # ลูกศรเฉพาะบางเส้น (สุ่มตัวอย่างแบบระยะห่างเท่ากันตามลำดับเส้นทาง)
+        edges = np.unique(np.linspace(0, n_edges - 1, ARROW_SAMPLES).astype(np.intp))
+        fig.add_trace(arrow_trace(xs, ys, edges, 12))
+
+        sx, sy = xs[:-1], ys[:-1]
+        if n_edges <= AGGREGATE_POINTS:
+            # ชื่อเมืองแสดงเฉพาะตอน hover
+            fig.add_trace(go.Scattergl(x=sx, y=sy, mode='markers', marker=dict(size=4, color='#F59E0B'),
+                                       hovertext=[names[i] for i in route[:-1]], hoverinfo='text', name='Locations'))
+        else:
+            # Aggregation: รวมจุดใน grid cell เดียวกัน แสดงที่ตำแหน่งเฉลี่ยพร้อมจำนวนเมือง
+            span_x = np.ptp(sx) or 1.0
+            span_y = np.ptp(sy) or 1.0
+            gx = ((sx - sx.min()) / span_x * (AGGREGATE_BINS - 1)).astype(np.intp)
+            gy = ((sy - sy.min()) / span_y * (AGGREGATE_BINS - 1)).astype(np.intp)
+            _, cell, counts = np.unique(gx * AGGREGATE_BINS + gy, return_inverse=True, return_counts=True)
+            cx = np.bincount(cell, weights=sx) / counts
+            cy = np.bincount(cell, weights=sy) / counts
+            fig.add_trace(go.Scattergl(x=cx, y=cy, mode='markers',
+                                       marker=dict(size=np.clip(2 + np.sqrt(counts), 3, 12), color='#F59E0B'),
+                                       hovertext=[f"{k} locations" for k in counts], hoverinfo='text',
+                                       name=f'Locations (grouped, {n_edges})'))
+
+        # จุดเริ่มต้น (depot)
+        fig.add_trace(go.Scattergl(x=xs[:1], y=ys[:1], mode='markers', hovertext=[names[route[0]]], hoverinfo='text',
+                                   marker=dict(size=12, color='#10B981', line=dict(width=2, color='white')), name='Start'))
+
+    fig.update_layout(
+        xaxis_title="Latitude (X)", yaxis_title="Longitude (Y)",
+        template="plotly_white", height=500,
+        margin=dict(l=20, r=20, t=20, b=20)
+    )
+    return fig
+
 # --- SIDEBAR ---
 with st.sidebar:
     st.header("⚙️ Configuration")
     
     if 'cities' not in st.session_state:
-        st.session_state.cities = []
+        # ตารางเมืองแบบ array (ชื่อ + คอลัมน์พิกัด) แทน list ของ dict
+        st.session_state.cities = calc.CityTable()
 
     with st.form("entry_form", clear_on_submit=True):
         st.subheader("Add New Location")
@@ -82,22 +205,104 @@ with st.sidebar:
         
         submitted = st.form_submit_button("➕ Add Node")
         if submitted and name:
-            st.session_state.cities.append({'name': name, 'x': x, 'y': y})
+            st.session_state.store = None
+            dyn = live_route()
+            if dyn is not None:
+                dyn.insert(name, x, y)
+            else:
+                st.session_state.cities.add(name, x, y)
             st.toast(f"Added: {name}", icon="✅")
 
+    if st.session_state.cities:
+        with st.form("remove_form", clear_on_submit=True):
+            st.subheader("Remove Location")
+            row = st.number_input("Row", min_value=0, max_value=len(st.session_state.cities) - 1, step=1)
+            if st.form_submit_button("➖ Remove Node"):
+                st.session_state.store = None
+                dyn = live_route()
+                city = dyn.remove(row) if dyn is not None else st.session_state.cities.remove(row)
+                st.toast(f"Removed: {city['name']}", icon="🗑️")
+
+    # Import ทีละหลายเมืองจากไฟล์ (CSV / JSON)
+    uploaded = st.file_uploader("Import CSV / JSON", type=["csv", "json", "jsonl"])
+    # import ครั้งเดียวต่อไฟล์ (rerun ถัดไปไฟล์ยังค้างอยู่ใน uploader)
+    if uploaded is not None and st.session_state.get('imported_file') != uploaded.file_id:
+        st.session_state.imported_file = uploaded.file_id
+        text = io.TextIOWrapper(io.BytesIO(uploaded.getvalue()), encoding="utf-8-sig", newline="")
+        try:
+            imported = data_module.load_cities(text, data_module.detect_format(uploaded.name))
+        except (ValueError, KeyError) as e:
+            st.error(f"Could not import {uploaded.name}: {e}")
+        else:
+            st.session_state.live = None
+            st.session_state.store = None
+            st.session_state.cities.extend(imported)
+            st.toast(f"Imported {len(imported)} locations", icon="📥")
+
+    st.markdown("---")
+    metric_label = st.selectbox("Distance Metric", ["Euclidean (Units)", "Haversine (km)", "Manhattan (km)"])
+    metric = metric_label.split()[0].lower()
+    profile = st.checkbox("Profile solve (cProfile)", help="Run the next calculation under cProfile and offer the .prof file")
+
+    # Instance store: ไดเรกทอรี binary แบบ memory-mapped บนเครื่องที่รันแอป (เปิดซ้ำได้ทันทีแม้หลักล้านเมือง)
+    with st.expander("💾 Instance Store"):
+        store_path = st.text_input("Store directory", placeholder="e.g. data/depot.store")
+        b1, b2 = st.columns(2)
+        if b1.button("Open", disabled=not store_path):
+            try:
+                store = calc.InstanceStore(store_path)
+                st.session_state.cities = store.cities
+            except (OSError, ValueError, KeyError) as e:
+                st.error(f"Could not open {store_path}: {e}")
+            else:
+                # แทนที่ตารางทั้งชุด (คอลัมน์ map จากไฟล์ ไม่ copy) / route ที่บันทึกไว้แสดงเมื่อกด Calculate
+                st.session_state.store = store
+                st.session_state.live = None
+                st.toast(f"Opened {len(store.cities)} locations", icon="📦")
+        if b2.button("Save", disabled=not store_path or not st.session_state.cities):
+            open_store = st.session_state.get('store')
+            try:
+                # store ที่เปิดอยู่และตารางยังไม่ถูกแก้: เพิ่ม route เข้า store เดิม (candidate/matrix เดิมยังใช้ได้)
+                if open_store is not None and os.path.abspath(store_path) == os.path.abspath(open_store.path):
+                    store = open_store
+                else:
+                    store = calc.InstanceStore.create(store_path, st.session_state.cities)
+                live = st.session_state.get('live')
+                if live is not None and live['dynamic'] is not None:
+                    store.save_route(live['dynamic'].route, live['metric'], live['dynamic'].info)
+                elif live is not None:
+                    store.save_route(live['route'], live['metric'], live['info'])
+            except (OSError, ValueError) as e:
+                st.error(f"Could not save {store_path}: {e}")
+            else:
+                st.toast(f"Saved {len(st.session_state.cities)} locations", icon="💾")
+
     st.markdown("---")
     if st.button("🗑️ Reset System"):
-        st.session_state.cities = []
+        st.session_state.cities = calc.CityTable()
+        st.session_state.live = None
+        st.session_state.store = None
         st.rerun()
 
 # --- MAIN AREA ---
+# content hash ของชุดเมืองปัจจุบัน (ใช้เป็น key ของ cache ผลลัพธ์/ตาราง)
+# ตารางจาก InstanceStore ที่ยังไม่ถูกแก้ใช้ key ที่บันทึกใน store (ไม่ต้อง hash ทีละเมืองทุก rerun)
+store = st.session_state.get('store')
+cities_key = store.key if store is not None else calc.instance_key(st.session_state.cities)
+
 col_left, col_right = st.columns([1, 2])
 
 # Left: Table
 with col_left:
     st.subheader("📋 Data Points")
     if st.session_state.cities:
-        df = pd.DataFrame(st.session_state.cities)
+        # แสดงทีละหน้า: สร้าง DataFrame เฉพาะแถวที่เห็น ไม่ใช่ทั้งหมด
+        page_size = 500
+        n_pages = (len(st.session_state.cities) - 1) // page_size + 1
+        page = st.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, value=n_pages, step=1) if n_pages > 1 else 1
+        start = (page - 1) * page_size
+        df = table_page(cities_key, start, min(start + page_size, len(st.session_state.cities)), st.session_state.cities)
+        st.caption(f"{len(st.session_state.cities)} locations")
         st.dataframe(
             df.style.format({"x": "{:.4f}", "y": "{:.4f}"}),
             use_container_width=True,
@@ -111,46 +316,59 @@ with col_right:
     st.subheader("🗺️ Route Optimization Map")
     
     if len(st.session_state.cities) >= 2:
-        # ปุ่มคำนวณ
+        # ปุ่มคำนวณ: จำไว้ว่าคำนวณชุดไหนแล้ว ผลจึงยังแสดงอยู่เมื่อ rerun (cache hit = ทันที)
         if st.button("🚀 Calculate Optimal Route", type="primary"):
-            dist, path = solve_tsp_nearest_neighbor(st.session_state.cities)
+            st.session_state.solved = (cities_key, metric)
+            st.session_state.live = None
+            if profile:
+                st.session_state.profile = ((cities_key, metric), *profile_route(metric, st.session_state.cities))
+
+        live = st.session_state.get('live')
+        if st.session_state.get('solved') == (cities_key, metric):
+            dist, route, info = solve_route(cities_key, metric, st.session_state.cities, store)
+            if st.session_state.get('live') is None:
+                # เส้นทางนี้เป็นจุดเริ่มของ live edit (เพิ่ม/ลบเมืองจาก sidebar)
+                st.session_state.live = {'metric': metric, 'route': route, 'info': info, 'dynamic': None}
+            nn_dist = info['initial_distance']
             
             # แสดงผลลัพธ์
-            st.success(f"✅ Total Distance: {dist:.4f} Units")
-            
-            route_str = " ➔ ".join([c['name'] for c in path])
-            st.code(f"Sequence: {route_str}", language="text")
-            
-            # วาดกราฟ Plotly (Interactive บน iPad)
-            path_x = [c['x'] for c in path]
-            path_y = [c['y'] for c in path]
-            path_names = [c['name'] for c in path]
-            
-            fig = go.Figure()
+            gap = ""
+            if info['gap'] is not None:
+                # bound ของ instance ใหญ่เป็นค่าประมาณ (ไม่ใช่เพดานที่พิสูจน์ได้) -> ไม่แสดง ≤
+                if info.get('bound_proven'):
+                    gap = f" (gap ≤ {info['gap']:.2%} from lower bound {info['lower_bound']:.4f})"
+                else:
+                    gap = f" (gap ≈ {info['gap']:.2%} from estimated bound {info['lower_bound']:.4f})"
+            st.success(f"✅ Total Distance: {dist:.4f} {info['unit']}{gap}")
+            m1, m2, m3 = st.columns(3)
+            m1.metric("Nearest Neighbor", f"{nn_dist:.4f}")
+            m2.metric("Optimal (exact)" if info['optimal'] else "Optimized (2-opt + Or-opt)", f"{dist:.4f}")
+            m3.metric("Improvement", f"{info['improvement']:.1%}")
+
+            # สถิติของ solver (วัดตอนแก้ครั้งแรก ผลจาก cache จึงเป็นค่าเดิม / route ที่บันทึกจาก live edit ไม่มี)
+            if 'stats' in info:
+                with st.expander("⏱️ Solver stats"):
+                    s1, s2 = st.columns(2)
+                    s1.dataframe(pd.DataFrame({'phase': list(info['stats']['phases']),
+                                               'ms': [v * 1000 for v in info['stats']['phases'].values()]}),
+                                 hide_index=True, use_container_width=True)
+                    s2.dataframe(pd.DataFrame({'counter': list(info['stats']['counters']),
+                                               'value': list(info['stats']['counters'].values())}),
+                                 hide_index=True, use_container_width=True)
+            prof = st.session_state.get('profile')
+            if prof is not None and prof[0] == (cities_key, metric):
+                with st.expander("🔬 cProfile"):
+                    st.download_button("Download solve.prof", prof[1], file_name="solve.prof")
+                    st.code(prof[2], language="text")
             
-            # เส้นทาง
-            fig.add_trace(go.Scatter(
-                x=path_x, y=path_y,
-                mode='lines+markers+text',
-                text=path_names, textposition="top center",
-                line=dict(color='#2563EB', width=3),
-                marker=dict(size=12, color='#F59E0B', line=dict(width=2, color='white')),
-                name='Route'
-            ))
-
-            # ลูกศร
-            for i in range(len(path)-1):
-                fig.add_annotation(
-                    x=path_x[i+1], y=path_y[i+1], ax=path_x[i], ay=path_y[i],
-                    xref='x', yref='y', axref='x', ayref='y',
-                    showarrow=True, arrowhead=2, arrowsize=1.5, arrowwidth=2, arrowcolor='#2563EB', opacity=0.8
-                )
-
-            fig.update_layout(
-                xaxis_title="Latitude (X)", yaxis_title="Longitude (Y)",
-                template="plotly_white", height=500,
-                margin=dict(l=20, r=20, t=20, b=20)
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            show_route(st.session_state.cities, route)
+
+        elif live is not None and live['dynamic'] is not None and live['metric'] == metric:
+            # เพิ่ม/ลบเมืองหลังคำนวณ: แสดงเส้นทางที่ซ่อมเฉพาะจุดทันที (ไม่แก้ TSP ใหม่ทั้งชุด)
+            dyn = live['dynamic']
+            st.success(f"✅ Total Distance: {dyn.distance:.4f} {dyn.metric.unit} (updated in place)")
+            st.caption("Route repaired locally after adding/removing locations. "
+                       "Calculate again for a full re-optimization and optimality gap.")
+            show_route(st.session_state.cities, dyn.route)
     else:
         st.warning("⚠️ Please add at least 2 locations to calculate.")
@@ -0,0 +1,18 @@
+import os
+import random
+import sys
+
+import pytest
+
+# โมดูลของโปรเจกต์อยู่ที่ root (ไม่ได้ติดตั้งเป็น package)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import calculation_module as calc  # noqa: E402
+
+def random_cities(n, seed=0, span=100.0):
+    rng = random.Random(seed)
+    return [{'name': f"c{i}", 'x': rng.random() * span, 'y': rng.random() * span} for i in range(n)]
+
+@pytest.fixture
+def table():
+    return calc.CityTable.from_dicts(random_cities(60, seed=1))
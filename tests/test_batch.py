@@ -0,0 +1,77 @@
+import io
+import json
+
+import pytest
+
+import batch_solver
+import data_module
+
+GOOD = {"cities": [{"name": "A", "x": 0, "y": 0}, {"name": "B", "x": 3, "y": 4}, {"name": "C", "x": 3, "y": 0}]}
+
+def _jsonl():
+    lines = [
+        json.dumps({"id": "a", **GOOD}),
+        "{not json",
+        json.dumps({"id": "c", "cities": [{"name": "A", "x": 0}]}),
+        "[1, 2]",
+        json.dumps({"id": "e", **GOOD}),
+    ]
+    return io.StringIO("\n".join(lines) + "\n")
+
+def _run(instances, workers):
+    out = io.StringIO()
+    stats = batch_solver.run_batch(instances, out, {}, workers=workers, max_pending=1)
+    return stats, [json.loads(line) for line in out.getvalue().splitlines()]
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_malformed_jsonl_records_do_not_stop_batch(workers):
+    stats, results = _run(data_module.iter_instances(_jsonl(), "jsonl"), workers)
+    assert stats["instances"] == 5 and stats["errors"] == 3
+    by_id = {r["id"]: r for r in results}
+    assert set(by_id) == {"a", "2", "c", "4", "e"}
+    assert by_id["a"]["distance"] == pytest.approx(12.0)
+    assert by_id["e"]["distance"] == pytest.approx(12.0)
+    assert "Line 2" in by_id["2"]["error"]
+    assert "'y'" in by_id["c"]["error"]
+
+def test_bad_csv_row_only_fails_its_instance():
+    text = "instance_id,name,x,y\n1,a,0,0\n1,b,1,1\n2,a,0,0\n2,b,zz,1\n2,c,2,2\n3,a,0,0\n3,b,5,5\n"
+    stats, results = _run(data_module.iter_instances(io.StringIO(text), "csv"), 1)
+    by_id = {r["id"]: r for r in results}
+    assert stats["errors"] == 1 and set(by_id) == {"1", "2", "3"}
+    assert "Line 5" in by_id["2"]["error"] and "distance" in by_id["3"]
+
+def test_input_failure_drains_pending_results():
+    def broken():
+        for i in range(3):
+            yield str(i), GOOD["cities"], {}
+        raise OSError("disk gone")
+
+    stats, results = _run(broken(), 2)
+    assert sorted(r["id"] for r in results if "distance" in r) == ["0", "1", "2"]
+    errors = [r for r in results if "error" in r]
+    assert stats["errors"] == 1 and len(errors) == 1 and "disk gone" in errors[0]["error"]
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_invalid_record_options_fail_only_that_record(workers):
+    lines = [
+        json.dumps({"id": "a", **GOOD, "improve": "false"}),
+        json.dumps({"id": "b", **GOOD, "metric": "chebyshev"}),
+        json.dumps({"id": "c", **GOOD, "time_limit": "soon"}),
+        json.dumps({"id": "d", **GOOD, "metric": "Manhattan", "names": True, "solver_workers": 64}),
+    ]
+    instances = data_module.iter_instances(io.StringIO("\n".join(lines) + "\n"), "jsonl")
+    stats, results = _run(instances, workers)
+    by_id = {r["id"]: r for r in results}
+    assert stats["errors"] == 3
+    assert "improve" in by_id["a"]["error"] and "chebyshev" in by_id["b"]["error"]
+    assert "time_limit" in by_id["c"]["error"]
+    # ตัวเลือกที่ถูกต้องใช้ได้ตามปกติ (key ที่ไม่รู้จักไม่ถูกส่งต่อให้ solver)
+    assert by_id["d"]["unit"] == "km" and by_id["d"]["route_names"][0] == "A"
+
+def test_parse_options_rejects_bad_values():
+    assert batch_solver.parse_options({}) == batch_solver.DEFAULT_OPTIONS
+    assert batch_solver.parse_options({"bound": False}, {"solver_workers": 1})["solver_workers"] == 1
+    for payload in ({"improve": 1}, {"exact_max": "x"}, {"construction": "spiral"}):
+        with pytest.raises(ValueError):
+            batch_solver.parse_options(payload)
@@ -0,0 +1,40 @@
+import time
+
+import pytest
+
+import calculation_module as calc
+from conftest import random_cities
+
+@pytest.mark.parametrize("seed", range(5))
+def test_lower_bound_not_above_optimum(seed):
+    cities = random_cities(9, seed=seed)
+    optimum, _, optimal = calc.solve_tsp_exact(cities)
+    assert optimal
+    assert calc.lower_bound(cities) <= optimum + 1e-9
+
+@pytest.mark.parametrize("metric", sorted(calc.METRICS))
+def test_lower_bound_not_above_heuristic_tour(metric):
+    cities = random_cities(120, seed=7, span=10.0)
+    dist, _, info = calc.solve_tsp(cities, metric=metric, exact=False)
+    assert info['bound_proven']
+    assert 0 < info['lower_bound'] <= dist + 1e-9
+
+def test_large_bound_is_flagged_and_respects_time_limit():
+    cities = calc.CityTable.from_dicts(random_cities(calc.BOUND_DENSE_MAX * 6, seed=2))
+    assert not calc.bound_is_proven(len(cities))
+    dist, _, info = calc.solve_tsp(cities, bound=True)
+    assert 0 < info['lower_bound'] <= dist and not info['bound_proven']
+    # หมดเวลา -> ได้ bound ที่ดีที่สุดตอนนั้น (ไม่ใช่ None) และหยุดเร็ว
+    started = time.perf_counter()
+    quick = calc.lower_bound(cities, upper=dist, time_limit=0.01)
+    assert time.perf_counter() - started < 0.5
+    assert 0 < quick <= dist
+
+def test_large_bound_for_list_input_matches_city_table():
+    cities = random_cities(calc.BOUND_DENSE_MAX + 100, seed=4)
+    dist, route, info = calc.solve_tsp(cities, bound=True)
+    assert all(any(c is r for r in cities) for c in route)
+    _, _, table_info = calc.solve_tsp(calc.CityTable.from_dicts(cities), bound=True)
+    assert info['distance'] == pytest.approx(table_info['distance'])
+    assert info['lower_bound'] == pytest.approx(table_info['lower_bound'])
+    assert 0 < info['lower_bound'] <= dist
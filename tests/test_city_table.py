@@ -0,0 +1,69 @@
+import pytest
+
+import calculation_module as calc
+from conftest import random_cities
+
+def test_from_dicts_round_trip():
+    cities = random_cities(50, seed=2)
+    t = calc.CityTable.from_dicts(cities)
+    assert len(t) == 50 and t.to_dicts() == cities
+    assert list(t) == cities
+    assert t.to_dicts([3, 1, 3]) == [cities[3], cities[1], cities[3]]
+    # ชื่อเป็นตัวเลข/พิกัดเป็น int -> ได้ str / float แบบเดียวกับ data_module.make_city
+    odd = calc.CityTable.from_dicts([{'name': 7, 'x': 1, 'y': 2}])
+    assert odd[0] == {'name': "7", 'x': 1.0, 'y': 2.0} and isinstance(odd[0]['x'], float)
+
+def test_indexing_and_slicing_match_list(table):
+    cities = table.to_dicts()
+    for i in (0, 5, 59, -1, -60):
+        assert table[i] == cities[i]
+    for s in (slice(None), slice(2, 10), slice(10, 2), slice(None, None, -1), slice(-5, None), slice(1, 50, 7)):
+        assert table[s] == cities[s]
+    with pytest.raises(IndexError):
+        table[60]
+
+def test_append_extend_remove_and_copy(table):
+    cities = table.to_dicts()
+    backup = table.copy()
+    more = random_cities(100, seed=9)
+    for c in more[:40]:
+        table.append(c)
+    table.extend(more[40:70])
+    table.extend(calc.CityTable.from_dicts(more[70:]))
+    assert table.to_dicts() == cities + more and len(table.xs) == len(table.ys) == 160
+
+    assert table.remove(0) == cities[0] and table.remove(-1) == more[-1]
+    assert table.to_dicts() == cities[1:] + more[:-1]
+    # copy ไม่ใช้คอลัมน์ร่วมกับต้นฉบับ
+    assert backup.to_dicts() == cities
+
+    with pytest.raises(ValueError):
+        calc.CityTable(["a", "b"], [1.0], [2.0, 3.0])
+    empty = calc.CityTable()
+    assert len(empty) == 0 and empty[:] == [] and empty.to_dicts() == []
+
+def route_indices(cities, route):
+    if isinstance(cities, calc.CityTable):
+        return [int(i) for i in route]
+    index = {id(c): i for i, c in enumerate(cities)}
+    return [index[id(c)] for c in route]
+
+@pytest.mark.parametrize("n", [3, 12, 150, calc.BOUND_DENSE_MAX + 50])
+@pytest.mark.parametrize("metric", sorted(calc.METRICS))
+def test_solve_tsp_same_tour_for_table_and_dicts(n, metric):
+    cities = random_cities(n, seed=n, span=10.0)
+    table = calc.CityTable.from_dicts(cities)
+    d1, r1, info1 = calc.solve_tsp(cities, metric=metric)
+    d2, r2, info2 = calc.solve_tsp(table, metric=metric)
+    assert route_indices(cities, r1) == route_indices(table, r2)
+    assert d1 == pytest.approx(d2)
+    for key in ("initial_distance", "optimal", "lower_bound", "bound_proven"):
+        assert info1[key] == pytest.approx(info2[key])
+
+@pytest.mark.parametrize("construction", ["hilbert", "partition"])
+def test_solve_tsp_constructions_agree_for_table_and_dicts(construction):
+    cities = random_cities(300, seed=4)
+    table = calc.CityTable.from_dicts(cities)
+    _, r1, _ = calc.solve_tsp(cities, construction=construction, bound=False)
+    _, r2, _ = calc.solve_tsp(table, construction=construction, bound=False)
+    assert route_indices(cities, r1) == route_indices(table, r2)
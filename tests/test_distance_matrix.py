@@ -0,0 +1,58 @@
+import pytest
+
+import calculation_module as calc
+from conftest import random_cities
+
+def test_bulk_extend_allocates_exactly():
+    dm = calc.DistanceMatrix(random_cities(300))
+    assert dm._cap == 300
+    if calc.HAS_NUMPY:
+        assert dm.matrix.shape == (300, 300)
+
+def test_single_appends_double_and_match_bulk():
+    cities = random_cities(40, seed=2)
+    one = calc.DistanceMatrix()
+    for c in cities:
+        one.append(c)
+    assert one._cap >= 40
+    bulk = calc.DistanceMatrix(cities)
+    for i in range(40):
+        for j in range(40):
+            assert one.dist(i, j) == pytest.approx(bulk.dist(i, j))
+
+def test_cache_prefix_extension_leaves_held_matrix_untouched():
+    cities = random_cities(50, seed=4)
+    cache = calc.DistanceCache()
+    held = cache.get(cities[:30])
+    before = [held.dist(i, j) for i in range(30) for j in range(30)]
+    grown = cache.get(cities)
+    assert grown is not held and len(held) == 30 and len(grown) == 50
+    assert [held.dist(i, j) for i in range(30) for j in range(30)] == before
+    assert grown.dist(3, 7) == held.dist(3, 7)
+
+def test_cache_shared_between_threads():
+    from concurrent.futures import ThreadPoolExecutor
+
+    cities = random_cities(80, seed=5)
+    cache = calc.DistanceCache()
+    sizes = [20 + (i % 7) * 10 for i in range(40)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda n: cache.get(cities[:n]), sizes))
+    for n, dm in zip(sizes, results):
+        assert dm.covers(cities[:n])
+        assert dm.dist(1, n - 1) == pytest.approx(calc.DistanceMatrix(cities[:n]).dist(1, n - 1))
+
+def test_cache_appends_in_place_with_doubling():
+    cities = random_cities(200, seed=6)
+    cache = calc.DistanceCache()
+    held = cache.get(cities[:20])
+    buffers = set()
+    for n in range(21, 201):
+        dm = cache.get(cities[:n])
+        (master,) = cache._entries.values()
+        buffers.add(id(master._d))
+        assert len(dm) == n and dm.dist(0, n - 1) == pytest.approx(calc.DistanceMatrix(cities[:n]).dist(0, n - 1))
+    # จองที่ใหม่แค่ O(log n) ครั้ง ไม่ใช่ copy ทั้ง matrix ทุกเมืองที่เพิ่ม
+    assert len(buffers) <= 6
+    assert len(held) == 20 and held.covers(cities[:20])
+    assert len(held.matrix) == 20 and len(held.matrix[0]) == 20
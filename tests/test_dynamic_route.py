@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+import calculation_module as calc
+from conftest import random_cities
+
+def assert_valid_tour(dyn):
+    route = [int(i) for i in dyn.route]
+    n = len(dyn.cities)
+    if n <= 1:
+        assert route in ([], [0], [0, 0])
+        return
+    assert route[0] == route[-1] == 0
+    assert sorted(route[:-1]) == list(range(n))
+
+def tour_length(table, route, metric):
+    m = calc.get_metric(metric)
+    route = [int(i) for i in route]
+    return sum(m(table.city(a), table.city(b)) for a, b in zip(route, route[1:]))
+
+@pytest.mark.parametrize("metric", ["euclidean", "haversine"])
+def test_insert_remove_keeps_valid_tour(metric):
+    rng = random.Random(7)
+    table = calc.CityTable.from_dicts(random_cities(30, seed=7, span=1.0))
+    dist, route, _ = calc.solve_tsp(table, metric=metric)
+    dyn = calc.DynamicRoute(table, route, metric=metric)
+    assert dyn.distance == pytest.approx(dist)
+    for step in range(80):
+        if len(table) and rng.random() < 0.45:
+            i = rng.randrange(len(table))
+            name = table.names[i]
+            assert dyn.remove(i, reoptimize=rng.random() < 0.7)['name'] == name
+        else:
+            dyn.insert(f"n{step}", rng.random(), rng.random(), reoptimize=rng.random() < 0.7)
+        assert_valid_tour(dyn)
+        assert dyn.distance == pytest.approx(tour_length(table, dyn.route, metric), abs=1e-9)
+
+def test_drain_and_refill():
+    table = calc.CityTable.from_dicts(random_cities(5, seed=1))
+    dyn = calc.DynamicRoute(table, calc.solve_tsp(table)[1])
+    while len(table):
+        dyn.remove(0)
+        assert_valid_tour(dyn)
+    for j in range(4):
+        dyn.insert(f"z{j}", j * 3.0, j * j * 1.0)
+        assert_valid_tour(dyn)
+    assert len(table) == 4 and dyn.distance > 0
+
+def test_rejects_route_missing_a_city():
+    table = calc.CityTable.from_dicts(random_cities(6, seed=2))
+    with pytest.raises(ValueError):
+        calc.DynamicRoute(table, [0, 1, 2, 3, 4, 0])
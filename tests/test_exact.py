@@ -0,0 +1,45 @@
+import itertools
+
+import pytest
+
+import calculation_module as calc
+from conftest import random_cities
+
+def brute_force(cities):
+    d = calc.DistanceMatrix(cities)
+    n = len(cities)
+    return min(sum(d.dist(a, b) for a, b in zip((0,) + p, p + (0,)))
+               for p in itertools.permutations(range(1, n)))
+
+@pytest.mark.parametrize("n", [4, 5, 6, 7, 8])
+def test_held_karp_matches_brute_force(n):
+    cities = random_cities(n, seed=n)
+    total, route, optimal = calc.solve_tsp_exact(cities)
+    assert optimal
+    assert total == pytest.approx(brute_force(cities))
+    assert len(route) == n + 1 and route[0] is route[-1]
+
+@pytest.mark.parametrize("n", [5, 7, 8])
+def test_branch_and_bound_matches_brute_force(monkeypatch, n):
+    monkeypatch.setattr(calc, "HELD_KARP_MAX", 3)
+    cities = random_cities(n, seed=10 + n)
+    total, _, optimal = calc.solve_tsp_exact(cities)
+    assert optimal
+    assert total == pytest.approx(brute_force(cities))
+
+@pytest.mark.parametrize("time_limit", [0.3, None])
+def test_branch_and_bound_progress_is_bounded(monkeypatch, time_limit):
+    monkeypatch.setattr(calc, "HELD_KARP_MAX", 3)
+    monkeypatch.setattr(calc, "PROGRESS_INTERVAL", 0.0)
+    seen = []
+
+    def progress(stage, done, total, tour):
+        seen.append((done, total))
+        return len(seen) > 200   # หยุดเองเมื่อไม่จำกัดเวลา
+
+    calc.solve_tsp_exact(random_cities(40, seed=3), time_limit=time_limit, progress=progress)
+    assert seen
+    if time_limit is None:
+        assert all(total is None for _, total in seen)
+    else:
+        assert all(0 <= done <= total == time_limit for done, total in seen)
@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+import calculation_module as calc
+from conftest import random_cities
+
+def table(xs, ys):
+    return calc.CityTable([f"c{i}" for i in range(len(xs))], xs, ys)
+
+def order_of(t):
+    dist, route = calc.solve_tsp_hilbert(t)
+    return dist, [int(i) for i in route]
+
+def check_tour(route, n):
+    assert route[0] == 0
+    if n > 1:
+        assert route[-1] == 0 and sorted(route[:-1]) == list(range(n))
+
+def line(n, seed=1):
+    rng = random.Random(seed)
+    return [rng.random() * 10 for _ in range(n)]
+
+DEGENERATE = {
+    "all_equal": ([2.5] * 40, [7.0] * 40),
+    "horizontal": (line(40), [3.0] * 40),
+    "vertical": ([3.0] * 40, line(40)),
+    "diagonal": (line(40), [2 * x + 1 for x in line(40)]),
+    "two_spots": ([0.0, 5.0] * 20, [0.0, 5.0] * 20),
+}
+
+@pytest.mark.parametrize("n", [2, 3, 10, 257, 5000])
+def test_hilbert_route_is_a_permutation_from_the_depot(n):
+    t = calc.CityTable.from_dicts(random_cities(n, seed=n))
+    dist, route = order_of(t)
+    check_tour(route, n)
+    kern = calc.get_metric(None).prepare(*calc._xy(t))
+    assert dist == pytest.approx(sum(kern.pair(a, b) for a, b in zip(route, route[1:])))
+
+def test_single_point_and_empty():
+    assert order_of(table([4.0], [1.0])) == (0, [0])
+    dist, route = calc.solve_tsp_hilbert(calc.CityTable())
+    assert dist == 0 and len(route) == 0
+    dist, route = calc.solve_tsp_hilbert([{'name': "a", 'x': 1.0, 'y': 1.0}])
+    assert dist == 0 and len(route) == 1
+
+@pytest.mark.parametrize("case", sorted(DEGENERATE))
+def test_degenerate_inputs_are_stable(case):
+    xs, ys = DEGENERATE[case]
+    dist, route = order_of(table(xs, ys))
+    check_tour(route, len(xs))
+    # เรียกซ้ำได้ลำดับเดิม และจุดที่อยู่ cell เดียวกันเรียงตามลำดับเดิม (stable) แล้วหมุนให้เริ่มที่ depot
+    assert order_of(table(xs, ys)) == (dist, route)
+    index = calc._hilbert_index_python(xs, ys, calc._hilbert_bits(len(xs)))
+    expected = sorted(range(len(xs)), key=index.__getitem__)
+    k = expected.index(0)
+    assert route[:-1] == expected[k:] + expected[:k]
+
+def test_all_equal_points_keep_input_order():
+    dist, route = order_of(table(*DEGENERATE["all_equal"]))
+    assert dist == 0 and route == list(range(40)) + [0]
+
+@pytest.mark.skipif(not calc.HAS_NUMPY, reason="needs NumPy")
+@pytest.mark.parametrize("case", sorted(DEGENERATE) + ["random"])
+def test_numpy_and_python_indexes_agree(case):
+    if case == "random":
+        cities = random_cities(500, seed=3)
+        xs, ys = [c['x'] for c in cities], [c['y'] for c in cities]
+    else:
+        xs, ys = DEGENERATE[case]
+    bits = calc._hilbert_bits(len(xs))
+    fast = calc._hilbert_index_numpy(calc.np.asarray(xs), calc.np.asarray(ys), bits)
+    assert fast.tolist() == calc._hilbert_index_python(xs, ys, bits)
@@ -0,0 +1,78 @@
+import random
+
+import pytest
+
+import calculation_module as calc
+from conftest import random_cities
+
+def tour_length(kern, order):
+    return sum(kern.pair(a, b) for a, b in zip(order, order[1:] + order[:1]))
+
+def is_permutation(order, n):
+    return sorted(int(i) for i in order) == list(range(n))
+
+@pytest.mark.parametrize("metric", sorted(calc.METRICS))
+@pytest.mark.parametrize("seed", range(3))
+def test_improve_keeps_permutation_and_shortens_random_tour(metric, seed):
+    table = calc.CityTable.from_dicts(random_cities(300, seed=seed, span=10.0))
+    kern = calc.get_metric(metric).prepare(*calc._xy(table))
+    order = list(range(len(table)))
+    random.Random(seed).shuffle(order)
+    neigh = calc._candidate_lists(kern, 8)
+
+    improved = calc._improve_order(kern, order, neigh=neigh)
+    assert is_permutation(improved, len(table)) and improved[0] == order[0]
+    # ทัวร์สุ่มยาวกว่าทัวร์ที่ดีหลายเท่า -> 2-opt/Or-opt ต้องลดได้มาก
+    assert tour_length(kern, improved) < 0.5 * tour_length(kern, order)
+
+@pytest.mark.parametrize("metric", sorted(calc.METRICS))
+def test_improve_never_lengthens_nearest_neighbor_tour(metric):
+    cities = random_cities(400, seed=11, span=10.0)
+    dist, route, info = calc.solve_tsp(cities, metric=metric, exact=False, bound=False)
+    assert info['initial_distance'] >= dist
+    assert route[0] is route[-1] and sorted(map(id, route[:-1])) == sorted(map(id, cities))
+
+    # ปรับซ้ำบนทัวร์ที่ดีแล้ว (local optimum) -> ระยะทางไม่เพิ่ม
+    again, route2 = calc.improve_route(route, metric=metric)
+    assert again <= dist + 1e-9 and len(route2) == len(route)
+
+def test_dont_look_bits_only_touch_active_region():
+    table = calc.CityTable.from_dicts(random_cities(200, seed=4))
+    kern = calc.get_metric(None).prepare(*calc._xy(table))
+    neigh = calc._candidate_lists(kern, 8)
+    good = calc._improve_order(kern, list(range(200)), neigh=neigh)
+
+    # สลับเมืองติดกัน 1 คู่ แล้วเริ่มตรวจเฉพาะ 2 เมืองนั้น -> ได้ทัวร์ไม่ยาวกว่าก่อนสลับ
+    broken = list(good)
+    broken[50], broken[51] = broken[51], broken[50]
+    stats = calc.SolveStats()
+    fixed = calc._local_search(kern, broken, neigh, None, None, None, stats, active=[broken[50], broken[51]])
+    assert is_permutation(fixed, 200)
+    assert tour_length(kern, fixed) <= tour_length(kern, good) + 1e-9
+    # เมืองที่ไม่ถูกแตะไม่ถูกตรวจ: ใช้ระยะทางน้อยกว่าการตรวจทุกเมืองมาก
+    full = calc.SolveStats()
+    calc._local_search(kern, broken, neigh, None, None, None, full)
+    assert stats.counters["distance_evals"] < full.counters["distance_evals"] / 5
+
+def test_progress_tours_are_valid_and_never_longer(monkeypatch):
+    table = calc.CityTable.from_dicts(random_cities(3000, seed=2))
+    kern = calc.get_metric(None).prepare(*calc._xy(table))
+    lengths = []
+
+    def progress(stage, done, total, tour):
+        if stage == "improve" and tour is not None:
+            assert tour[0] == tour[-1] and is_permutation(tour[:-1], len(table))
+            lengths.append(tour_length(kern, [int(i) for i in tour[:-1]]))
+
+    monkeypatch.setattr(calc, "PROGRESS_INTERVAL", 0.0)
+    dist, _, _ = calc.solve_tsp(table, progress=progress, bound=False)
+    assert len(lengths) > 1 and lengths == sorted(lengths, reverse=True)
+    assert dist <= lengths[-1] + 1e-6
+
+def test_duplicate_points_and_tiny_tours():
+    cities = [{'name': f"d{i}", 'x': float(i % 3), 'y': 0.0} for i in range(12)]
+    dist, route, _ = calc.solve_tsp(cities, exact=False, bound=False)
+    assert dist == pytest.approx(4.0) and len(route) == 13
+    for n in (1, 2, 3):
+        d, r = calc.improve_route(cities[:n] + cities[:1])
+        assert len(r) == n + 1
@@ -0,0 +1,76 @@
+import math
+import random
+
+import pytest
+
+import calculation_module as calc
+
+def brute_nearest(xs, ys, alive, q, norm=2):
+    if norm == 2:
+        key = lambda i: (xs[i] - q[0])**2 + (ys[i] - q[1])**2
+    else:
+        key = lambda i: abs(xs[i] - q[0]) + abs(ys[i] - q[1])
+    return min((key(i) for i in alive), default=math.inf)
+
+def points(n, seed, duplicates=False):
+    rng = random.Random(seed)
+    xs = [rng.random() * 100 for _ in range(n)]
+    ys = [rng.random() * 100 for _ in range(n)]
+    if duplicates:
+        # ครึ่งหนึ่งซ้ำกับจุดอื่น (เช่นลูกค้าหลายรายที่อยู่เดียวกัน) และมีกลุ่มที่ซ้ำกันทั้งกลุ่ม
+        for i in range(0, n, 2):
+            j = rng.randrange(n)
+            xs[i], ys[i] = xs[j], ys[j]
+        for i in range(n // 10):
+            xs[i], ys[i] = 50.0, 50.0
+    return xs, ys
+
+@pytest.mark.parametrize("norm", [1, 2])
+@pytest.mark.parametrize("duplicates", [False, True])
+def test_nearest_matches_brute_force_while_deleting(norm, duplicates):
+    xs, ys = points(300, seed=5, duplicates=duplicates)
+    tree = calc.KDTree(xs, ys, leaf_size=4, norm=norm)
+    alive = set(range(300))
+    rng = random.Random(9)
+    while alive:
+        q = (rng.random() * 110 - 5, rng.random() * 110 - 5)
+        i, key = tree.nearest(*q)
+        assert i in alive
+        assert key == pytest.approx(brute_nearest(xs, ys, alive, q, norm))
+        # ลบทั้งจุดที่เพิ่งเจอและจุดสุ่ม (ลำดับเดียวกับ NN: ลบเมืองที่ไปแล้ว)
+        for gone in {i, rng.choice(sorted(alive))}:
+            tree.remove(gone)
+            alive.discard(gone)
+        assert len(tree) == len(alive)
+    assert tree.nearest(1.0, 2.0) == (-1, math.inf)
+
+def test_nearest_k_matches_brute_force_after_deletes():
+    xs, ys = points(200, seed=2, duplicates=True)
+    tree = calc.KDTree(xs, ys)
+    alive = set(range(200))
+    for gone in random.Random(3).sample(range(200), 120):
+        tree.remove(gone)
+        alive.discard(gone)
+    for me in sorted(alive)[:30]:
+        q = tree.point(me)
+        got = [key for key, _ in tree.nearest_k(6, *q)]
+        want = sorted((xs[i] - q[0])**2 + (ys[i] - q[1])**2 for i in alive)[:6]
+        assert got == pytest.approx(want)
+        assert all(i in alive for _, i in tree.nearest_k(6, *q))
+    # ขอมากกว่าจุดที่เหลือ -> ได้ทุกจุดที่เหลือ
+    assert sorted(i for _, i in tree.nearest_k(500, 0.0, 0.0)) == sorted(alive)
+
+def test_empty_tree_and_inserts():
+    tree = calc.KDTree([], [])
+    assert len(tree) == 0
+    assert tree.nearest(0.0, 0.0) == (-1, math.inf)
+    assert tree.nearest_k(3, 0.0, 0.0) == []
+
+    xs, ys = points(50, seed=1)
+    tree = calc.KDTree(xs, ys)
+    for i in range(50):
+        tree.remove(i)
+    assert tree.nearest(10.0, 10.0) == (-1, math.inf)
+    j = tree.insert(10.5, 9.0)
+    assert j == 50 and len(tree) == 1
+    assert tree.nearest(10.0, 10.0) == (50, pytest.approx(0.25 + 1.0))
@@ -0,0 +1,20 @@
+import pytest
+
+import calculation_module as calc
+from conftest import random_cities
+
+@pytest.mark.parametrize("metric", sorted(calc.METRICS))
+def test_pairwise_metric_is_symmetric(metric):
+    m = calc.get_metric(metric)
+    cities = random_cities(20, seed=3, span=80.0)
+    for a in cities:
+        for b in cities:
+            assert m(a, b) == m(b, a)
+        assert m(a, a) == 0
+
+def test_manhattan_instance_latitude():
+    m = calc.get_metric("manhattan")
+    a, b = {'x': 10.0, 'y': 100.0}, {'x': 50.0, 'y': 105.0}
+    kern = m.prepare([a['x'], b['x']], [a['y'], b['y']])
+    assert m(a, b, lat0=a['x']) == pytest.approx(kern.pair(0, 1))
+    assert m(a, b, lat0=a['x']) == pytest.approx(m(b, a, lat0=a['x']))
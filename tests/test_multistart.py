@@ -0,0 +1,68 @@
+from multiprocessing import shared_memory
+
+import pytest
+
+import calculation_module as calc
+from conftest import random_cities
+
+def crash_chunk(starts, engine):
+    # แทน _multistart_chunk ใน worker (ระดับโมดูลเพื่อให้ส่งเข้า process pool ได้)
+    raise RuntimeError("worker failed")
+
+@pytest.fixture
+def segments(monkeypatch):
+    """ชื่อ shared memory segment ที่ process หลักสร้างระหว่างทดสอบ"""
+    created = []
+
+    class Recording(shared_memory.SharedMemory):
+        def __init__(self, name=None, create=False, size=0):
+            super().__init__(name=name, create=create, size=size)
+            if create:
+                created.append(self.name)
+
+    monkeypatch.setattr(calc.shared_memory, "SharedMemory", Recording)
+    return created
+
+def assert_unlinked(names):
+    # ไม่มี NumPy: ส่งพิกัดให้ worker แบบ list ไม่ใช้ shared memory
+    assert bool(names) == calc.HAS_NUMPY
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+def test_multistart_is_deterministic_for_a_seed(segments):
+    t = calc.CityTable.from_dicts(random_cities(400, seed=8))
+    runs = [calc.solve_tsp_multistart(t, n_starts=24, workers=w, seed=5) for w in (2, 2, 1)]
+    routes = [[int(i) for i in route] for _, route in runs]
+    assert routes[0] == routes[1] == routes[2]
+    assert runs[0][0] == pytest.approx(runs[2][0])
+    assert routes[0][0] == routes[0][-1] == 0 and sorted(routes[0][:-1]) == list(range(400))
+    # ไม่แย่กว่า NN จากเมืองแรก (เมืองแรกอยู่ในจุดเริ่มต้นเสมอ)
+    assert runs[0][0] <= calc.solve_tsp_nearest_neighbor(t)[0] + 1e-9
+    assert_unlinked(segments)
+
+def test_shared_memory_is_unlinked_when_a_worker_raises(segments, monkeypatch):
+    monkeypatch.setattr(calc, "_multistart_chunk", crash_chunk)
+    t = calc.CityTable.from_dicts(random_cities(200, seed=1))
+    with pytest.raises(RuntimeError, match="worker failed"):
+        calc.solve_tsp_multistart(t, n_starts=8, workers=2)
+    assert_unlinked(segments)
+
+def test_shared_memory_is_unlinked_when_cancelled(segments, monkeypatch):
+    monkeypatch.setattr(calc, "PROGRESS_INTERVAL", 0.0)
+    t = calc.CityTable.from_dicts(random_cities(300, seed=2))
+    with pytest.raises(calc.SolveCancelled):
+        calc.solve_tsp_multistart(t, n_starts=16, workers=2, progress=lambda *args: True)
+    assert_unlinked(segments)
+
+@pytest.mark.skipif(not calc.HAS_NUMPY, reason="memmap ต้องใช้ NumPy")
+def test_store_backed_cities_share_files_instead_of_memory(tmp_path, segments):
+    t = calc.CityTable.from_dicts(random_cities(300, seed=3))
+    calc.InstanceStore.create(tmp_path, t)
+    mapped = calc.InstanceStore(tmp_path).cities
+    assert None not in (calc._mapped_file(mapped.xs), calc._mapped_file(mapped.ys))
+    dist, route = calc.solve_tsp_multistart(mapped, n_starts=12, workers=2, seed=1)
+    expected = calc.solve_tsp_multistart(t, n_starts=12, workers=1, seed=1)
+    assert dist == pytest.approx(expected[0]) and list(route) == list(expected[1])
+    # worker เปิดไฟล์ของ store เอง -> ไม่สร้าง shared memory
+    assert segments == []
@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+import calculation_module as calc
+from conftest import random_cities
+
+# ทัวร์ที่แบ่ง cluster ยาวกว่าการแก้ทั้ง instance ได้ไม่เกินสัดส่วนนี้ (วัดจริง ~0.97-1.01 บน instance แบบกลุ่ม)
+MAX_RATIO = 1.05
+
+def clustered(n, seed, clusters=12):
+    rng = random.Random(seed)
+    centers = [(rng.random() * 1000, rng.random() * 1000) for _ in range(clusters)]
+    cities = []
+    for i in range(n):
+        cx, cy = centers[i % clusters]
+        cities.append({'name': f"c{i}", 'x': rng.gauss(cx, 25), 'y': rng.gauss(cy, 25)})
+    return cities
+
+def check_tour(route, n):
+    route = [int(i) for i in route]
+    assert route[0] == route[-1] == 0 and sorted(route[:-1]) == list(range(n))
+
+def test_stitch_joins_cluster_tours_into_one_tour():
+    t = calc.CityTable.from_dicts(random_cities(40, seed=6))
+    kern = calc.get_metric(None).prepare(*calc._xy(t))
+    tours = [list(range(0, 15)), [15, 16], list(range(17, 30))[::-1], list(range(30, 40))]
+    anchors = [3, 15, 20, 35]
+    order, starts = calc._stitch(kern, tours, anchors)
+    assert sorted(order) == list(range(40))
+    assert starts == [0, 15, 17, 30]
+    for tour, s in zip(tours, starts):
+        path = order[s:s + len(tour)]
+        assert sorted(path) == sorted(tour)
+        if len(tour) >= 3:
+            # ตัดเส้นออก 1 เส้น: path เป็นทัวร์เดิม (หมุนหรือกลับทิศ) ที่เปิดออก
+            double = tour + tour
+            rev = tour[::-1] + tour[::-1]
+            assert any(double[i:i + len(tour)] == path or rev[i:i + len(tour)] == path for i in range(len(tour)))
+
+@pytest.mark.parametrize("seed", range(3))
+def test_partitioned_tour_is_close_to_unpartitioned(seed):
+    t = calc.CityTable.from_dicts(clustered(3000, seed))
+    full, _, _ = calc.solve_tsp(t, exact=False, bound=False)
+    dist, route = calc.solve_tsp_partitioned(t, cluster_size=250, workers=1)
+    check_tour(route, len(t))
+    kern = calc.get_metric(None).prepare(*calc._xy(t))
+    assert dist == pytest.approx(calc._tour_length_kernel(kern, [int(i) for i in route[:-1]]))
+    assert dist <= MAX_RATIO * full
+
+def test_worker_pool_gives_the_same_tour():
+    t = calc.CityTable.from_dicts(clustered(1500, seed=4))
+    alone = calc.solve_tsp_partitioned(t, cluster_size=200, workers=1)
+    pooled = calc.solve_tsp_partitioned(t, cluster_size=200, workers=2)
+    assert alone[0] == pytest.approx(pooled[0])
+    assert [int(i) for i in alone[1]] == [int(i) for i in pooled[1]]
+
+def test_solve_tsp_partition_construction_with_list_input(monkeypatch):
+    monkeypatch.setattr(calc, "PARTITION_SIZE", 150)
+    cities = clustered(900, seed=7)
+    dist, route, info = calc.solve_tsp(cities, construction="partition", bound=False)
+    assert route[0] is route[-1] is cities[0]
+    assert sorted(map(id, route[:-1])) == sorted(map(id, cities))
+    assert info['initial_distance'] >= dist
@@ -0,0 +1,103 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import solver_service as ss
+from conftest import random_cities
+
+@pytest.fixture
+def service():
+    svc = ss.SolverService(workers=1, max_pending=2, cache_size=8)
+    yield svc
+    svc.close()
+
+def body(cities, **options):
+    return json.dumps({"cities": cities, **options}).encode()
+
+def test_parse_options_requires_json_booleans():
+    assert ss.parse_options({"improve": False, "names": True, "bound": False}) == {
+        **ss.DEFAULT_OPTIONS, "improve": False, "names": True, "bound": False}
+    for name in ("improve", "names", "bound"):
+        for value in ("false", 0, 1, "yes"):
+            with pytest.raises(ss.RequestError, match=name):
+                ss.parse_options({name: value})
+
+def test_identical_requests_coalesce_then_hit_cache(service):
+    cities = random_cities(300, seed=1)
+
+    async def run():
+        first = await asyncio.gather(*(service.solve({"id": i, "cities": cities}) for i in range(5)))
+        again = await service.solve({"id": "x", "cities": cities, "improve": True})
+        return first, again
+
+    first, (again, source) = asyncio.run(run())
+    assert [r["id"] for r, _ in first] == list(range(5))
+    assert sorted(s for _, s in first) == ["coalesced"] * 4 + ["miss"]
+    assert len({r["distance"] for r, _ in first}) == 1
+    assert source == "hit" and again["id"] == "x"
+    assert service.counters["solves"] == 1
+
+def test_busy_service_answers_503(service):
+    async def run():
+        running = [asyncio.ensure_future(service.dispatch("POST", "/solve", body(random_cities(200, seed=s))))
+                   for s in (1, 2)]
+        await asyncio.sleep(0)
+        busy = await service.dispatch("POST", "/solve", body(random_cities(200, seed=3)))
+        return busy, await asyncio.gather(*running)
+
+    (status, _, headers), done = asyncio.run(run())
+    assert status == 503 and headers["Retry-After"] == "1"
+    assert [s for s, *_ in done] == [200, 200]
+
+def test_batch_larger_than_max_pending_is_rejected_with_413(service):
+    instances = [{"id": i, "cities": random_cities(20, seed=i)} for i in range(3)]
+    status, payload, _ = asyncio.run(service.dispatch("POST", "/batch", json.dumps({"instances": instances}).encode()))
+    assert status == 413 and payload["max_pending"] == 2
+
+    # ซ้ำกันนับเป็นงานเดียว -> ผ่าน
+    dup = instances[:2] + [{**instances[0], "id": "again"}]
+    status, payload, _ = asyncio.run(service.dispatch("POST", "/batch", json.dumps({"instances": dup}).encode()))
+    assert status == 200 and [r["id"] for r in payload["results"]] == [0, 1, "again"]
+
+def test_invalid_boolean_is_a_400(service):
+    status, payload, _ = asyncio.run(service.dispatch("POST", "/solve", body(random_cities(5), improve="false")))
+    assert status == 400 and "improve" in payload["error"]
+
+def test_failed_solve_is_a_500_and_releases_waiters(service, monkeypatch):
+    def crash(*args):
+        raise RuntimeError("worker died")
+
+    class BrokenPool:
+        def submit(self, *args):
+            raise BrokenProcessPool("pool broken")
+
+        def shutdown(self, **kwargs):
+            pass
+
+    request = body(random_cities(30, seed=5))
+
+    async def run():
+        first = await asyncio.gather(*(service.dispatch("POST", "/solve", request) for _ in range(3)))
+        return first, service._inflight.copy(), service._pending
+
+    monkeypatch.setattr(ss, "solve_instance", crash)
+    service.pool, real_pool = ThreadPoolExecutor(max_workers=1), service.pool
+    try:
+        failed, inflight, pending = asyncio.run(run())
+    finally:
+        service.pool.shutdown()
+        service.pool = real_pool
+    assert [s for s, *_ in failed] == [500] * 3 and "worker died" in failed[0][1]["error"]
+    assert inflight == {} and pending == 0
+
+    # pool เสีย -> 500 แล้วสร้าง pool ใหม่ request ถัดไปแก้ได้ตามปกติ (ผลที่ล้มเหลวไม่ถูก cache)
+    monkeypatch.undo()
+    service.pool, real_pool = BrokenPool(), service.pool
+    real_pool.shutdown()
+    status, _, _ = asyncio.run(service.dispatch("POST", "/solve", request))
+    assert status == 500 and service.counters["pool_restarts"] == 1
+    status, payload, headers = asyncio.run(service.dispatch("POST", "/solve", request))
+    assert status == 200 and headers["X-Cache"] == "miss" and payload["distance"] > 0
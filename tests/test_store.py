@@ -0,0 +1,41 @@
+import pytest
+
+import calculation_module as calc
+from conftest import random_cities
+
+@pytest.fixture
+def cities():
+    table = calc.CityTable.from_dicts(random_cities(200, seed=6))
+    table.names[3] = "Bangkok é"
+    return table
+
+def test_cities_round_trip(tmp_path, cities):
+    calc.InstanceStore.create(tmp_path, cities)
+    loaded = calc.InstanceStore(tmp_path).cities
+    assert loaded.names == cities.names
+    assert list(loaded.xs) == list(cities.xs) and list(loaded.ys) == list(cities.ys)
+
+def test_route_candidates_and_matrix_round_trip(tmp_path, cities):
+    store = calc.InstanceStore.create(tmp_path, cities)
+    dist, route, info = calc.solve_tsp(cities)
+    store.save_route(route, "euclidean", info)
+    store.save_candidates("euclidean", k=6)
+    store.save_distances(calc.DistanceMatrix(cities, "euclidean"))
+
+    reopened = calc.InstanceStore(tmp_path)
+    d2, r2, info2 = reopened.route("euclidean")
+    assert d2 == dist and [int(i) for i in r2] == [int(i) for i in route]
+    assert info2['lower_bound'] == info['lower_bound']
+    assert reopened.route("haversine") is None
+    cands = reopened.candidates("euclidean")
+    assert len(cands) == len(cities) and all(len(c) == 6 for c in cands)
+    dm = reopened.distances("euclidean")
+    assert dm.covers(reopened.cities)
+    assert dm.dist(3, 7) == pytest.approx(calc.DistanceMatrix(cities).dist(3, 7))
+
+def test_create_replaces_previous_instance(tmp_path, cities):
+    store = calc.InstanceStore.create(tmp_path, cities)
+    store.save_route(calc.solve_tsp(cities)[1], "euclidean")
+    calc.InstanceStore.create(tmp_path, calc.CityTable(["a"], [0.0], [0.0]))
+    reopened = calc.InstanceStore(tmp_path)
+    assert reopened.cities.names == ["a"] and reopened.route("euclidean") is None
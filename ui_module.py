@@ -1,8 +1,35 @@
+import os
+import queue
+import threading
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import calculation_module as calc
+import data_module
 
 class AppUI:
+    # จำนวนแถวต่อหน้าในตาราง (แสดงทีละหน้า ไม่ใส่ทุกแถวลง Treeview)
+    PAGE_SIZE = 200
+    # จำนวนเมืองสูงสุดที่แสดงใน Travel Sequence
+    ROUTE_TEXT_LIMIT = 60
+
+    # Level of detail ของกราฟ (จำนวนเมืองเกินค่าเหล่านี้จะตัดรายละเอียดออก)
+    LABEL_LIMIT = 60        # ชื่อ + พิกัดใต้แต่ละจุด
+    ARROW_LIMIT = 200       # เส้นประแยกทีละช่วงพร้อมหัวลูกศร (เกินนี้ = polyline เส้นเดียว)
+    CLUSTER_LIMIT = 3000    # เกินนี้รวมจุดที่ตกใน pixel cell เดียวกันเป็นจุดเดียว
+    CLUSTER_CELL = 4        # ขนาด cell (px)
+    GRAPH_PAD = 50
+    RESIZE_DELAY_MS = 120   # debounce <Configure> ระหว่างลากขยายหน้าต่าง
+
+    # Solver เบื้องหลัง: ความถี่ในการอ่าน progress จาก thread (ms) และช่วงของ Progressbar ต่อขั้นตอน
+    POLL_MS = 100
+    SOLVE_STAGES = {
+        "nearest_neighbor": ("Nearest Neighbor", 0, 40),
+        "multistart": ("Multi-start NN", 0, 40),
+        "improve": ("2-opt + Or-opt", 40, 90),
+        "exact": ("Exact search", 90, 100),
+        "bound": ("Lower bound", 90, 100),
+    }
+
     def __init__(self, root):
         self.root = root
         self.root.title("Advanced Logistics Route Planner")
@@ -24,8 +51,29 @@ class AppUI:
         self.root.configure(bg=self.colors["bg_main"])
 
         # ตัวแปรระบบ
-        self.cities = []
+        # ตารางเมืองแบบ array (ชื่อ + คอลัมน์พิกัด) แทน list ของ dict
+        self.cities = calc.CityTable()
         self.target_cities = 0
+        self.page = 0
+        # สถานะกราฟ (retained canvas items: วาดครั้งเดียวแล้วย้ายตำแหน่ง)
+        self.route_path = None
+        self._view = None
+        self._lod = None
+        self._node_items = []
+        self._label_items = []
+        self._cells = set()
+        self._drawn = None          # (CityTable, จำนวนเมือง) ที่วาดจุดไว้แล้ว
+        self._resize_job = None
+        # Solver thread (ผลลัพธ์/progress ส่งกลับผ่าน queue แล้วอ่านด้วย root.after)
+        self._solve_queue = None
+        self._solve_cancel = threading.Event()
+        # Distance matrix cache (คำนวณเฉพาะแถว/คอลัมน์ของเมืองที่เพิ่มใหม่)
+        self.dist_cache = calc.DistanceCache()
+        # Live edit หลังคำนวณเสร็จ: เพิ่ม/ลบเมืองแล้วซ่อมเส้นทางเฉพาะจุด (DynamicRoute สร้างตอนแก้ไขครั้งแรก)
+        self.solved = None      # (route, metric, info) ของผลลัพธ์ล่าสุด
+        self.dynamic = None
+        # InstanceStore ที่เปิดอยู่ (ตารางเมืองยัง map จากไฟล์ ไม่ถูกแก้) -> ใช้ candidate/matrix ที่บันทึกไว้
+        self.store = None
         
         # ตั้งค่า Style
         self.setup_styles()
@@ -93,6 +141,15 @@ class AppUI:
         self.btn_set = ttk.Button(cfg_frame, text="Confirm", style="Primary.TButton", width=8, command=self.set_target)
         self.btn_set.pack(side="left")
 
+        # เลือกวิธีวัดระยะ (Euclidean = ค่าเดิม, Haversine/Manhattan = km ตามพิกัดจริง)
+        metric_frame = tk.Frame(sidebar, bg=self.colors["bg_sidebar"])
+        metric_frame.pack(fill="x", pady=(0, 20))
+        ttk.Label(metric_frame, text="Distance:", style="Label.TLabel").pack(side="left")
+        self.metric_options = {"Euclidean (Units)": "euclidean", "Haversine (km)": "haversine", "Manhattan (km)": "manhattan"}
+        self.cmb_metric = ttk.Combobox(metric_frame, values=list(self.metric_options), state="readonly", width=18)
+        self.cmb_metric.current(0)
+        self.cmb_metric.pack(side="left", padx=10)
+
         # Separator
         tk.Frame(sidebar, height=1, bg=self.colors["border"]).pack(fill="x", pady=10)
 
@@ -110,6 +167,18 @@ class AppUI:
         self.btn_add = ttk.Button(sidebar, text="Add Node", style="Primary.TButton", command=self.add_city, state="disabled")
         self.btn_add.pack(fill="x", pady=(20, 10))
 
+        # Import ทีละหลายเมืองจากไฟล์ (CSV / JSON)
+        self.btn_import = ttk.Button(sidebar, text="Import CSV / JSON", style="Secondary.TButton", command=self.import_file)
+        self.btn_import.pack(fill="x", pady=(0, 10))
+
+        # Instance store (ไดเรกทอรี binary แบบ memory-mapped): เปิดซ้ำได้ทันทีแม้หลักล้านเมือง
+        store_frame = tk.Frame(sidebar, bg=self.colors["bg_sidebar"])
+        store_frame.pack(fill="x", pady=(0, 10))
+        self.btn_open_store = ttk.Button(store_frame, text="Open Store", style="Secondary.TButton", command=self.open_store)
+        self.btn_open_store.pack(side="left", fill="x", expand=True, padx=(0, 5))
+        self.btn_save_store = ttk.Button(store_frame, text="Save Store", style="Secondary.TButton", command=self.save_store)
+        self.btn_save_store.pack(side="left", fill="x", expand=True)
+
         # Progress
         self.lbl_progress = ttk.Label(sidebar, text="0 / 0 Nodes Added", font=("Arial", 9), background=self.colors["bg_sidebar"], foreground=self.colors["text_body"])
         self.lbl_progress.pack(anchor="w", pady=(0, 5))
@@ -122,6 +191,15 @@ class AppUI:
         # --- SECTION 3: Action ---
         self.btn_calc = ttk.Button(sidebar, text="Calculate Optimal Route", style="Primary.TButton", command=self.run_process, state="disabled")
         self.btn_calc.pack(fill="x", pady=(0, 10))
+
+        self.btn_cancel = ttk.Button(sidebar, text="Cancel", style="Secondary.TButton", command=self.cancel_process, state="disabled")
+        self.btn_cancel.pack(fill="x", pady=(0, 10))
+
+        # เลือกบันทึก cProfile ของการคำนวณครั้งถัดไป (ถามที่เก็บไฟล์ .prof ตอนกด Calculate)
+        self.var_profile = tk.BooleanVar(value=False)
+        tk.Checkbutton(sidebar, text="Save cProfile of next solve", variable=self.var_profile, font=("Arial", 9),
+                       bg=self.colors["bg_sidebar"], fg=self.colors["text_body"], activebackground=self.colors["bg_sidebar"],
+                       highlightthickness=0).pack(anchor="w", pady=(0, 10))
         
         ttk.Button(sidebar, text="System Reset", style="Secondary.TButton", command=self.reset).pack(fill="x")
 
@@ -145,12 +223,31 @@ class AppUI:
         
         self.tree.pack(fill="both", expand=True)
 
+        # Pager (แสดงตารางทีละหน้า)
+        pager = tk.Frame(tbl_frame, bg="white")
+        pager.pack(fill="x")
+        self.btn_prev = ttk.Button(pager, text="◀", style="Secondary.TButton", width=3, command=lambda: self.change_page(-1))
+        self.btn_prev.pack(side="left")
+        self.lbl_page = tk.Label(pager, text="Page 1 / 1", font=("Arial", 9), bg="white", fg=self.colors["text_body"])
+        self.lbl_page.pack(side="left", padx=10)
+        self.btn_next = ttk.Button(pager, text="▶", style="Secondary.TButton", width=3, command=lambda: self.change_page(1))
+        self.btn_next.pack(side="left")
+        self.btn_remove = ttk.Button(pager, text="Remove Selected", style="Secondary.TButton", command=self.remove_city)
+        self.btn_remove.pack(side="right")
+
         # 2. Result Panel (Route Text)
         self.res_frame = ttk.Frame(content, style="Card.TFrame", padding=15)
         self.res_frame.pack(fill="x", pady=(0, 15))
         
         self.lbl_total_dist = tk.Label(self.res_frame, text="Total Distance: 0.0000 Units", font=("Arial", 12, "bold"), bg="white", fg=self.colors["text_header"])
         self.lbl_total_dist.pack(anchor="w")
+
+        self.lbl_improvement = tk.Label(self.res_frame, text="Nearest Neighbor: -", font=("Arial", 9), bg="white", fg=self.colors["text_body"])
+        self.lbl_improvement.pack(anchor="w")
+
+        # สถิติของ solver (เวลาแต่ละขั้น / จำนวนการคำนวณระยะ / จำนวนรอบ)
+        self.lbl_stats = tk.Label(self.res_frame, text="", font=("Arial", 8), bg="white", fg="#94A3B8", justify="left")
+        self.lbl_stats.pack(anchor="w")
         
         tk.Label(self.res_frame, text="Travel Sequence:", font=("Arial", 9, "bold"), bg="white", fg="#64748B").pack(anchor="w", pady=(5,0))
         self.lbl_route_text = tk.Label(self.res_frame, text="-", font=("Consolas", 10), bg="#F8FAFC", fg=self.colors["primary"], padx=10, pady=5, justify="left", wraplength=600)
@@ -162,7 +259,7 @@ class AppUI:
         
         self.canvas = tk.Canvas(graph_frame, bg="white", highlightthickness=0)
         self.canvas.pack(fill="both", expand=True)
-        self.canvas.bind("<Configure>", lambda e: self.draw_graph(None))
+        self.canvas.bind("<Configure>", self.on_canvas_resize)
 
     # --- Helper: Create Input Row ---
     def create_input_row(self, parent, label, var_name, validate=None):
@@ -201,7 +298,7 @@ class AppUI:
             return
         
         self.target_cities = int(val)
-        self.cities = []
+        self.cities = calc.CityTable()
         
         # Lock Config, Unlock Inputs
         self.ent_target.config(state="disabled")
@@ -226,10 +323,17 @@ class AppUI:
 
         x, y = float(x_val), float(y_val)
         
-        self.cities.append({'name': name, 'x': x, 'y': y})
+        self.store = None
+        dyn = self.live_route()
+        if dyn is not None:
+            dyn.insert(name, x, y)
+        else:
+            self.cities.add(name, x, y)
+            self.dist_cache.get(self.cities, self.selected_metric())
         
-        # Format .4f (4 ตำแหน่ง)
-        self.tree.insert("", "end", values=(name, f"{x:.4f}", f"{y:.4f}"))
+        # ไปหน้าสุดท้ายของตารางเพื่อให้เห็นแถวที่เพิ่งเพิ่ม
+        self.page = self.last_page()
+        self.refresh_table()
         
         # Clear Inputs
         self.ent_name.delete(0, tk.END)
@@ -237,10 +341,148 @@ class AppUI:
         self.ent_y.delete(0, tk.END)
         self.ent_name.focus()
         
+        if dyn is not None:
+            self.target_cities = len(self.cities)
+            self.show_live_route(f"Added {name}")
+            return
         self.update_ui_state()
         self.draw_graph(None) # Preview dot
 
-    def update_ui_state(self):
+    def remove_city(self):
+        selection = self.tree.selection()
+        if not selection or self._solve_queue is not None:
+            return
+        # แถวในตาราง = แถวในหน้าปัจจุบัน + offset ของหน้า
+        row = self.page * self.PAGE_SIZE + self.tree.index(selection[0])
+        self.store = None
+        dyn = self.live_route()
+        city = dyn.remove(row) if dyn is not None else self.cities.remove(row)
+
+        self.target_cities = len(self.cities) if dyn is not None else max(self.target_cities - 1, len(self.cities))
+        self.page = min(self.page, self.last_page())
+        self.refresh_table()
+        if dyn is not None:
+            self.show_live_route(f"Removed {city['name']}")
+            return
+        self.update_ui_state(notify=False)
+        self.draw_graph(None)
+
+    def live_route(self):
+        """DynamicRoute ของผลลัพธ์ล่าสุด (สร้างครั้งแรกที่แก้ไข) หรือ None ถ้ายังไม่มีเส้นทาง"""
+        if self.dynamic is None and self.solved is not None:
+            route, metric, _ = self.solved
+            self.dynamic = calc.DynamicRoute(self.cities, route, metric)
+        return self.dynamic
+
+    def clear_live_route(self):
+        self.solved = self.dynamic = None
+
+    def import_file(self):
+        path = filedialog.askopenfilename(
+            title="Import Locations",
+            filetypes=[("Location files", "*.csv *.json *.jsonl"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            cities = data_module.load_cities(path)
+        except (OSError, ValueError, KeyError) as e:
+            messagebox.showerror("Import", f"Could not import file:\n{e}")
+            return
+        if not cities:
+            messagebox.showwarning("Import", "No locations found in file.")
+            return
+
+        # เพิ่มทั้งไฟล์ในครั้งเดียว: ไม่วาดกราฟ/ไม่เด้ง messagebox ทีละเมือง
+        self.clear_live_route()
+        self.store = None
+        self.cities.extend(cities)
+        self.target_cities = len(self.cities)
+        self.ent_target.config(state="normal")
+        self.ent_target.delete(0, tk.END)
+        self.ent_target.insert(0, str(self.target_cities))
+        self.ent_target.config(state="disabled")
+        self.btn_set.config(state="disabled")
+        self.lbl_step2.config(foreground=self.colors["text_header"], text=f"DATA INPUT (Imported {len(cities)})")
+        self.dist_cache.get(self.cities, self.selected_metric())
+
+        self.page = self.last_page()
+        self.refresh_table()
+        self.update_ui_state(notify=False)
+        self.draw_graph(None)
+
+    def open_store(self):
+        path = filedialog.askdirectory(title="Open Instance Store")
+        if not path:
+            return
+        try:
+            store = calc.InstanceStore(path)
+            cities = store.cities
+        except (OSError, ValueError, KeyError) as e:
+            messagebox.showerror("Instance Store", f"Could not open store:\n{e}")
+            return
+
+        # แทนที่ตารางทั้งชุด (คอลัมน์ map จากไฟล์ ไม่ copy ไม่ parse)
+        self.clear_live_route()
+        self.store, self.cities = store, cities
+        self.target_cities = len(cities)
+        self.ent_target.config(state="normal")
+        self.ent_target.delete(0, tk.END)
+        self.ent_target.insert(0, str(self.target_cities))
+        self.ent_target.config(state="disabled")
+        self.btn_set.config(state="disabled")
+        self.lbl_step2.config(foreground=self.colors["text_header"], text=f"DATA INPUT (Store {len(cities)})")
+
+        self.page = self.last_page()
+        self.refresh_table()
+        self.update_ui_state(notify=False)
+        stored = store.route(self.selected_metric())
+        if stored is not None:
+            # route ที่บันทึกไว้ของ metric นี้ -> แสดงผลทันทีโดยไม่ต้องคำนวณใหม่
+            self._solve_metric = self.selected_metric()
+            self.show_result(*stored)
+        else:
+            self.draw_graph(None)
+
+    def save_store(self):
+        if not self.cities:
+            return
+        path = filedialog.askdirectory(title="Save Instance Store")
+        if not path:
+            return
+        try:
+            # store เดิมที่เปิดอยู่ (ตารางไม่ถูกแก้): เพิ่ม route โดยไม่เขียนเมืองซ้ำ (candidate/matrix เดิมยังใช้ได้)
+            if self.store is not None and os.path.abspath(path) == os.path.abspath(self.store.path):
+                store = self.store
+            else:
+                store = calc.InstanceStore.create(path, self.cities)
+            if self.dynamic is not None:
+                store.save_route(self.dynamic.route, self.dynamic.metric, self.dynamic.info)
+            elif self.solved is not None:
+                route, metric, info = self.solved
+                store.save_route(route, metric, info)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Instance Store", f"Could not save store:\n{e}")
+            return
+        self.lbl_progress.config(text=f"Saved {len(self.cities)} nodes to store")
+
+    # --- TABLE PAGING ---
+    def last_page(self):
+        return max(0, (len(self.cities) - 1) // self.PAGE_SIZE)
+
+    def change_page(self, step):
+        self.page = min(max(0, self.page + step), self.last_page())
+        self.refresh_table()
+
+    def refresh_table(self):
+        # ใส่เฉพาะแถวของหน้าปัจจุบัน (ไม่เกิน PAGE_SIZE) -> ตารางไม่ค้างแม้มีหลายพันเมือง
+        self.tree.delete(*self.tree.get_children())
+        start = self.page * self.PAGE_SIZE
+        for c in self.cities[start:start + self.PAGE_SIZE]:
+            # Format .4f (4 ตำแหน่ง)
+            self.tree.insert("", "end", values=(c['name'], f"{c['x']:.4f}", f"{c['y']:.4f}"))
+        self.lbl_page.config(text=f"Page {self.page + 1} / {self.last_page() + 1}  ({len(self.cities)} rows)")
+
+    def update_ui_state(self, notify=True):
         curr = len(self.cities)
         tgt = self.target_cities
         
@@ -257,27 +499,189 @@ class AppUI:
             
             # Unlock Calculate
             self.btn_calc.config(state="normal")
-            messagebox.showinfo("System", "Data entry complete. Ready to calculate.")
+            if notify:
+                messagebox.showinfo("System", "Data entry complete. Ready to calculate.")
+
+    def selected_metric(self):
+        return self.metric_options[self.cmb_metric.get()]
 
     def run_process(self):
-        dist, path = calc.solve_tsp_nearest_neighbor(self.cities)
-        
-        # 1. Update Distance
-        self.lbl_total_dist.config(text=f"Total Distance: {dist:.4f} Units", fg=self.colors["success"])
+        if self._solve_queue is not None:
+            return
+        metric = self.selected_metric()
+        # distance matrix จาก cache เป็น view ของชุดเมืองตอนนี้ -> เพิ่มเมืองระหว่าง solve ไม่กระทบ thread ที่อ่านอยู่
+        store = self.store
+        distances = store.distances(metric) if store is not None else None
+        if distances is None:
+            distances = self.dist_cache.get(self.cities, metric)
+        candidates = store.candidates(metric) if store is not None else None
+        cities = self.cities.copy()
+        results = queue.Queue()
+        cancel = threading.Event()
+        profile_path = None
+        if self.var_profile.get():
+            profile_path = filedialog.asksaveasfilename(title="Save cProfile", defaultextension=".prof",
+                                                        filetypes=[("cProfile stats", "*.prof")]) or None
+
+        def progress(stage, done, total, tour):
+            # เรียกจาก solver thread: ห้ามแตะ widget ตรงนี้ ส่งผ่าน queue อย่างเดียว
+            results.put(("progress", stage, done, total, tour))
+            return cancel.is_set()
+
+        def work():
+            options = dict(distances=distances, metric=metric, progress=progress, stats=calc.SolveStats(),
+                           candidates=candidates)
+            try:
+                if profile_path:
+                    results.put(("done", calc.profile_solve(profile_path, cities, **options)))
+                else:
+                    results.put(("done", calc.solve_tsp(cities, **options)))
+            except calc.SolveCancelled:
+                results.put(("cancelled",))
+            except Exception as e:
+                results.put(("error", e))
+
+        self._solve_queue, self._solve_cancel = results, cancel
+        self._solve_metric = metric
+        self.clear_live_route()
+        self.set_live_edit(False)
+        self.btn_calc.config(state="disabled")
+        self.btn_import.config(state="disabled")
+        self.btn_open_store.config(state="disabled")
+        self.btn_save_store.config(state="disabled")
+        self.btn_remove.config(state="disabled")
+        self.btn_cancel.config(state="normal")
+        self.progress["value"] = 0
+        self.lbl_progress.config(text="Solving...")
+        threading.Thread(target=work, daemon=True).start()
+        self.root.after(self.POLL_MS, self.poll_solver, results)
+
+    def cancel_process(self):
+        # หยุดแบบ cooperative: solver ตรวจ flag ที่จุด progress ถัดไป
+        self._solve_cancel.set()
+        self.btn_cancel.config(state="disabled")
+        self.lbl_progress.config(text="Cancelling...")
+
+    def poll_solver(self, results):
+        if results is not self._solve_queue:
+            return  # ถูก reset ระหว่างคำนวณ -> ทิ้งผลของ thread เก่า
+
+        latest, tour, final = None, None, None
+        while True:
+            try:
+                msg = results.get_nowait()
+            except queue.Empty:
+                break
+            if msg[0] == "progress":
+                latest = msg
+                if msg[4] is not None:
+                    tour = msg[4]
+            else:
+                final = msg
+
+        if final is None:
+            if latest is not None:
+                _, stage, done, total, _ = latest
+                label, lo, hi = self.SOLVE_STAGES.get(stage, (stage, 0, 100))
+                # total = None: ไม่ทราบความคืบหน้า (เช่น exact search แบบไม่จำกัดเวลา) -> แสดงแค่ชื่อขั้นตอน
+                frac = min(done / total, 1.0) if total else 0
+                self.progress["value"] = lo + (hi - lo) * frac
+                if not self._solve_cancel.is_set():
+                    percent = f" ({frac:.0%})" if total else "..."
+                    self.lbl_progress.config(text=f"Solving: {label}{percent}")
+            if tour is not None:
+                # วาดทัวร์ที่ดีที่สุดตอนนี้ระหว่างที่ยังคำนวณอยู่ (เฉพาะเส้นทาง จุดเมืองไม่เปลี่ยน)
+                self.redraw_route(tour)
+            self.root.after(self.POLL_MS, self.poll_solver, results)
+            return
+
+        self._solve_queue = None
+        self.btn_cancel.config(state="disabled")
+        self.btn_calc.config(state="normal")
+        self.btn_import.config(state="normal")
+        self.btn_open_store.config(state="normal")
+        self.btn_save_store.config(state="normal")
+        self.btn_remove.config(state="normal")
+        if final[0] == "done":
+            self.progress["value"] = 100
+            self.show_result(*final[1])
+        elif final[0] == "cancelled":
+            self.progress["value"] = 0
+            self.lbl_progress.config(text="Cancelled")
+            self.draw_graph(None)
+        else:
+            self.progress["value"] = 0
+            self.lbl_progress.config(text="Error")
+            messagebox.showerror("Solver", f"Could not calculate route:\n{final[1]}")
+
+    def show_result(self, dist, path, info):
+        # path = index array ของเมืองใน self.cities (วนกลับ)
+        self.lbl_progress.config(text="Cancelled (best route so far)" if info['cancelled'] else "Route optimized")
+
+        # 1. Update Distance (ก่อน/หลังปรับปรุงด้วย 2-opt + Or-opt)
+        # gap = ห่างจาก lower bound ไม่เกินกี่ % (ทัวร์ที่สั้นที่สุดจริงอยู่ระหว่าง bound กับ dist)
+        # instance ใหญ่ bound เป็นค่าประมาณ -> แสดง ≈ แทน ≤
+        gap = ""
+        if info['gap'] is not None:
+            gap = f"  (gap {'≤' if info.get('bound_proven') else '≈'} {info['gap']:.2%})"
+        self.lbl_total_dist.config(text=f"Total Distance: {dist:.4f} {info['unit']}{gap}", fg=self.colors["success"])
+        # optimal = exact solver พิสูจน์แล้วว่าสั้นที่สุด (instance เล็ก)
+        result = "Optimal" if info['optimal'] else "Optimized"
+        self.lbl_improvement.config(text=f"Nearest Neighbor: {info['initial_distance']:.4f} ➔ {result}: {dist:.4f} (-{info['improvement']:.1%})")
+        self.lbl_stats.config(text=calc.format_stats(info['stats']) if 'stats' in info else "")
         
         # 2. Update Route Text (A -> B -> C -> A)
-        route_str = " ➔ ".join([c['name'] for c in path])
-        self.lbl_route_text.config(text=route_str)
+        self.show_route_text(path)
         
         # 3. Draw Graph
         self.draw_graph(path)
 
+        # 4. เปิดให้เพิ่ม/ลบเมืองต่อได้ (ซ่อมเส้นทางทันทีโดยไม่ต้องคำนวณใหม่ทั้งหมด)
+        self.solved = (path, self._solve_metric, info)
+        self.set_live_edit(True)
+
+    def show_route_text(self, path):
+        route_str = " ➔ ".join([self.cities.names[i] for i in path[:self.ROUTE_TEXT_LIMIT]])
+        if len(path) > self.ROUTE_TEXT_LIMIT:
+            route_str += f" ➔ … (+{len(path) - self.ROUTE_TEXT_LIMIT} more)"
+        self.lbl_route_text.config(text=route_str)
+
+    def show_live_route(self, action):
+        # แสดงเส้นทางหลังแก้ไขเฉพาะจุด (gap เดิมใช้ไม่ได้แล้ว -> ไม่แสดง)
+        dyn = self.dynamic
+        path = dyn.route
+        self.lbl_progress.config(text=f"Route updated: {action}")
+        self.progress["value"] = 100
+        self.lbl_total_dist.config(text=f"Total Distance: {dyn.distance:.4f} {dyn.metric.unit}", fg=self.colors["success"])
+        self.lbl_improvement.config(text=f"Live edit: {len(dyn)} nodes (Calculate again for a full re-optimization)")
+        self.lbl_stats.config(text="")
+        self.show_route_text(path)
+        self.draw_graph(path)
+
+    def set_live_edit(self, enabled):
+        state = "normal" if enabled else "disabled"
+        for widget in (self.ent_name, self.ent_x, self.ent_y, self.btn_add):
+            widget.config(state=state)
+        if enabled:
+            self.lbl_step2.config(foreground=self.colors["text_header"], text="DATA INPUT (Live edit)")
+
     def reset(self):
-        self.cities = []
+        # ยกเลิก solver ที่ค้างอยู่ (ผลของ thread นั้นจะถูกทิ้ง)
+        self._solve_cancel.set()
+        self._solve_queue = None
+        self.btn_cancel.config(state="disabled")
+        self.btn_import.config(state="normal")
+        self.btn_open_store.config(state="normal")
+        self.btn_save_store.config(state="normal")
+
+        self.cities = calc.CityTable()
         self.target_cities = 0
+        self.clear_live_route()
+        self.store = None
         
         # Reset Widgets
-        for item in self.tree.get_children(): self.tree.delete(item)
+        self.page = 0
+        self.refresh_table()
         
         self.ent_target.config(state="normal"); self.ent_target.delete(0, tk.END)
         self.btn_set.config(state="normal")
@@ -287,71 +691,165 @@ class AppUI:
         self.ent_y.config(state="disabled"); self.ent_y.delete(0, tk.END)
         self.btn_add.config(state="disabled")
         self.btn_calc.config(state="disabled")
+        self.btn_remove.config(state="normal")
         
         self.lbl_progress.config(text="0 / 0 Nodes Added")
         self.progress["value"] = 0
         self.lbl_total_dist.config(text="Total Distance: 0.0000 Units", fg=self.colors["text_header"])
+        self.lbl_improvement.config(text="Nearest Neighbor: -")
+        self.lbl_stats.config(text="")
         self.lbl_route_text.config(text="-")
         
-        self.canvas.delete("all")
+        self.draw_graph(None)
 
-    def draw_graph(self, route_path):
-        self.canvas.delete("all")
+    # --- GRAPH (retained + level of detail) ---
+    def on_canvas_resize(self, event):
+        # <Configure> มาถี่มากระหว่างลากขยายหน้าต่าง -> วาดเฉพาะครั้งสุดท้าย
+        if self._resize_job is not None:
+            self.root.after_cancel(self._resize_job)
+        self._resize_job = self.root.after(self.RESIZE_DELAY_MS, self.apply_resize)
+
+    def apply_resize(self):
+        self._resize_job = None
+        self.draw_grid()
+        self.draw_graph(self.route_path)
+
+    def draw_grid(self):
         w = self.canvas.winfo_width()
         h = self.canvas.winfo_height()
-        
-        # Grid Background
+        self.canvas.delete("grid")
         step = 50
-        for i in range(0, w, step): self.canvas.create_line(i, 0, i, h, fill="#F1F5F9")
-        for i in range(0, h, step): self.canvas.create_line(0, i, w, i, fill="#F1F5F9")
-
-        if not self.cities: return
+        for i in range(0, w, step): self.canvas.create_line(i, 0, i, h, fill="#F1F5F9", tags="grid")
+        for i in range(0, h, step): self.canvas.create_line(0, i, w, i, fill="#F1F5F9", tags="grid")
+        self.canvas.tag_lower("grid")
 
-        # Scaling Logic
-        xs = [c['x'] for c in self.cities]
-        ys = [c['y'] for c in self.cities]
-        
+    def graph_view(self):
+        """Scaling: คืนค่า (min_x, min_y, scale_x, scale_y, h) สำหรับแปลงพิกัดเป็น pixel"""
+        w = self.canvas.winfo_width()
+        h = self.canvas.winfo_height()
+        xs, ys = self.cities.xs, self.cities.ys
+        min_x, max_x = float(min(xs)), float(max(xs))
+        min_y, max_y = float(min(ys)), float(max(ys))
         # Handle case where all points are same or only 1 point
-        if len(set(xs)) < 2: xs.append(xs[0]+1); xs.append(xs[0]-1)
-        if len(set(ys)) < 2: ys.append(ys[0]+1); ys.append(ys[0]-1)
-            
-        min_x, max_x = min(xs), max(xs)
-        min_y, max_y = min(ys), max(ys)
-        pad = 50
-        
-        def to_px(x, y):
-            # Safe division
-            rx = (max_x - min_x) if (max_x - min_x) != 0 else 1
-            ry = (max_y - min_y) if (max_y - min_y) != 0 else 1
-            
-            px = pad + (x - min_x) / rx * (w - 2*pad)
-            py = h - (pad + (y - min_y) / ry * (h - 2*pad)) # Flip Y
-            return px, py
-
-        # --- DRAW ROUTE WITH ARROWS (Fix: Directional Arrows) ---
-        if route_path:
-            for i in range(len(route_path)-1):
-                c1 = route_path[i]
-                c2 = route_path[i+1]
-                
-                x1, y1 = to_px(c1['x'], c1['y'])
-                x2, y2 = to_px(c2['x'], c2['y'])
-                
-                # ใช้ arrow=tk.LAST เพื่อให้หัวลูกศรอยู่ปลายทางเสมอ
-                self.canvas.create_line(x1, y1, x2, y2, fill=self.colors["accent"], width=2, 
-                                      arrow=tk.LAST, arrowshape=(10, 12, 5), dash=(4, 2))
+        if min_x == max_x: min_x, max_x = min_x - 1, max_x + 1
+        if min_y == max_y: min_y, max_y = min_y - 1, max_y + 1
+        pad = self.GRAPH_PAD
+        return (min_x, min_y, (w - 2*pad) / (max_x - min_x), (h - 2*pad) / (max_y - min_y), h)
 
-        # --- DRAW NODES ---
-        for i, c in enumerate(self.cities):
-            px, py = to_px(c['x'], c['y'])
-            
-            # Start node = Green, Others = Blue/Dark
-            fill_col = self.colors["success"] if i == 0 else "white"
-            outline_col = self.colors["success"] if i == 0 else self.colors["primary"]
-            
-            r = 5
-            self.canvas.create_oval(px-r, py-r, px+r, py+r, fill=fill_col, outline=outline_col, width=2)
-            
-            # Text Label with Coordinates .4f
+    def to_px(self, x, y):
+        min_x, min_y, sx, sy, h = self._view
+        return self.GRAPH_PAD + (x - min_x) * sx, h - (self.GRAPH_PAD + (y - min_y) * sy) # Flip Y
+
+    def graph_lod(self):
+        n = len(self.cities)
+        if n > self.CLUSTER_LIMIT: return "cluster"
+        return "detail" if n <= self.LABEL_LIMIT else "points"
+
+    def draw_graph(self, route_path):
+        """
+        วาดกราฟแบบ retained: จุดที่วาดแล้วถูกย้าย (coords) ไม่ลบสร้างใหม่
+        ลบสร้างใหม่เฉพาะเมื่อ LOD เปลี่ยน, ชุดเมืองถูกเปลี่ยน (ลบ/แทนทั้งตาราง) หรือขอบเขตเปลี่ยนในโหมด cluster
+        (cell ของ cluster ผูกกับ pixel) ชุดเมืองและขอบเขตเดิม = วาดใหม่แค่เส้นทาง
+        """
+        self.route_path = route_path
+        if not self.cities:
+            self.canvas.delete("node", "label", "route")
+            self._view = self._lod = self._drawn = None
+            self._node_items, self._label_items, self._cells = [], [], set()
+            return
+
+        view, lod = self.graph_view(), self.graph_lod()
+        drawn = self._drawn
+        if (lod != self._lod or drawn is None or drawn[0] is not self.cities or drawn[1] > len(self.cities)
+                or (lod == "cluster" and view != self._view)):
+            self.rebuild_nodes(view, lod)
+        else:
+            if view != self._view:
+                # ขอบเขต/ขนาด canvas เปลี่ยน -> ย้ายจุดเดิม
+                self._view = view
+                r = 5 if lod == "detail" else 3
+                xs, ys = self.cities.xs, self.cities.ys
+                for i, item in enumerate(self._node_items):
+                    px, py = self.to_px(xs[i], ys[i])
+                    self.canvas.coords(item, px-r, py-r, px+r, py+r)
+                    if self._label_items:
+                        self.canvas.coords(self._label_items[i], px, py-20)
+            # วาดเฉพาะเมืองที่เพิ่มใหม่
+            for i in range(drawn[1], len(self.cities)):
+                self.draw_node(i)
+            self._drawn = (self.cities, len(self.cities))
+        self.draw_route()
+
+    def redraw_route(self, route_path):
+        """วาดใหม่แค่เส้นทาง (ทุก tick ของ progress) ถ้าจุดที่วาดไว้ยังเป็นชุดเมืองปัจจุบัน ไม่งั้นวาดทั้งกราฟ"""
+        if self._drawn is None or self._drawn[0] is not self.cities or self._drawn[1] != len(self.cities):
+            self.draw_graph(route_path)
+            return
+        self.route_path = route_path
+        self.draw_route()
+
+    def rebuild_nodes(self, view, lod):
+        self.canvas.delete("node", "label")
+        self._view, self._lod = view, lod
+        self._node_items, self._label_items, self._cells = [], [], set()
+        for i in range(len(self.cities)):
+            self.draw_node(i)
+        self._drawn = (self.cities, len(self.cities))
+        self.canvas.tag_raise("start")
+
+    def draw_node(self, i):
+        c = self.cities[i]
+        px, py = self.to_px(c['x'], c['y'])
+
+        # Cluster: หลายเมืองใน cell เดียวกันวาดเป็นจุดเดียว (จำนวน item ไม่เกินพื้นที่ canvas / cell)
+        if self._lod == "cluster" and i > 0:
+            cell = (int(px) // self.CLUSTER_CELL, int(py) // self.CLUSTER_CELL)
+            if cell not in self._cells:
+                self._cells.add(cell)
+                cx, cy = cell[0] * self.CLUSTER_CELL, cell[1] * self.CLUSTER_CELL
+                self.canvas.create_rectangle(cx, cy, cx + self.CLUSTER_CELL, cy + self.CLUSTER_CELL,
+                                             fill=self.colors["primary"], outline="", tags="node")
+            return
+
+        # Start node = Green, Others = Blue/Dark
+        fill_col = self.colors["success"] if i == 0 else "white"
+        outline_col = self.colors["success"] if i == 0 else self.colors["primary"]
+        r = 5 if self._lod == "detail" else 3
+        tags = ("node", "start") if i == 0 else "node"
+        self._node_items.append(self.canvas.create_oval(px-r, py-r, px+r, py+r, fill=fill_col, outline=outline_col,
+                                                        width=2 if self._lod == "detail" else 1, tags=tags))
+
+        if self._lod == "detail":
+            # Text Label with Coordinates .2f
             label_text = f"{c['name']}\n({c['x']:.2f}, {c['y']:.2f})"
-            self.canvas.create_text(px, py-20, text=label_text, font=("Arial", 8), fill=self.colors["text_body"], justify="center")
\ No newline at end of file
+            self._label_items.append(self.canvas.create_text(px, py-20, text=label_text, font=("Arial", 8),
+                                                             fill=self.colors["text_body"], justify="center", tags="label"))
+
+    def draw_route(self):
+        self.canvas.delete("route")
+        # route_path = index array ของเมือง (วนกลับ)
+        path = self.route_path
+        if path is None or len(path) < 2:
+            return
+        xs, ys = self.cities.xs, self.cities.ys
+        pts = [self.to_px(xs[i], ys[i]) for i in path]
+
+        if len(path) - 1 <= self.ARROW_LIMIT:
+            # --- DRAW ROUTE WITH ARROWS (Fix: Directional Arrows) ---
+            for (x1, y1), (x2, y2) in zip(pts, pts[1:]):
+                # ใช้ arrow=tk.LAST เพื่อให้หัวลูกศรอยู่ปลายทางเสมอ
+                self.canvas.create_line(x1, y1, x2, y2, fill=self.colors["accent"], width=2,
+                                        arrow=tk.LAST, arrowshape=(10, 12, 5), dash=(4, 2), tags="route")
+        else:
+            # เมืองเยอะ: polyline เส้นเดียว ข้ามจุดที่ตกใน pixel เดียวกับจุดก่อนหน้า
+            coords = list(pts[0])
+            last = (int(pts[0][0]), int(pts[0][1]))
+            for px, py in pts[1:]:
+                cell = (int(px), int(py))
+                if cell != last:
+                    coords += (px, py)
+                    last = cell
+            coords += pts[-1]
+            self.canvas.create_line(*coords, fill=self.colors["accent"], width=1, tags="route")
+        self.canvas.tag_lower("route")
+        self.canvas.tag_lower("grid")